@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Async load generator for echo-tcp.py and http-echo-server.py
+Opens N concurrent connections (directly or through a SOCKS5 proxy such as
+tailscaled on localhost:1055), drives fixed-size messages at a target rate and
+reports connect-time and RTT percentiles plus sustained MB/s.
+
+Usage:
+  python3 echo-loadgen.py tcp 172.16.4.207:8070 --connections 1000 --size 512 --rate 10 --duration 60
+  python3 echo-loadgen.py http 172.16.4.207:8070 --socks localhost:1055 --connections 200 --path /bench
+"""
+
+import argparse
+import asyncio
+from array import array
+import datetime
+import sys
+import time
+
+from socks5_client import socks5_handshake
+
+class Recorder:
+    """Latency samples in microseconds (packed doubles) plus byte/error counters"""
+
+    def __init__(self):
+        self.connect_us = array('d')
+        self.rtt_us = array('d')
+        self.bytes = 0
+        self.connect_errors = {}
+        self.request_errors = {}
+
+    def error(self, bucket, exc):
+        key = f'{type(exc).__name__}: {exc}' if str(exc) else type(exc).__name__
+        bucket[key] = bucket.get(key, 0) + 1
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))
+    return sorted_values[index]
+
+def parse_endpoint(value):
+    host, _, port = value.rpartition(':')
+    return host.strip('[]'), int(port)
+
+async def socks5_connect(proxy, host, port):
+    """Open a CONNECT tunnel through a SOCKS5 proxy (no auth, like tailscaled)"""
+    reader, writer = await asyncio.open_connection(*proxy)
+    try:
+        await socks5_handshake(reader, writer, host, port)
+    except BaseException:
+        writer.close()  # refused, dropped mid-handshake or cancelled
+        raise
+    return reader, writer
+
+async def open_connection(args):
+    if args.socks:
+        return await socks5_connect(args.socks, *args.target)
+    return await asyncio.open_connection(*args.target)
+
+async def tcp_exchange(reader, writer, payload):
+    """One echo round trip; returns True when the server is closing the connection"""
+    writer.write(payload)
+    await reader.readexactly(len(payload))
+    return False
+
+def http_request(args, payload):
+    host = f'{args.target[0]}:{args.target[1]}'
+    method = 'POST' if payload else 'GET'
+    head = (f'{method} {args.path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(payload)}\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n')
+    return head.encode() + payload
+
+async def http_exchange(reader, writer, request):
+    """One request/response; returns True for an HTTP/1.0 or Connection: close reply"""
+    writer.write(request)
+    status = await reader.readline()
+    if not status.startswith(b'HTTP/1.1 2') and not status.startswith(b'HTTP/1.0 2'):
+        raise ConnectionError(f'HTTP status {status.decode(errors="replace").strip()!r}')
+    length, chunked, close = 0, False, status.startswith(b'HTTP/1.0')
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection':
+            close = value == 'close'
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return close
+
+async def client(args, recorder, stop_at, start_delay):
+    await asyncio.sleep(start_delay)
+    payload = b'x' * args.size
+    if args.protocol == 'tcp':
+        exchange, message = tcp_exchange, payload
+    else:
+        exchange, message = http_exchange, http_request(args, payload)
+    interval = 1.0 / args.rate if args.rate > 0 else 0
+
+    writer = None
+    while time.monotonic() < stop_at:
+        if writer is None:
+            connect_start = time.perf_counter()
+            try:
+                reader, writer = await asyncio.wait_for(open_connection(args), args.timeout)
+            except Exception as e:
+                recorder.error(recorder.connect_errors, e)
+                await asyncio.sleep(min(1.0, interval or 1.0))
+                continue
+            recorder.connect_us.append((time.perf_counter() - connect_start) * 1e6)
+            next_send = time.monotonic()
+
+        request_start = time.perf_counter()
+        try:
+            closed = await asyncio.wait_for(exchange(reader, writer, message), args.timeout)
+        except Exception as e:
+            recorder.error(recorder.request_errors, e)
+            writer.close()
+            writer = None
+            continue
+        recorder.rtt_us.append((time.perf_counter() - request_start) * 1e6)
+        recorder.bytes += 2 * args.size
+
+        if args.reconnect or closed:
+            writer.close()
+            writer = None
+        if interval:
+            next_send += interval
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    if writer is not None:
+        writer.close()
+
+def print_report(args, recorder, elapsed):
+    rtt = sorted(recorder.rtt_us)
+    connect = sorted(recorder.connect_us)
+
+    print()
+    print("=" * 70)
+    print("=== Load Test Results ===")
+    print("=" * 70)
+    print(f"End time:           {datetime.datetime.now()}")
+    print(f"Duration:           {elapsed:.1f}s")
+    print(f"Connections:        {len(connect)} established")
+    print(f"Exchanges:          {len(rtt)} ({len(rtt) / elapsed:.1f}/s)")
+    print(f"Throughput:         {recorder.bytes / elapsed / 1e6:.2f} MB/s (sent + received payload)")
+
+    for title, values in (("Connect time", connect), ("Round-trip time", rtt)):
+        if values:
+            print()
+            print(f"{title} (ms):")
+            print(f"  Min:              {values[0] / 1000:.2f}ms")
+            print(f"  P50 (median):     {percentile(values, 50) / 1000:.2f}ms")
+            print(f"  P99:              {percentile(values, 99) / 1000:.2f}ms")
+            print(f"  P99.9:            {percentile(values, 99.9) / 1000:.2f}ms")
+            print(f"  Max:              {values[-1] / 1000:.2f}ms")
+
+    for title, errors in (("Connect errors", recorder.connect_errors), ("Request errors", recorder.request_errors)):
+        if errors:
+            print()
+            print(f"{title}:")
+            for message, count in sorted(errors.items(), key=lambda e: -e[1])[:10]:
+                print(f"  {count:6d}  {message}")
+    print("=" * 70)
+
+async def run(args, recorder):
+    start = time.monotonic()
+    stop_at = start + args.ramp + args.duration
+    ramp_step = args.ramp / args.connections if args.connections else 0
+
+    clients = [asyncio.create_task(client(args, recorder, stop_at, i * ramp_step))
+               for i in range(args.connections)]
+
+    async def progress():
+        last = 0
+        while True:
+            await asyncio.sleep(args.report_interval)
+            done = len(recorder.rtt_us)
+            print(f"[{time.monotonic() - start:6.1f}s] exchanges/s={(done - last) / args.report_interval:.0f} "
+                  f"connections={len(recorder.connect_us)} errors="
+                  f"{sum(recorder.connect_errors.values()) + sum(recorder.request_errors.values())}")
+            last = done
+
+    reporter = asyncio.create_task(progress())
+    try:
+        await asyncio.gather(*clients)
+    finally:
+        reporter.cancel()
+        for task in clients:
+            task.cancel()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Async load generator for the echo servers')
+    parser.add_argument('protocol', choices=('tcp', 'http'))
+    parser.add_argument('target', type=parse_endpoint, help='HOST:PORT of the echo server')
+    parser.add_argument('--socks', type=parse_endpoint, metavar='HOST:PORT',
+                        help='tunnel through a SOCKS5 proxy, e.g. localhost:1055')
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--size', type=int, default=64, help='payload bytes per message')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='messages per second per connection (0 = back-to-back)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load after ramp-up')
+    parser.add_argument('--ramp', type=float, default=0, help='spread connection opens over this many seconds')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--reconnect', action='store_true',
+                        help='open a fresh connection for every message (measures connect cost)')
+    parser.add_argument('--path', default='/', help='HTTP request path')
+    parser.add_argument('--report-interval', type=float, default=5)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("=== Echo Load Generator ===")
+    print("=" * 70)
+    print(f"Target:             {args.protocol}://{args.target[0]}:{args.target[1]}")
+    print(f"Via SOCKS5:         {f'{args.socks[0]}:{args.socks[1]}' if args.socks else 'direct'}")
+    print(f"Connections:        {args.connections} (ramp {args.ramp}s)")
+    print(f"Message size:       {args.size} bytes")
+    print(f"Rate:               {f'{args.rate}/s per connection' if args.rate else 'closed loop'}")
+    print(f"Duration:           {args.duration}s")
+    print(f"Start time:         {datetime.datetime.now()}")
+    print("=" * 70)
+
+    recorder = Recorder()
+    start = time.monotonic()
+    try:
+        asyncio.run(run(args, recorder))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+    print_report(args, recorder, time.monotonic() - start)
+    sys.exit(0 if not recorder.connect_errors and not recorder.request_errors else 1)
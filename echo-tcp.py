@@ -1,30 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import selectors
+import signal
 import socket
+import sys
 import threading
+import time
+
+from echo_metrics import Metrics, serve_metrics
 
 HOST = '0.0.0.0'
 PORT = 8070
+BUFFER_SIZE = 1024
+LOG_EVERY = 1        # Print every Nth received chunk (0 = never)
+USE_SPLICE = False   # threads engine: echo with os.splice through a pipe
+
+# Per-process counters: scraped from --stats-port, printed at exit and
+# aggregated across --workers
+METRICS = Metrics('echo_tcp', 'connection_duration_seconds', 'Connection lifetime')
+
+def log_chunk(addr, data, chunk_no):
+    """Sampled per-chunk logging; the decode only happens for sampled chunks"""
+    if LOG_EVERY and chunk_no % LOG_EVERY == 0:
+        print(f'Received from {addr}: {bytes(data).decode("utf-8", errors="ignore").strip()}')
+
+def echo_copy(conn, addr):
+    """recv_into a reused buffer and send straight from a memoryview of it"""
+    buf = bytearray(BUFFER_SIZE)
+    view = memoryview(buf)
+    while True:
+        n = conn.recv_into(buf)
+        if not n:
+            return
+        sent = 0
+        while sent < n:
+            sent += conn.send(view[sent:n])
+        log_chunk(addr, view[:n], METRICS.add_bytes(addr[0], n, n))
+
+def echo_splice(conn, addr):
+    """Kernel-side echo: socket -> pipe -> socket with os.splice (Linux only)"""
+    import fcntl
+
+    fd = conn.fileno()
+    read_fd, write_fd = os.pipe()
+    try:
+        try:
+            fcntl.fcntl(write_fd, fcntl.F_SETPIPE_SZ, BUFFER_SIZE)
+        except (AttributeError, OSError):
+            pass  # Keep the default pipe size (64 KiB)
+        while True:
+            n = os.splice(fd, write_fd, BUFFER_SIZE)
+            if not n:
+                return
+            left = n
+            while left:
+                left -= os.splice(read_fd, fd, left)
+            METRICS.add_bytes(addr[0], n, n)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
 
 def handle_client(conn, addr):
     """Handle a single client connection in a separate thread"""
     with conn:
         print(f'Connected by {addr}')
+        start = time.monotonic()
+        METRICS.connection_opened(addr[0])
         try:
-            while True:
-                data = conn.recv(1024)
-                if not data:
-                    print(f'Connection closed by {addr}')
-                    break
-                print(f'Received from {addr}: {data.decode("utf-8", errors="ignore").strip()}')
-                conn.sendall(data)
+            if USE_SPLICE:
+                echo_splice(conn, addr)
+            else:
+                echo_copy(conn, addr)
+            print(f'Connection closed by {addr}')
         except Exception as e:
             print(f'Error handling {addr}: {e}')
         finally:
+            METRICS.connection_closed(addr[0], time.monotonic() - start)
+            # Per-connection threads are short-lived: fold their counters into the totals
+            METRICS.retire()
             print(f'Thread for {addr} finished')
 
-with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    s.bind((HOST, PORT))
-    s.listen()
+def serve_threads(s):
+    """Thread-per-connection engine (original behaviour)"""
     print(f'Multi-threaded echo server listening on {HOST}:{PORT}')
 
     while True:
@@ -32,4 +91,262 @@ with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         # Create a new thread for each client connection
         client_thread = threading.Thread(target=handle_client, args=(conn, addr), daemon=True)
         client_thread.start()
-        print(f'Started thread for {addr}')
\ No newline at end of file
+        print(f'Started thread for {addr}')
+
+def serve_selectors(s):
+    """Single-threaded non-blocking engine on top of selectors (epoll on Linux).
+
+    Per-connection state is only the socket plus any bytes the peer has not
+    yet accepted, so memory stays flat with tens of thousands of idle clients.
+    """
+    sel = selectors.DefaultSelector()
+    s.setblocking(False)
+    sel.register(s, selectors.EVENT_READ, None)
+    print(f'Event-loop echo server ({type(sel).__name__}) listening on {HOST}:{PORT}')
+
+    # One receive buffer for the whole loop; only unsent tails are copied out
+    buf = bytearray(BUFFER_SIZE)
+    view = memoryview(buf)
+
+    def close(conn, addr, started):
+        sel.unregister(conn)
+        conn.close()
+        METRICS.connection_closed(addr[0], time.monotonic() - started)
+
+    while True:
+        for key, mask in sel.select():
+            if key.data is None:
+                # Drain the accept backlog in one go
+                while True:
+                    try:
+                        conn, addr = s.accept()
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    conn.setblocking(False)
+                    sel.register(conn, selectors.EVENT_READ, [addr, b'', time.monotonic()])
+                    METRICS.connection_opened(addr[0])
+                    print(f'Connected by {addr}')
+                continue
+
+            conn = key.fileobj
+            addr, pending, started = key.data
+            try:
+                if mask & selectors.EVENT_WRITE and pending:
+                    sent = conn.send(pending)
+                    METRICS.add_bytes(addr[0], 0, sent)
+                    pending = pending[sent:]
+                    key.data[1] = pending
+                    if not pending:
+                        sel.modify(conn, selectors.EVENT_READ, key.data)
+                    continue
+
+                if mask & selectors.EVENT_READ:
+                    n = conn.recv_into(buf)
+                    if not n:
+                        print(f'Connection closed by {addr}')
+                        close(conn, addr, started)
+                        continue
+                    try:
+                        sent = conn.send(view[:n])
+                    except (BlockingIOError, InterruptedError):
+                        sent = 0
+                    log_chunk(addr, view[:n], METRICS.add_bytes(addr[0], n, sent))
+                    if sent < n:
+                        # Peer is slow: stop reading until the backlog is flushed
+                        key.data[1] = bytes(view[sent:n])
+                        sel.modify(conn, selectors.EVENT_WRITE, key.data)
+            except (BlockingIOError, InterruptedError):
+                pass
+            except Exception as e:
+                print(f'Error handling {addr}: {e}')
+                close(conn, addr, started)
+
+class EchoProtocol(asyncio.Protocol):
+    """asyncio echo protocol; back-pressure follows the transport's write buffer"""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info('peername')
+        print(f'Connected by {self.addr}')
+        self.started = time.monotonic()
+        METRICS.connection_opened(self.addr[0])
+
+    def data_received(self, data):
+        self.transport.write(data)
+        log_chunk(self.addr, data, METRICS.add_bytes(self.addr[0], len(data), len(data)))
+
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+    def eof_received(self):
+        print(f'Connection closed by {self.addr}')
+
+    def connection_lost(self, exc):
+        METRICS.connection_closed(self.addr[0], time.monotonic() - self.started)
+        if exc:
+            print(f'Error handling {self.addr}: {exc}')
+
+def serve_asyncio(s):
+    """Single-threaded asyncio engine (uses uvloop if it is installed)"""
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(EchoProtocol, sock=s, backlog=4096)
+        print(f'asyncio echo server listening on {HOST}:{PORT}')
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+ENGINES = {
+    'threads': serve_threads,
+    'selectors': serve_selectors,
+    'asyncio': serve_asyncio,
+}
+
+def report_throughput(interval, label=''):
+    """Background reporter: aggregated MB/s instead of per-chunk prints"""
+    last_in, last_time = METRICS.totals()['bytes_in'], time.time()
+    while True:
+        time.sleep(interval)
+        now, totals = time.time(), METRICS.totals()
+        rate = (totals['bytes_in'] - last_in) / (now - last_time) / 1e6
+        print(f"{label}[{time.strftime('%H:%M:%S')}] {rate:.2f} MB/s echoed - "
+              f"connections={totals['connections']} active={totals['connections'] - totals['closed']} "
+              f"chunks={totals['chunks']} bytes_in={totals['bytes_in']}")
+        last_in, last_time = totals['bytes_in'], now
+
+def start_reporter(interval, label=''):
+    if interval > 0:
+        threading.Thread(target=report_throughput, args=(interval, label), daemon=True).start()
+
+def open_listener(reuse_port=False):
+    """Create the listening socket; with reuse_port every worker binds its own"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    s.bind((HOST, PORT))
+    s.listen(4096)
+    return s
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def start_stats_server(stats_port):
+    if stats_port:
+        serve_metrics(METRICS, HOST, stats_port)
+        print(f'Prometheus metrics on http://{HOST}:{stats_port}/metrics')
+
+def run_worker(engine, stats_fd, report_interval=0, stats_port=0):
+    """Body of a forked worker: own SO_REUSEPORT socket, own accept loop"""
+    # Ctrl+C reaches the whole process group; let the parent drive shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    start_reporter(report_interval, label=f'worker {os.getpid()} ')
+    start_stats_server(stats_port)
+    try:
+        with open_listener(reuse_port=True) as s:
+            ENGINES[engine](s)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.write(stats_fd, json.dumps(METRICS.totals()).encode())
+        os.close(stats_fd)
+        sys.stdout.flush()
+        os._exit(0)
+
+def serve_workers(engine, workers, report_interval=0, stats_port=0):
+    """Pre-fork N workers sharing PORT via SO_REUSEPORT and aggregate their counters.
+
+    Worker i serves its own metrics on stats_port + i - 1.
+    """
+    children = {}
+    for worker_id in range(1, workers + 1):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            run_worker(engine, write_fd, report_interval, stats_port and stats_port + worker_id - 1)
+        os.close(write_fd)
+        children[pid] = (worker_id, read_fd)
+        print(f'Started worker {worker_id} (pid {pid})')
+
+    print(f'{workers} {engine} workers sharing {HOST}:{PORT} via SO_REUSEPORT')
+
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        while children:
+            pid, _ = os.wait()
+            if pid in children:
+                worker_id, read_fd = children.pop(pid)
+                print(f'Worker {worker_id} (pid {pid}) exited unexpectedly')
+                os.close(read_fd)
+    except KeyboardInterrupt:
+        print('\nShutting down workers...')
+
+    totals = dict.fromkeys(METRICS.totals(), 0)
+    for pid, (worker_id, read_fd) in sorted(children.items(), key=lambda c: c[1][0]):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        with os.fdopen(read_fd, 'rb') as f:
+            data = f.read()
+        os.waitpid(pid, 0)
+        worker_stats = json.loads(data) if data else dict.fromkeys(totals, 0)
+        for name in totals:
+            totals[name] += worker_stats.get(name, 0)
+        print(f"  Worker {worker_id}: connections={worker_stats['connections']} "
+              f"bytes_in={worker_stats['bytes_in']} bytes_out={worker_stats['bytes_out']}")
+
+    print(f"Total: connections={totals['connections']} "
+          f"bytes_in={totals['bytes_in']} bytes_out={totals['bytes_out']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='TCP echo server')
+    parser.add_argument('--engine', choices=ENGINES, default='threads',
+                        help='threads (one thread per connection), selectors (epoll loop) or asyncio')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='pre-fork N processes sharing the port via SO_REUSEPORT (Linux)')
+    parser.add_argument('--buffer-size', type=int, default=BUFFER_SIZE,
+                        help='receive buffer per read in bytes (e.g. 262144 for bulk tests)')
+    parser.add_argument('--log-every', type=int, default=LOG_EVERY,
+                        help='print every Nth received chunk; 0 disables per-chunk logging')
+    parser.add_argument('--quiet', action='store_true', help='same as --log-every 0')
+    parser.add_argument('--report-interval', type=float, default=0,
+                        help='print aggregated throughput every N seconds (0 = off)')
+    parser.add_argument('--stats-port', type=int, default=0,
+                        help='serve Prometheus metrics on this side port (with --workers: one port per worker)')
+    parser.add_argument('--splice', action='store_true',
+                        help='threads engine only: echo in-kernel with os.splice (Linux)')
+    args = parser.parse_args()
+    PORT = args.port
+    BUFFER_SIZE = args.buffer_size
+    LOG_EVERY = 0 if args.quiet else args.log_every
+    USE_SPLICE = args.splice
+    if USE_SPLICE and (args.engine != 'threads' or not hasattr(os, 'splice')):
+        parser.error('--splice needs --engine threads and os.splice (Linux, Python 3.10+)')
+
+    if args.workers > 1:
+        serve_workers(args.engine, args.workers, args.report_interval, args.stats_port)
+    else:
+        start_reporter(args.report_interval)
+        start_stats_server(args.stats_port)
+        with open_listener() as s:
+            try:
+                ENGINES[args.engine](s)
+            except KeyboardInterrupt:
+                print('\nShutting down server...')
+        totals = METRICS.totals()
+        print(f"Total: connections={totals['connections']} "
+              f"bytes_in={totals['bytes_in']} bytes_out={totals['bytes_out']}")
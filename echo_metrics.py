@@ -0,0 +1,194 @@
+"""
+Low-overhead in-process counters for echo-tcp.py and http-echo-server.py
+
+Every thread updates its own shard without taking a lock; only a scrape walks
+the shards and adds them up. Output is Prometheus text format.
+"""
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, Prometheus "le" buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Index into the per-client counter lists
+CONNECTIONS, BYTES_IN, BYTES_OUT, REQUESTS = range(4)
+
+class Shard:
+    """Counters owned and written by a single thread"""
+    __slots__ = ('opened', 'closed', 'bytes_in', 'bytes_out', 'chunks',
+                 'latency_counts', 'latency_sum', 'clients')
+
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.chunks = 0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last slot is +Inf
+        self.latency_sum = 0.0
+        self.clients = {}
+
+    def client(self, ip):
+        counters = self.clients.get(ip)
+        if counters is None:
+            counters = self.clients[ip] = [0, 0, 0, 0]
+        return counters
+
+    def merge(self, other):
+        """Fold another shard into this one (caller serialises access)"""
+        self.opened += other.opened
+        self.closed += other.closed
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.chunks += other.chunks
+        for i, count in enumerate(other.latency_counts):
+            self.latency_counts[i] += count
+        self.latency_sum += other.latency_sum
+        # dict() copies in one step under the GIL, so a concurrent insert by
+        # the owning thread can't break the iteration
+        for ip, counters in dict(other.clients).items():
+            mine = self.client(ip)
+            for i, value in enumerate(counters):
+                mine[i] += value
+
+class Metrics:
+    """Registry of per-thread shards plus a totals shard for retired threads"""
+
+    def __init__(self, prefix, latency_name='request_duration_seconds',
+                 latency_help='Request latency'):
+        self.prefix = prefix
+        self.latency_name = latency_name
+        self.latency_help = latency_help
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = Shard()
+
+    def shard(self):
+        """The calling thread's shard; the hot path touches nothing else"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def retire(self):
+        """Fold the calling thread's shard into the totals before the thread exits"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            return
+        with self._lock:
+            self._shards.remove(shard)
+            self._retired.merge(shard)
+        del self._local.shard
+
+    def connection_opened(self, ip):
+        shard = self.shard()
+        shard.opened += 1
+        shard.client(ip)[CONNECTIONS] += 1
+
+    def connection_closed(self, ip, duration=None):
+        shard = self.shard()
+        shard.closed += 1
+        if duration is not None:
+            self._observe(shard, duration)
+
+    def add_bytes(self, ip, received, sent):
+        """Count one read/write event; returns this thread's event number (for sampling)"""
+        shard = self.shard()
+        shard.bytes_in += received
+        shard.bytes_out += sent
+        shard.chunks += 1
+        counters = shard.client(ip)
+        counters[BYTES_IN] += received
+        counters[BYTES_OUT] += sent
+        return shard.chunks
+
+    def observe_request(self, ip, seconds):
+        shard = self.shard()
+        shard.client(ip)[REQUESTS] += 1
+        self._observe(shard, seconds)
+
+    @staticmethod
+    def _observe(shard, seconds):
+        shard.latency_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        shard.latency_sum += seconds
+
+    def snapshot(self):
+        """Merged copy of every shard"""
+        total = Shard()
+        with self._lock:
+            total.merge(self._retired)
+            for shard in self._shards:
+                total.merge(shard)
+        return total
+
+    def totals(self):
+        """Plain dict of the headline counters (for exit summaries and pipes)"""
+        total = self.snapshot()
+        return {'connections': total.opened, 'closed': total.closed,
+                'bytes_in': total.bytes_in, 'bytes_out': total.bytes_out, 'chunks': total.chunks}
+
+    def render(self):
+        """Prometheus text exposition of the current snapshot"""
+        total = self.snapshot()
+        p = self.prefix
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{p}_{name}{labels} {value}')
+
+        metric('connections_opened_total', 'counter', 'Connections accepted', [('', total.opened)])
+        metric('connections_closed_total', 'counter', 'Connections closed', [('', total.closed)])
+        metric('connections_active', 'gauge', 'Connections currently open', [('', total.opened - total.closed)])
+        metric('received_bytes_total', 'counter', 'Payload bytes received', [('', total.bytes_in)])
+        metric('sent_bytes_total', 'counter', 'Payload bytes sent', [('', total.bytes_out)])
+
+        clients = sorted(total.clients.items())
+        metric('client_connections_total', 'counter', 'Connections accepted per client IP',
+               [(f'{{client="{ip}"}}', c[CONNECTIONS]) for ip, c in clients])
+        metric('client_received_bytes_total', 'counter', 'Payload bytes received per client IP',
+               [(f'{{client="{ip}"}}', c[BYTES_IN]) for ip, c in clients])
+        metric('client_sent_bytes_total', 'counter', 'Payload bytes sent per client IP',
+               [(f'{{client="{ip}"}}', c[BYTES_OUT]) for ip, c in clients])
+        if any(c[REQUESTS] for _, c in clients):
+            metric('client_requests_total', 'counter', 'Requests served per client IP',
+                   [(f'{{client="{ip}"}}', c[REQUESTS]) for ip, c in clients])
+
+        samples = []
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), total.latency_counts):
+            cumulative += count
+            samples.append((f'_bucket{{le="{bound}"}}', cumulative))
+        samples.append(('_sum', f'{total.latency_sum:.6f}'))
+        samples.append(('_count', cumulative))
+        metric(self.latency_name, 'histogram', self.latency_help, samples)
+
+        return '\n'.join(lines) + '\n'
+
+def serve_metrics(metrics, host, port):
+    """Serve metrics.render() on a side port from a background thread"""
+
+    class StatsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', len(body))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes would drown out the echo server's own output
+
+    server = ThreadingHTTPServer((host, port), StatsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stats', daemon=True).start()
+    return server
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Parallel per-minute aggregation of multi-GB Tailscale flow logs
+Memory-maps the log, splits it at record boundaries and parses the chunks in
+a process pool. Each worker reduces its flows to per-minute aggregates keyed
+by (kind, src IP, dst IP); the parent merges them. Memory is bounded by the
+number of distinct pairs x minutes, never by the file size.
+
+Usage:
+  python3 flow_aggregate.py LOGS/tailscale_network_flow_logfile.txt --dst 100.97.54.81 --kind subnet,physical
+  python3 flow_aggregate.py LOGS/tailscale_network_flow_logfile.txt --src 100.97.54.81 --dst 65.51.181.220 \\
+      --kind physical --from 2025-10-21T05:50:00Z --to 2025-10-21T06:30:00Z
+  python3 flow_aggregate.py LOGS/tailscale_network_flow_logfile.txt --kind subnet --csv per-minute.csv
+
+Filters take the same forms as flow_index.py: an exact IP, or a prefix
+ending in '.', ':' or '*'.
+"""
+
+import argparse
+import csv
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+
+from flow_logs import (KINDS, format_time, ip_matcher, iter_flows, iter_records, parse_time, record_boundaries,
+                       starts_in_array)
+
+# Per (minute, kind, src, dst): flows, tx pkts, tx bytes, rx pkts, rx bytes, single-packet flows
+COLUMNS = ('flows', 'tx_pkts', 'tx_bytes', 'rx_pkts', 'rx_bytes', 'single_pkt')
+
+def aggregate_chunk(task):
+    """Worker: aggregate every record starting in [start, end)"""
+    path, start, end, in_array, filters = task
+    src, dst, kinds, first_ms, last_ms = filters
+    match_src, match_dst = ip_matcher(src), ip_matcher(dst)
+    totals = {}
+    records = flows = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for _, _, record in iter_records(mm, start, in_array, stop=end):
+            records += 1
+            for (logged, _, kind, _, src_ip, _, dst_ip, _,
+                 tx_pkts, tx_bytes, rx_pkts, rx_bytes) in iter_flows(record):
+                if kinds is not None and kind not in kinds:
+                    continue
+                if (first_ms is not None and logged < first_ms) or (last_ms is not None and logged > last_ms):
+                    continue
+                if (match_src and not match_src(src_ip)) or (match_dst and not match_dst(dst_ip)):
+                    continue
+                flows += 1
+                key = (logged // 60000, kind, src_ip, dst_ip)
+                row = totals.get(key)
+                if row is None:
+                    row = totals[key] = [0, 0, 0, 0, 0, 0]
+                row[0] += 1
+                row[1] += tx_pkts
+                row[2] += tx_bytes
+                row[3] += rx_pkts
+                row[4] += rx_bytes
+                if tx_pkts == 1:
+                    row[5] += 1
+    return records, flows, totals
+
+def aggregate(path, filters, workers=None, chunk_mb=64):
+    """(records, matching flows, {(minute, kind, src, dst): [COLUMNS...]})"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0, 0, {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            in_array = starts_in_array(mm[:4096])
+            boundaries = record_boundaries(mm, chunk_mb << 20)
+    tasks = [(path, start, end, in_array, filters) for start, end in zip(boundaries, boundaries[1:])]
+
+    merged = {}
+    records = flows = 0
+    with multiprocessing.Pool(min(workers or os.cpu_count(), len(tasks))) as pool:
+        for chunk_records, chunk_flows, totals in pool.imap_unordered(aggregate_chunk, tasks):
+            records += chunk_records
+            flows += chunk_flows
+            for key, row in totals.items():
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = row
+                else:
+                    for i, value in enumerate(row):
+                        current[i] += value
+    return records, flows, merged
+
+def write_csv(path, merged):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('minute', 'kind', 'src', 'dst') + COLUMNS)
+        for (minute, kind, src, dst), row in sorted(merged.items()):
+            writer.writerow([format_time(minute * 60000)[:16] + 'Z', KINDS[kind], src, dst] + row)
+
+def print_report(merged, top):
+    totals = [0] * len(COLUMNS)
+    pairs = {}
+    minutes = set()
+    for (minute, kind, src, dst), row in merged.items():
+        minutes.add(minute)
+        pair = pairs.setdefault((kind, src, dst), [0] * len(COLUMNS))
+        for i, value in enumerate(row):
+            totals[i] += value
+            pair[i] += value
+
+    flows, tx_pkts, tx_bytes, rx_pkts, rx_bytes, single = totals
+    print(f"Matching flows:     {flows}")
+    if not flows:
+        return
+    print(f"Window:             {format_time(min(minutes) * 60000)} - {format_time((max(minutes) + 1) * 60000)} "
+          f"({len(minutes)} minutes with traffic)")
+    print(f"TX:                 {tx_pkts} pkts, {tx_bytes} bytes")
+    print(f"RX:                 {rx_pkts} pkts, {rx_bytes} bytes")
+    print(f"Single-packet:      {single} ({single * 100.0 / flows:.1f}% - SYN only, no reply)")
+    print()
+    print(f"Top {min(top, len(pairs))} of {len(pairs)} src -> dst pairs by flows:")
+    print(f"  {'kind':<9} {'src':<40} {'dst':<40} {'flows':>9} {'tx pkts':>10} {'rx pkts':>10} {'1-pkt %':>7}")
+    for (kind, src, dst), row in sorted(pairs.items(), key=lambda item: -item[1][0])[:top]:
+        print(f"  {KINDS[kind]:<9} {src:<40} {dst:<40} {row[0]:>9} {row[1]:>10} {row[3]:>10} "
+              f"{row[5] * 100.0 / row[0]:>6.1f}%")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel per-minute flow log aggregation',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('Usage:')[1])
+    parser.add_argument('logfile')
+    parser.add_argument('--src', help='source IP, or prefix ending in . : or *')
+    parser.add_argument('--dst', help='destination IP, or prefix ending in . : or *')
+    parser.add_argument('--kind', help=f"comma-separated traffic kinds: {', '.join(KINDS)}")
+    parser.add_argument('--from', dest='start', metavar='TIME', help='logged at or after (ISO 8601)')
+    parser.add_argument('--to', dest='end', metavar='TIME', help='logged at or before (ISO 8601)')
+    parser.add_argument('--workers', type=int, help='parser processes (default: CPU count)')
+    parser.add_argument('--chunk-mb', type=int, default=64, help='bytes of log per task (default: 64)')
+    parser.add_argument('--csv', metavar='PATH', help='write the per-minute aggregates to PATH')
+    parser.add_argument('--top', type=int, default=20, help='pairs listed in the report (default: 20)')
+    args = parser.parse_args()
+    if args.chunk_mb < 1:
+        parser.error('--chunk-mb must be at least 1')
+
+    kinds = None
+    if args.kind:
+        try:
+            kinds = frozenset(KINDS.index(kind) for kind in args.kind.split(','))
+        except ValueError:
+            parser.error(f"--kind: choose from {', '.join(KINDS)}")
+    filters = (args.src, args.dst, kinds,
+               parse_time(args.start) if args.start else None, parse_time(args.end) if args.end else None)
+
+    start = time.time()
+    records, flows, merged = aggregate(args.logfile, filters, args.workers, args.chunk_mb)
+    elapsed = time.time() - start
+    size = os.path.getsize(args.logfile)
+    print(f"Parsed {records} records ({size / 1e6:.0f} MB) in {elapsed:.1f}s - {size / 1e6 / max(elapsed, 1e-9):.0f} MB/s, "
+          f"{len(merged)} aggregate rows")
+    if args.csv:
+        write_csv(args.csv, merged)
+        print(f"Per-minute aggregates written to {args.csv}")
+    print()
+    try:
+        print_report(merged, args.top)
+    except BrokenPipeError:  # | head
+        sys.stderr.close()
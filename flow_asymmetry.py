@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Vectorized asymmetric-routing detection over Tailscale flow logs
+Loads flows into columnar NumPy arrays (timestamps as int64 ms, IPs as
+integer ids) and computes, for every node pair at once, the packets and
+bytes sent in each direction per time bucket. A flow from A to B counts its
+tx toward A -> B and its rx toward B -> A, so both the flows A opened and the
+ones B opened land on the same pair.
+
+  one-way      one direction carried >= --min-packets, the other nothing
+  asymmetric   one direction carried >= --ratio times the other
+  symmetric    anything else with >= --min-packets in total
+
+This replaces comparing outbound and inbound jq counts for one hard-coded
+host: every pair in the log is checked in a single pass.
+
+Usage:
+  python3 flow_asymmetry.py LOGS/tailscale_network_flow_logfile.txt
+  python3 flow_asymmetry.py --db flows.db --kind subnet,physical --bucket 300
+  python3 flow_asymmetry.py --db flows.db --from 2025-10-21T05:50:00Z --to 2025-10-21T06:30:00Z \\
+      --ip 100.97.54.81 --csv buckets.csv
+
+Requires NumPy (pip install numpy). --db reads a store built by
+flow_index.py, which is much faster than re-parsing the log.
+"""
+
+import argparse
+import array
+import csv
+import sqlite3
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("flow_asymmetry.py needs NumPy: pip install numpy")
+
+from flow_logs import KINDS, format_time, iter_flows, iter_records, parse_time
+
+SYMMETRIC = 0
+ASYMMETRIC = 1
+ONE_WAY = 2
+QUIET = -1  # below --min-packets in both directions
+STATUS_NAMES = {SYMMETRIC: 'symmetric', ASYMMETRIC: 'asymmetric', ONE_WAY: 'one-way', QUIET: 'quiet'}
+
+class FlowColumns:
+    """One array per field; src and dst index into ips"""
+
+    def __init__(self, ips, logged, src, dst, tx_pkts, tx_bytes, rx_pkts, rx_bytes):
+        self.ips = ips
+        self.logged = np.asarray(logged, dtype=np.int64)
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.tx_pkts = np.asarray(tx_pkts, dtype=np.int64)
+        self.tx_bytes = np.asarray(tx_bytes, dtype=np.int64)
+        self.rx_pkts = np.asarray(rx_pkts, dtype=np.int64)
+        self.rx_bytes = np.asarray(rx_bytes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.logged)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows of (logged, src ip, dst ip, tx pkts, tx bytes, rx pkts, rx bytes)"""
+        ids = {}
+        columns = [array.array('q') for _ in range(7)]
+        logged, src, dst, tx_pkts, tx_bytes, rx_pkts, rx_bytes = columns
+        for row in rows:
+            logged.append(row[0])
+            src.append(ids.setdefault(row[1], len(ids)))
+            dst.append(ids.setdefault(row[2], len(ids)))
+            tx_pkts.append(row[3])
+            tx_bytes.append(row[4])
+            rx_pkts.append(row[5])
+            rx_bytes.append(row[6])
+        return cls(list(ids), *columns)
+
+    @classmethod
+    def from_log(cls, path, kinds=None, first_ms=None, last_ms=None):
+        def rows():
+            for _, _, record in iter_records(path):
+                for (logged, _, kind, _, src_ip, _, dst_ip, _,
+                     tx_pkts, tx_bytes, rx_pkts, rx_bytes) in iter_flows(record):
+                    if kinds is not None and kind not in kinds:
+                        continue
+                    if (first_ms is not None and logged < first_ms) or (last_ms is not None and logged > last_ms):
+                        continue
+                    yield logged, src_ip, dst_ip, tx_pkts, tx_bytes, rx_pkts, rx_bytes
+        return cls.from_rows(rows())
+
+    @classmethod
+    def from_db(cls, path, kinds=None, first_ms=None, last_ms=None):
+        conditions, params = [], []
+        if kinds is not None:
+            conditions.append(f"kind IN ({','.join('?' * len(kinds))})")
+            params += sorted(kinds)
+        if first_ms is not None:
+            conditions.append("logged >= ?")
+            params.append(first_ms)
+        if last_ms is not None:
+            conditions.append("logged <= ?")
+            params.append(last_ms)
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        db = sqlite3.connect(path)
+        try:
+            return cls.from_rows(db.execute(
+                f"SELECT logged, src_ip, dst_ip, tx_pkts, tx_bytes, rx_pkts, rx_bytes FROM flows{where}", params))
+        finally:
+            db.close()
+
+class PairBuckets:
+    """Directional totals per (node pair, time bucket), as parallel arrays.
+
+    a < b are ip ids; 'forward' is a -> b and 'reverse' is b -> a.
+    """
+
+    def __init__(self, flows, bucket_ms):
+        self.ips = flows.ips
+        self.bucket_ms = bucket_ms
+        if not len(flows):
+            empty = np.zeros(0, dtype=np.int64)
+            self.pair = self.a = self.b = self.start = self.flows = self.unanswered = empty
+            self.pkts_fwd = self.pkts_rev = self.bytes_fwd = self.bytes_rev = empty
+            return
+
+        a = np.minimum(flows.src, flows.dst)
+        b = np.maximum(flows.src, flows.dst)
+        forward = flows.src == a
+        origin = flows.logged.min() // bucket_ms * bucket_ms
+        bucket = (flows.logged - origin) // bucket_ms
+
+        # Dense pair ids first, so pair x bucket keys cannot overflow
+        pairs, pair = np.unique(a * len(self.ips) + b, return_inverse=True)
+        buckets = int(bucket.max()) + 1
+        keys, index = np.unique(pair.ravel() * buckets + bucket, return_inverse=True)
+        index = index.ravel()
+
+        def total(values):
+            return np.bincount(index, weights=values, minlength=len(keys)).astype(np.int64)
+
+        self.pair = keys // buckets
+        self.a = pairs[self.pair] // len(self.ips)
+        self.b = pairs[self.pair] % len(self.ips)
+        self.start = origin + (keys % buckets) * bucket_ms
+        self.flows = np.bincount(index, minlength=len(keys)).astype(np.int64)
+        self.pkts_fwd = total(np.where(forward, flows.tx_pkts, flows.rx_pkts))
+        self.pkts_rev = total(np.where(forward, flows.rx_pkts, flows.tx_pkts))
+        self.bytes_fwd = total(np.where(forward, flows.tx_bytes, flows.rx_bytes))
+        self.bytes_rev = total(np.where(forward, flows.rx_bytes, flows.tx_bytes))
+        # Sent something, got nothing back: a SYN that was never answered
+        self.unanswered = total(((flows.tx_pkts > 0) & (flows.rx_pkts == 0)).astype(np.int64))
+
+    def __len__(self):
+        return len(self.start)
+
+def classify(fwd, rev, ratio, min_packets):
+    """Status per row for directional packet counts"""
+    high = np.maximum(fwd, rev)
+    low = np.minimum(fwd, rev)
+    status = np.full(len(fwd), SYMMETRIC, dtype=np.int8)
+    status[high >= low * ratio] = ASYMMETRIC
+    status[low == 0] = ONE_WAY
+    status[fwd + rev < min_packets] = QUIET
+    return status
+
+def summarize_pairs(buckets, status, ratio, min_packets):
+    """Whole-window totals per pair, plus how many of its buckets were flagged"""
+    pairs = len(buckets) and int(buckets.pair.max()) + 1
+    first = np.full(pairs, np.iinfo(np.int64).max)
+    first_row = np.searchsorted(buckets.pair, np.arange(pairs))  # rows are sorted by pair, then bucket
+    flagged = status >= ASYMMETRIC
+    np.minimum.at(first, buckets.pair[flagged], buckets.start[flagged])
+
+    def total(values):
+        return np.bincount(buckets.pair, weights=values, minlength=pairs).astype(np.int64)
+
+    summary = {
+        'a': buckets.a[first_row], 'b': buckets.b[first_row],
+        'flows': total(buckets.flows), 'unanswered': total(buckets.unanswered),
+        'pkts_fwd': total(buckets.pkts_fwd), 'pkts_rev': total(buckets.pkts_rev),
+        'bytes_fwd': total(buckets.bytes_fwd), 'bytes_rev': total(buckets.bytes_rev),
+        'buckets': np.bincount(buckets.pair, minlength=pairs),
+        'flagged': np.bincount(buckets.pair, weights=flagged, minlength=pairs).astype(np.int64),
+        'first_flagged': first,
+    }
+    summary['status'] = classify(summary['pkts_fwd'], summary['pkts_rev'], ratio, min_packets)
+    return summary
+
+def oriented(a, b, fwd, rev):
+    """Name the heavier sender first"""
+    return (a, b, fwd, rev) if fwd >= rev else (b, a, rev, fwd)
+
+def print_report(buckets, summary, top):
+    ips = buckets.ips
+    status = summary['status']
+    counts = {name: int((status == code).sum()) for code, name in STATUS_NAMES.items()}
+    print(f"Node pairs:         {len(status)} ({counts['one-way']} one-way, {counts['asymmetric']} asymmetric, "
+          f"{counts['symmetric']} symmetric, {counts['quiet']} quiet)")
+    print(f"Pair x bucket rows: {len(buckets)} ({buckets.bucket_ms // 1000}s buckets)")
+    print()
+
+    # One-way first, then asymmetric; heaviest traffic first within each
+    volume = summary['pkts_fwd'] + summary['pkts_rev']
+    order = np.lexsort((-volume, -status))
+    order = order[status[order] >= ASYMMETRIC][:top]
+    if not len(order):
+        print("No asymmetric or one-way pairs.")
+        return
+    print(f"Top {len(order)} flagged pairs (heavier sender first):")
+    print(f"  {'status':<10} {'from':<28} {'to':<28} {'pkts ->':>10} {'pkts <-':>10} {'ratio':>8} "
+          f"{'flows':>8} {'unanswered':>10} {'flagged':>9}  first flagged")
+    for i in order:
+        a, b, out_pkts, in_pkts = oriented(summary['a'][i], summary['b'][i],
+                                           summary['pkts_fwd'][i], summary['pkts_rev'][i])
+        pair_ratio = f"{out_pkts / in_pkts:.1f}" if in_pkts else 'inf'
+        print(f"  {STATUS_NAMES[int(status[i])]:<10} {ips[a]:<28} {ips[b]:<28} {out_pkts:>10} {in_pkts:>10} "
+              f"{pair_ratio:>8} {summary['flows'][i]:>8} {summary['unanswered'][i]:>10} "
+              f"{summary['flagged'][i]:>4}/{summary['buckets'][i]:<4}  "
+              f"{format_time(int(summary['first_flagged'][i])) if summary['flagged'][i] else '-'}")
+
+def write_csv(path, buckets, status):
+    ips = buckets.ips
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('bucket', 'from', 'to', 'status', 'flows', 'unanswered',
+                         'pkts_out', 'pkts_in', 'bytes_out', 'bytes_in'))
+        for i in np.lexsort((buckets.pair, buckets.start)):
+            a, b, out_pkts, in_pkts = oriented(buckets.a[i], buckets.b[i], buckets.pkts_fwd[i], buckets.pkts_rev[i])
+            out_bytes, in_bytes = ((buckets.bytes_fwd[i], buckets.bytes_rev[i]) if a == buckets.a[i]
+                                   else (buckets.bytes_rev[i], buckets.bytes_fwd[i]))
+            writer.writerow((format_time(int(buckets.start[i])), ips[a], ips[b], STATUS_NAMES[int(status[i])],
+                             buckets.flows[i], buckets.unanswered[i], out_pkts, in_pkts, out_bytes, in_bytes))
+
+def select_ip(flows, ip):
+    """Only the flows with ip at either end"""
+    if ip not in flows.ips:
+        return FlowColumns(flows.ips, *([] for _ in range(7)))
+    target = flows.ips.index(ip)
+    keep = (flows.src == target) | (flows.dst == target)
+    return FlowColumns(flows.ips, flows.logged[keep], flows.src[keep], flows.dst[keep], flows.tx_pkts[keep],
+                       flows.tx_bytes[keep], flows.rx_pkts[keep], flows.rx_bytes[keep])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Asymmetric and one-way path detection for every node pair',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('Usage:')[1])
+    parser.add_argument('logfile', nargs='?', help='flow log to parse (or use --db)')
+    parser.add_argument('--db', help='read flows from a flow_index.py store instead')
+    parser.add_argument('--kind', help=f"comma-separated traffic kinds: {', '.join(KINDS)} (default: all)")
+    parser.add_argument('--from', dest='start', metavar='TIME', help='logged at or after (ISO 8601)')
+    parser.add_argument('--to', dest='end', metavar='TIME', help='logged at or before (ISO 8601)')
+    parser.add_argument('--ip', help='only pairs with this address at one end')
+    parser.add_argument('--bucket', type=int, default=60, metavar='SECONDS', help='time bucket (default: 60)')
+    parser.add_argument('--ratio', type=float, default=10.0,
+                        help='packets one way / the other that counts as asymmetric (default: 10)')
+    parser.add_argument('--min-packets', type=int, default=10,
+                        help='pairs or buckets with fewer packets in total are not judged (default: 10)')
+    parser.add_argument('--top', type=int, default=20, help='flagged pairs listed (default: 20)')
+    parser.add_argument('--csv', metavar='PATH', help='write every pair x bucket row to PATH')
+    args = parser.parse_args()
+    if bool(args.logfile) == bool(args.db):
+        parser.error('give either a flow log or --db')
+
+    kinds = None
+    if args.kind:
+        try:
+            kinds = frozenset(KINDS.index(kind) for kind in args.kind.split(','))
+        except ValueError:
+            parser.error(f"--kind: choose from {', '.join(KINDS)}")
+    first_ms = parse_time(args.start) if args.start else None
+    last_ms = parse_time(args.end) if args.end else None
+
+    start = time.time()
+    if args.db:
+        flows = FlowColumns.from_db(args.db, kinds, first_ms, last_ms)
+    else:
+        flows = FlowColumns.from_log(args.logfile, kinds, first_ms, last_ms)
+    if args.ip:
+        flows = select_ip(flows, args.ip)
+    loaded = time.time()
+    buckets = PairBuckets(flows, args.bucket * 1000)
+    status = classify(buckets.pkts_fwd, buckets.pkts_rev, args.ratio, args.min_packets)
+    summary = summarize_pairs(buckets, status, args.ratio, args.min_packets)
+    print(f"Loaded {len(flows)} flows ({len(flows.ips)} addresses) in {loaded - start:.1f}s, "
+          f"analyzed in {time.time() - loaded:.2f}s")
+    print()
+    try:
+        print_report(buckets, summary, args.top)
+    except BrokenPipeError:  # | head
+        sys.stderr.close()
+    if args.csv:
+        write_csv(args.csv, buckets, status)
+        print()
+        print(f"Pair x bucket rows written to {args.csv}")
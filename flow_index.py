@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite store for Tailscale network flow logs
+Parses each flow log once into flows.db (one row per flow, indexed by
+src/dst IP and port, traffic kind and logged time) so pair, window and count questions
+answer in milliseconds instead of a full jq pass per question. Re-running
+ingest only reads what was appended since the last run.
+
+Usage:
+  python3 flow_index.py ingest LOGS/tailscale_network_flow_logfile.txt
+  python3 flow_index.py flows --src 100.85.22.116 --dst 172.16.4.207 --kind subnet --limit 20
+  python3 flow_index.py count --dst 100.97.54.81 --kind subnet,physical
+  python3 flow_index.py count --dst 172.16.4.207 --dst-port 1433 --kind subnet --tx-pkts 1
+  python3 flow_index.py sum --src 100.97.54.81 --dst 65.51.181.220 --kind physical \\
+      --from 2025-10-21T05:50:00Z --to 2025-10-21T06:30:00Z
+  python3 flow_index.py distinct dst --src 100.97.54.81 --kind physical
+
+IP filters match the address exactly, or every address with that prefix when
+they end in '.', ':' or '*' (e.g. --dst 172.16.).
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from flow_logs import KINDS, format_time, iter_flows, iter_records, parse_time
+
+DEFAULT_DB = 'flows.db'
+BATCH_ROWS = 50000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flows (
+    logged   INTEGER NOT NULL,  -- epoch ms of the log record
+    node     TEXT,
+    kind     INTEGER NOT NULL,  -- index into flow_logs.KINDS
+    proto    INTEGER,
+    src_ip   TEXT,
+    src_port INTEGER,
+    dst_ip   TEXT,
+    dst_port INTEGER,
+    tx_pkts  INTEGER,
+    tx_bytes INTEGER,
+    rx_pkts  INTEGER,
+    rx_bytes INTEGER,
+    file     INTEGER            -- files.id of the log it came from
+);
+CREATE TABLE IF NOT EXISTS files (
+    id       INTEGER PRIMARY KEY,
+    path     TEXT UNIQUE NOT NULL,
+    inode    INTEGER,
+    offset   INTEGER,           -- byte just after the last ingested record
+    in_array INTEGER,           -- offset is inside a {"logs": [...]} wrapper
+    records  INTEGER,
+    flows    INTEGER
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS flows_pair ON flows (src_ip, dst_ip, kind, logged);
+CREATE INDEX IF NOT EXISTS flows_dst ON flows (dst_ip, kind, logged);
+CREATE INDEX IF NOT EXISTS flows_logged ON flows (logged, kind);
+CREATE INDEX IF NOT EXISTS flows_dst_port ON flows (dst_ip, dst_port, kind, logged);
+CREATE INDEX IF NOT EXISTS flows_file ON flows (file);
+"""
+
+def connect(path):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    return db
+
+def ingest(db, path, quiet=False):
+    """Append the flows of every complete record past the file's checkpoint"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    row = db.execute("SELECT inode, offset, in_array, records, flows, id FROM files WHERE path = ?",
+                     (path,)).fetchone()
+    offset, in_array, records, flows = 0, False, 0, 0
+    if row and row[0] == stat.st_ino and row[1] <= stat.st_size:
+        _, offset, in_array, records, flows, file_id = row
+    elif row:
+        # Replaced or truncated: a new batch under the same name replaces the old rows
+        file_id = row[5]
+        deleted = db.execute("DELETE FROM flows WHERE file = ?", (file_id,)).rowcount
+        db.execute("UPDATE files SET inode = ?, offset = 0, in_array = 0, records = 0, flows = 0 WHERE id = ?",
+                   (stat.st_ino, file_id))
+        db.commit()
+        print(f"{path}: file was replaced, dropped its {deleted} stored flows and reading it from the start")
+    else:
+        file_id = db.execute("INSERT INTO files (path, inode, offset, in_array, records, flows) "
+                             "VALUES (?, ?, 0, 0, 0, 0)", (path, stat.st_ino)).lastrowid
+        db.commit()
+
+    if offset == stat.st_size:
+        if not quiet:
+            print(f"{path}: up to date ({records} records, {flows} flows)")
+        return 0
+
+    # Bulk loads are much faster into an unindexed table
+    fresh = db.execute("SELECT 1 FROM flows LIMIT 1").fetchone() is None
+    if fresh:
+        for name in ('flows_pair', 'flows_dst', 'flows_logged', 'flows_dst_port', 'flows_file'):
+            db.execute(f"DROP INDEX IF EXISTS {name}")
+    db.execute("PRAGMA synchronous = OFF")
+    db.execute("PRAGMA journal_mode = WAL")
+
+    start = time.time()
+    batch = []
+    new_records = new_flows = 0
+    end, end_in_array = offset, in_array
+
+    def flush():
+        nonlocal batch
+        db.executemany("INSERT INTO flows VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)", batch)
+        # Checkpoint in the same transaction as the rows it covers
+        db.execute("UPDATE files SET offset = ?, in_array = ?, records = ?, flows = ? WHERE id = ?",
+                   (end, int(end_in_array), records + new_records, flows + new_flows, file_id))
+        db.commit()
+        batch = []
+
+    for end, end_in_array, record in iter_records(path, offset, bool(in_array)):
+        new_records += 1
+        for flow in iter_flows(record):
+            batch.append(flow + (file_id,))
+        if len(batch) >= BATCH_ROWS:
+            new_flows += len(batch)
+            flush()
+    new_flows += len(batch)
+    flush()
+
+    if new_records:
+        print(f"{path}: +{new_records} records, +{new_flows} flows in {time.time() - start:.1f}s")
+    elif not quiet:
+        print(f"{path}: up to date ({records} records, {flows} flows)")
+    if fresh or new_flows:
+        db.executescript(INDEXES)
+        db.execute("ANALYZE")
+        db.commit()
+    return new_flows
+
+def ip_condition(column, value):
+    """Exact address, or a prefix range that still uses the index"""
+    if value.endswith('*'):
+        value = value[:-1]
+    elif not value.endswith(('.', ':')):
+        return f"{column} = ?", [value]
+    # chr(0x10FFFF) sorts after anything that can follow the prefix
+    return f"{column} >= ? AND {column} < ?", [value, value + chr(0x10FFFF)]
+
+def where_clause(args):
+    conditions, params = [], []
+    if args.src:
+        condition, values = ip_condition('src_ip', args.src)
+        conditions.append(condition)
+        params += values
+    if args.dst:
+        condition, values = ip_condition('dst_ip', args.dst)
+        conditions.append(condition)
+        params += values
+    if args.src_port is not None:
+        conditions.append("src_port = ?")
+        params.append(args.src_port)
+    if args.dst_port is not None:
+        conditions.append("dst_port = ?")
+        params.append(args.dst_port)
+    if args.kind:
+        kinds = [KINDS.index(kind) for kind in args.kind.split(',')]
+        conditions.append(f"kind IN ({','.join('?' * len(kinds))})")
+        params += kinds
+    if args.start:
+        conditions.append("logged >= ?")
+        params.append(parse_time(args.start))
+    if args.end:
+        conditions.append("logged <= ?")
+        params.append(parse_time(args.end))
+    if args.after:
+        conditions.append("logged > ?")
+        params.append(parse_time(args.after))
+    if args.before:
+        conditions.append("logged < ?")
+        params.append(parse_time(args.before))
+    if args.tx_pkts is not None:
+        conditions.append("tx_pkts = ?")
+        params.append(args.tx_pkts)
+    if args.min_tx_pkts is not None:
+        conditions.append("tx_pkts >= ?")
+        params.append(args.min_tx_pkts)
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+def endpoint(ip, port):
+    return f"[{ip}]:{port}" if ':' in ip else f"{ip}:{port}"
+
+def command_flows(db, args):
+    where, params = where_clause(args)
+    sql = (f"SELECT logged, kind, proto, src_ip, src_port, dst_ip, dst_port, tx_pkts, tx_bytes, rx_pkts, rx_bytes "
+           f"FROM flows{where} ORDER BY logged")
+    if args.limit:
+        sql += f" LIMIT {int(args.limit)}"
+    for logged, kind, proto, src_ip, src_port, dst_ip, dst_port, tx_pkts, tx_bytes, rx_pkts, rx_bytes \
+            in db.execute(sql, params):
+        print(json.dumps({'time': format_time(logged), 'kind': KINDS[kind], 'src': endpoint(src_ip, src_port),
+                          'dst': endpoint(dst_ip, dst_port), 'proto': proto, 'txPkts': tx_pkts,
+                          'txBytes': tx_bytes, 'rxPkts': rx_pkts, 'rxBytes': rx_bytes}))
+
+def command_count(db, args):
+    where, params = where_clause(args)
+    print(db.execute(f"SELECT COUNT(*) FROM flows{where}", params).fetchone()[0])
+
+def command_sum(db, args):
+    where, params = where_clause(args)
+    flows, tx_pkts, tx_bytes, rx_pkts, rx_bytes = db.execute(
+        f"SELECT COUNT(*), TOTAL(tx_pkts), TOTAL(tx_bytes), TOTAL(rx_pkts), TOTAL(rx_bytes) FROM flows{where}",
+        params).fetchone()
+    print(json.dumps({'flows': flows, 'tx': int(tx_pkts), 'rx': int(rx_pkts),
+                      'txBytes': int(tx_bytes), 'rxBytes': int(rx_bytes)}))
+
+def command_distinct(db, args):
+    where, params = where_clause(args)
+    column = 'dst' if args.column == 'dst' else 'src'
+    for ip, port in db.execute(f"SELECT DISTINCT {column}_ip, {column}_port FROM flows{where} ORDER BY 1, 2", params):
+        print(endpoint(ip, port))
+
+def command_ingest(db, args):
+    for path in args.files:
+        ingest(db, path, args.quiet)
+
+def command_info(db, args):
+    for path, offset, records, flows in db.execute("SELECT path, offset, records, flows FROM files ORDER BY path"):
+        print(f"{path}: {records} records, {flows} flows, {offset} bytes read")
+    first, last, total = db.execute("SELECT MIN(logged), MAX(logged), COUNT(*) FROM flows").fetchone()
+    if total:
+        print(f"{total} flows from {format_time(first)} to {format_time(last)}")
+        for kind, count in db.execute("SELECT kind, COUNT(*) FROM flows GROUP BY kind"):
+            print(f"  {KINDS[kind]:<9} {count}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Indexed store for Tailscale network flow logs',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('Usage:')[1])
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'SQLite database (default: {DEFAULT_DB})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = commands.add_parser('ingest', help='add new records from flow log files')
+    ingest_parser.add_argument('files', nargs='+')
+    ingest_parser.add_argument('--quiet', action='store_true', help='no output when a file is up to date')
+    ingest_parser.set_defaults(handler=command_ingest)
+    commands.add_parser('info', help='what has been ingested').set_defaults(handler=command_info)
+
+    for name, handler, help_text in (('flows', command_flows, 'matching flows as JSON lines, oldest first'),
+                                     ('count', command_count, 'number of matching flows'),
+                                     ('sum', command_sum, 'flow count and tx/rx totals as JSON'),
+                                     ('distinct', command_distinct, 'unique src or dst endpoints')):
+        query_parser = commands.add_parser(name, help=help_text)
+        if name == 'distinct':
+            query_parser.add_argument('column', choices=('src', 'dst'))
+        query_parser.add_argument('--src', help='source IP, or prefix ending in . : or *')
+        query_parser.add_argument('--dst', help='destination IP, or prefix ending in . : or *')
+        query_parser.add_argument('--src-port', type=int, help='source port')
+        query_parser.add_argument('--dst-port', type=int, help='destination port')
+        query_parser.add_argument('--kind', help=f"comma-separated traffic kinds: {', '.join(KINDS)}")
+        query_parser.add_argument('--from', dest='start', metavar='TIME', help='logged at or after (ISO 8601)')
+        query_parser.add_argument('--to', dest='end', metavar='TIME', help='logged at or before (ISO 8601)')
+        query_parser.add_argument('--after', metavar='TIME', help='logged strictly after')
+        query_parser.add_argument('--before', metavar='TIME', help='logged strictly before')
+        query_parser.add_argument('--tx-pkts', type=int, help='exactly this many tx packets (1 = SYN only)')
+        query_parser.add_argument('--min-tx-pkts', type=int, help='at least this many tx packets')
+        if name == 'flows':
+            query_parser.add_argument('--limit', type=int, help='at most this many flows')
+        query_parser.set_defaults(handler=handler)
+
+    args = parser.parse_args()
+    if getattr(args, 'kind', None) and not set(args.kind.split(',')) <= set(KINDS):
+        parser.error(f"--kind: choose from {', '.join(KINDS)}")
+    db = connect(args.db)
+    try:
+        args.handler(db, args)
+    except BrokenPipeError:  # | head
+        sys.stderr.close()
+    finally:
+        db.close()
@@ -0,0 +1,191 @@
+"""
+Streaming reader for Tailscale network flow logs
+
+The exports in LOGS/ are one big {"logs": [ ... ]} document; the log stream
+API produces one log object per line. Both are read here one log record at a
+time, so memory is bounded by the largest single record rather than the
+file. Each record carries its position, so a reader can stop and later
+resume right after the last complete record when more batches are appended.
+
+A log record holds up to four traffic lists; every entry is one flow:
+
+  {"logged": "2025-10-21T05:50:02.1Z", "nodeId": "n...",
+   "subnetTraffic": [{"proto": 6, "src": "100.85.22.116:51234",
+                      "dst": "172.16.4.207:1433", "txPkts": 1, "txBytes": 60}], ...}
+
+Files are decoded as latin-1 so character and byte offsets are the same;
+flow logs are ASCII.
+"""
+
+import contextlib
+import datetime
+import json
+import re
+
+# Traffic list -> kind, in the order Tailscale documents them
+KINDS = ('virtual', 'subnet', 'exit', 'physical')
+TRAFFIC_KEYS = tuple(f'{kind}Traffic' for kind in KINDS)
+
+CHUNK_SIZE = 1 << 20
+MAX_RECORD = 256 << 20  # a "record" this big means the file is corrupt, not slow
+
+_SEPARATORS = re.compile(r'[\s,]*')
+_WRAPPER = re.compile(r'\{\s*"logs"\s*:\s*\[')
+_decoder = json.JSONDecoder()
+
+def parse_time(text):
+    """ISO 8601 ('2025-10-21T05:50:00.123456789Z') -> epoch milliseconds"""
+    return int(datetime.datetime.fromisoformat(text).timestamp() * 1000)
+
+def format_time(ms):
+    return datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')[:-4] + 'Z'
+
+def split_endpoint(endpoint):
+    """'1.2.3.4:443' -> ('1.2.3.4', 443); '[fd7a::1]:41641' -> ('fd7a::1', 41641)"""
+    host, _, port = endpoint.rpartition(':')
+    if not host:
+        return endpoint, 0
+    return host.strip('[]'), int(port) if port.isdigit() else 0
+
+def ip_matcher(value):
+    """Predicate for an exact address, or a prefix ending in '.', ':' or '*'; None for no filter"""
+    if not value:
+        return None
+    if value.endswith('*'):
+        prefix = value[:-1]
+        return lambda ip: ip.startswith(prefix)
+    if value.endswith(('.', ':')):
+        return lambda ip: ip.startswith(value)
+    return lambda ip: ip == value
+
+def iter_records(path, offset=0, in_array=False, chunk_size=CHUNK_SIZE, stop=None):
+    """Yield (end offset, in_array, record) for every complete log record.
+
+    Pass the last end offset and in_array back to resume after it. A record
+    still being written at the end of the file is not yielded. With stop,
+    records starting at or after that offset are left for another reader.
+    path may also be an open binary file or mmap.
+    """
+    source = open(path, 'rb') if isinstance(path, str) else contextlib.nullcontext(path)
+    with source as f:
+        f.seek(offset)
+        buf = ''
+        base = offset  # file offset of buf[0]
+        pos = 0
+        eof = False
+
+        def fill():
+            nonlocal buf, base, pos, eof
+            data = f.read(chunk_size)
+            if not data:
+                eof = True
+                return
+            buf = buf[pos:] + data.decode('latin-1')
+            base += pos
+            pos = 0
+
+        while True:
+            if len(buf) - pos < 4096 and not eof:
+                fill()
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos >= len(buf):
+                if eof:
+                    return
+                fill()
+                continue
+
+            if in_array:
+                if buf[pos] == ']':
+                    # End of the logs array; step over the wrapper's closing brace
+                    end = buf.find('}', pos)
+                    if end < 0:
+                        if eof:
+                            return
+                        fill()
+                        continue
+                    pos = end + 1
+                    in_array = False
+                    continue
+            else:
+                wrapper = _WRAPPER.match(buf, pos)
+                if wrapper:
+                    pos = wrapper.end()
+                    in_array = True
+                    continue
+
+            if stop is not None and base + pos >= stop:
+                return
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    return  # truncated tail: picked up on the next resume
+                if len(buf) - pos > MAX_RECORD:
+                    raise ValueError(f'{path}: no complete JSON record at byte {base + pos}')
+                # Record straddles the buffer: grow it until the record fits
+                data = f.read(max(chunk_size, len(buf)))
+                if not data:
+                    eof = True
+                else:
+                    buf += data.decode('latin-1')
+                continue
+            pos = end
+            if not in_array and isinstance(value, dict) and isinstance(value.get('logs'), list):
+                # A wrapper whose "logs" isn't the first key: decoded whole
+                for record in value['logs']:
+                    yield base + pos, False, record
+                continue
+            yield base + pos, in_array, value
+
+def starts_in_array(head):
+    """True for a {"logs": [...]} export, given its first bytes"""
+    return bool(_WRAPPER.match(head.decode('latin-1').lstrip()))
+
+def record_boundaries(mm, chunk_size):
+    """Offsets splitting a memory-mapped log into chunks of about chunk_size,
+    each on the first byte of a log record.
+
+    Log records are written with a consistent key order, so every record
+    starts with the same '{"key":' as the first one, and those top-level keys
+    never appear inside a flow entry.
+    """
+    head = mm[:64 * 1024].decode('latin-1')
+    wrapper = _WRAPPER.match(head.lstrip())
+    first = head.find('{', wrapper.end() + len(head) - len(head.lstrip()) if wrapper else 0)
+    key_end = head.find(':', first)
+    if first < 0 or key_end < 0:
+        return [0, len(mm)]
+    marker = re.sub(r'\s+', '', head[first:key_end + 1]).encode('latin-1')
+    chunk_size = max(1, chunk_size)  # a zero step would append the same boundary forever
+    boundaries = [first]
+    target = first + chunk_size
+    while target < len(mm):
+        found = mm.find(marker, target)
+        if found < 0:
+            break
+        # Only a record if it follows a separator ('[', ',' or a newline)
+        before = found - 1
+        while before > 0 and mm[before:before + 1] in (b' ', b'\t', b'\r'):
+            before -= 1
+        if mm[before:before + 1] in (b',', b'[', b'\n'):
+            boundaries.append(found)
+            target = found + chunk_size
+        else:
+            target = found + 1
+    boundaries.append(len(mm))
+    return boundaries
+
+def iter_flows(record):
+    """(logged ms, node, kind index, proto, src ip, src port, dst ip, dst port,
+    tx pkts, tx bytes, rx pkts, rx bytes) for every flow in a log record"""
+    logged = record.get('logged')
+    if not logged:
+        return
+    logged = parse_time(logged)
+    node = record.get('nodeId', '')
+    for kind, key in enumerate(TRAFFIC_KEYS):
+        for flow in record.get(key) or ():
+            src_ip, src_port = split_endpoint(flow.get('src', ''))
+            dst_ip, dst_port = split_endpoint(flow.get('dst', ''))
+            yield (logged, node, kind, flow.get('proto', 0), src_ip, src_port, dst_ip, dst_port,
+                   flow.get('txPkts', 0), flow.get('txBytes', 0), flow.get('rxPkts', 0), flow.get('rxBytes', 0))
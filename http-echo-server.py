@@ -1,12 +1,44 @@
 from http.server import HTTPServer, BaseHTTPRequestHandler
+import argparse
 import json
+import queue
+import socket
+import threading
+import time
 from datetime import datetime
 
+from echo_metrics import Metrics
+
 HOST = '0.0.0.0'
 PORT = 8070
+STREAM_CHUNK_SIZE = 64 * 1024
+STATS_PATH = '/__stats'
+# --keepalive: idle connections are dropped after this many seconds so they
+# don't pin a pool thread forever
+KEEPALIVE_TIMEOUT = 60
+
+METRICS = Metrics('echo_http', 'request_duration_seconds', 'Time to read the request body and write the response')
 
 class EchoHandler(BaseHTTPRequestHandler):
+    # --stream: echo the raw body back instead of the JSON summary
+    stream = False
+    # Read buffer, allocated on first use and kept for the connection's later requests
+    body_buffer = None
+
+    def setup(self):
+        super().setup()
+        # Small responses on a persistent connection: don't let Nagle delay them
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        METRICS.connection_opened(self.client_address[0])
+
+    def finish(self):
+        super().finish()
+        METRICS.connection_closed(self.client_address[0])
+
     def do_GET(self):
+        if self.path == STATS_PATH:
+            self.send_stats_response()
+            return
         self.send_echo_response()
 
     def do_POST(self):
@@ -18,10 +50,38 @@ class EchoHandler(BaseHTTPRequestHandler):
     def do_DELETE(self):
         self.send_echo_response()
 
+    def send_stats_response(self):
+        """Prometheus text for everything served so far (not counted itself)"""
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', len(body))
+        self.end_headers()
+        self.wfile.write(body)
+
     def send_echo_response(self):
-        # Read request body
-        content_length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(content_length).decode('utf-8') if content_length > 0 else ''
+        start = time.perf_counter()
+        if self.stream:
+            received = sent = self.send_stream_response()
+        else:
+            received, sent = self.send_json_response()
+        METRICS.add_bytes(self.client_address[0], received, sent)
+        METRICS.observe_request(self.client_address[0], time.perf_counter() - start)
+
+    def send_json_response(self):
+        """Echo the request as a JSON document; returns (body bytes in, bytes out)"""
+        # Read request body. Always consume the whole body (Content-Length or
+        # chunked) so the next pipelined request on a keep-alive connection
+        # starts in the right place
+        if self.is_chunked():
+            raw = b''.join(bytes(piece) for piece in self.iter_body(self.get_body_buffer()))
+        else:
+            length = int(self.headers.get('Content-Length', 0))
+            raw = self.rfile.read(length) if length > 0 else b''
+            if len(raw) < length:
+                raise ConnectionError('client closed the connection mid-body')
+        content_length = len(raw)
+        body = raw.decode('utf-8', errors='replace')
 
         # Build response
         response_data = {
@@ -33,26 +93,163 @@ class EchoHandler(BaseHTTPRequestHandler):
             'client': f"{self.client_address[0]}:{self.client_address[1]}"
         }
 
-        response_json = json.dumps(response_data, indent=2)
+        response_json = json.dumps(response_data, indent=2).encode()
 
         # Send HTTP response
         self.send_response(200)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Content-Length', len(response_json))
         self.end_headers()
-        self.wfile.write(response_json.encode())
+        self.wfile.write(response_json)
 
         # Log to console
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {self.command} {self.path} from {self.client_address[0]}")
         if body:
             print(f"  Body: {body[:100]}{'...' if len(body) > 100 else ''}")
 
+        return content_length, len(response_json)
+
+    def get_body_buffer(self):
+        if self.body_buffer is None:
+            self.body_buffer = bytearray(STREAM_CHUNK_SIZE)
+        return self.body_buffer
+
+    def is_chunked(self):
+        return 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+
+    def read_exact(self, remaining, buf):
+        """Yield views of buf until `remaining` body bytes have been read"""
+        view = memoryview(buf)
+        while remaining > 0:
+            n = self.rfile.readinto(view[:min(remaining, len(buf))])
+            if not n:
+                raise ConnectionError('client closed the connection mid-body')
+            remaining -= n
+            yield view[:n]
+
+    def iter_body(self, buf):
+        """Yield the request body (Content-Length or chunked) in bounded pieces"""
+        if not self.is_chunked():
+            yield from self.read_exact(int(self.headers.get('Content-Length', 0)), buf)
+            return
+
+        while True:
+            size_line = self.rfile.readline(65537)
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # Skip any trailers up to the terminating blank line
+                while self.rfile.readline(65537) not in (b'\r\n', b'\n', b''):
+                    pass
+                return
+            yield from self.read_exact(size, buf)
+            self.rfile.readline(65537)  # CRLF after the chunk data
+
+    def send_stream_response(self):
+        """Copy the body straight back to the client, one buffer at a time.
+
+        Memory use is one STREAM_CHUNK_SIZE buffer per connection whatever the
+        body size. The response is written while the upload is still arriving,
+        so the client has to read concurrently (curl does). Returns the bytes copied.
+        """
+        start = time.time()
+        chunked = self.is_chunked()
+        chunked_out = chunked and self.request_version == 'HTTP/1.1' and self.protocol_version == 'HTTP/1.1'
+
+        self.send_response(200)
+        self.send_header('Content-Type', self.headers.get('Content-Type', 'application/octet-stream'))
+        if not chunked:
+            self.send_header('Content-Length', self.headers.get('Content-Length', '0'))
+        elif chunked_out:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            # HTTP/1.0 has no chunked encoding: delimit the body by closing
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+
+        total = 0
+        try:
+            for view in self.iter_body(self.get_body_buffer()):
+                if chunked_out:
+                    self.wfile.write(b'%x\r\n' % len(view))
+                    self.wfile.write(view)
+                    self.wfile.write(b'\r\n')
+                else:
+                    self.wfile.write(view)
+                total += len(view)
+            if chunked_out:
+                self.wfile.write(b'0\r\n\r\n')
+        except (ValueError, ConnectionError) as e:
+            # Malformed chunk or truncated upload: the response can't be completed
+            self.close_connection = True
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {self.command} {self.path} from {self.client_address[0]} aborted after {total} bytes: {e}")
+            return total
+
+        elapsed = time.time() - start
+        rate = total / elapsed / 1e6 if elapsed > 0 else 0
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {self.command} {self.path} from {self.client_address[0]} "
+              f"streamed {total} bytes in {elapsed:.2f}s ({rate:.1f} MB/s)")
+        return total
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed pool of worker threads.
+
+    With HTTP/1.1 a worker stays with its connection until the client closes
+    it or it idles out, so the pool size caps concurrent connections.
+    """
+
+    def __init__(self, server_address, handler_class, pool_size):
+        super().__init__(server_address, handler_class)
+        self.pending = queue.Queue()
+        for i in range(pool_size):
+            threading.Thread(target=self._worker, name=f'echo-{i + 1}', daemon=True).start()
+
+    def process_request(self, request, client_address):
+        self.pending.put((request, client_address))
+
+    def _worker(self):
+        while True:
+            request, client_address = self.pending.get()
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
 if __name__ == '__main__':
-    server = HTTPServer((HOST, PORT), EchoHandler)
-    print(f"HTTP Echo Server running on {HOST}:{PORT}")
+    parser = argparse.ArgumentParser(description='HTTP echo server')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--keepalive', action='store_true',
+                        help='speak HTTP/1.1 with persistent connections (default: HTTP/1.0, close per request)')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='serve connections from a pool of N threads (default: single-threaded)')
+    parser.add_argument('--stream', action='store_true',
+                        help='echo raw request bodies back in bounded chunks (binary-safe, chunked encoding supported)')
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE,
+                        help='copy buffer for --stream in bytes (default: 65536)')
+    args = parser.parse_args()
+    PORT = args.port
+    STREAM_CHUNK_SIZE = args.chunk_size
+    EchoHandler.stream = args.stream
+
+    if args.keepalive:
+        EchoHandler.protocol_version = 'HTTP/1.1'
+        EchoHandler.timeout = KEEPALIVE_TIMEOUT
+
+    if args.threads > 0:
+        server = PooledHTTPServer((HOST, PORT), EchoHandler, args.threads)
+    else:
+        server = HTTPServer((HOST, PORT), EchoHandler)
+    mode = f"{EchoHandler.protocol_version}, {f'{args.threads} threads' if args.threads > 0 else 'single-threaded'}"
+    if args.stream:
+        mode += ', streaming echo'
+    print(f"HTTP Echo Server running on {HOST}:{PORT} ({mode})")
     print(f"Test with: curl http://localhost:{PORT}/test")
+    print(f"Metrics:   curl http://localhost:{PORT}{STATS_PATH}")
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down server...")
         server.shutdown()
+        server.server_close()
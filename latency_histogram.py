@@ -0,0 +1,104 @@
+"""
+Fixed-memory latency histogram for the test-mssql scripts
+
+HDR-style log-linear buckets: exact below 128us, then 64 sub-buckets per power
+of two, so any recorded value is reported within ~1.6%. Memory is one list of
+ints whatever the run length, recording is O(1), and histograms from different
+workers merge by adding bucket counts.
+"""
+
+SUB_BUCKETS = 128
+HALF = SUB_BUCKETS // 2
+SUB_BUCKET_BITS = SUB_BUCKETS.bit_length() - 1
+MAX_VALUE_US = 3600 * 1000 * 1000  # anything slower than an hour is clamped
+
+def _index(value_us):
+    if value_us < SUB_BUCKETS:
+        return value_us
+    shift = value_us.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF + (value_us >> shift) - HALF
+
+def _midpoint(index):
+    """Representative value (us) for a bucket"""
+    if index < SUB_BUCKETS:
+        return float(index)
+    shift = (index - SUB_BUCKETS) // HALF + 1
+    low = ((index - SUB_BUCKETS) % HALF + HALF) << shift
+    return low + ((1 << shift) - 1) / 2.0
+
+BUCKET_COUNT = _index(MAX_VALUE_US) + 1
+
+class LatencyHistogram:
+    """Millisecond latencies in constant memory; one instance per writer thread"""
+    __slots__ = ('counts', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, ms):
+        us = int(ms * 1000)
+        self.counts[_index(min(max(us, 0), MAX_VALUE_US))] += 1
+        self.total += ms
+        if self.min is None or ms < self.min:
+            self.min = ms
+        if self.max is None or ms > self.max:
+            self.max = ms
+
+    def merge(self, other):
+        """Add another histogram's samples to this one"""
+        counts = self.counts
+        for i, count in enumerate(other.counts):
+            if count:
+                counts[i] += count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def __getstate__(self):
+        # Sparse buckets keep pickles small when snapshots cross a process pipe
+        return ({i: c for i, c in enumerate(self.counts) if c}, self.total, self.min, self.max)
+
+    def __setstate__(self, state):
+        buckets, self.total, self.min, self.max = state
+        self.counts = [0] * BUCKET_COUNT
+        for i, count in buckets.items():
+            self.counts[i] = count
+
+    def copy(self):
+        return LatencyHistogram().merge(self)
+
+    @classmethod
+    def merged(cls, histograms):
+        total = cls()
+        for histogram in list(histograms):
+            total.merge(histogram)
+        return total
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    @property
+    def mean(self):
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def percentile(self, pct):
+        """Latency in ms at or below which pct% of samples fall"""
+        count = self.count
+        if not count:
+            return 0.0
+        rank = min(count - 1, int(count * pct / 100.0))
+        seen = 0
+        for i, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen > rank:
+                # Never report outside the observed range
+                return min(max(_midpoint(i) / 1000.0, self.min), self.max)
+        return self.max
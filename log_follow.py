@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Tail-follow analyzer for the forwarder / tailscale-proxy logs
+Follows growing log files like tail -F, classifies every new line and keeps
+rolling 1s / 1m / 1h counters per destination (e.g. 172.16.4.207:1433):
+
+  socks_failure   client: "Failed to connect to destination ... general SOCKS server failure"
+  refused         proxy:  "socks5: client connection failed: ... connection was refused"
+  ratelimit       proxy:  "[RATELIMIT]" - tailscaled suppressing repeats of the line before it
+  forwarded       client: "Connection closed for destination ..." (a completed forward)
+
+Byte offsets are checkpointed to --state, so a restart resumes exactly
+where the last run stopped and nothing is rescanned. Rotation (new inode)
+and truncation are followed. A destination goes DOWN when its failures in
+the last minute reach --alert-failures, and is recovered once a minute
+passes without any.
+
+Usage:
+  python3 log_follow.py /var/log/forwarder.log /var/log/tailscaled.log
+  python3 log_follow.py app.log --state /var/lib/log_follow.json --report-interval 10 --alert-failures 5
+  python3 log_follow.py Choreo_Logs_2025-10-09T05_39_42.547Z_to_2025-10-09T06_40_14.992Z.log --from-start --once
+
+Lines are timed by their own Go / ISO timestamp (UTC) when they have one,
+so replaying a backlog reports DOWN / RECOVERED at the times they happened
+and the counter tables are as of the newest line read; --arrival-time times
+them by when they were read instead. Newest-first exports (Kibana) are read
+oldest first. Files are read one after another, so a destination's lines
+older than ones already seen still count but never change its state.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+from proxy_logs import classify, detect_kibana_offset, is_newest_first, iter_entries, line_time
+
+CATEGORIES = ('socks_failure', 'refused', 'ratelimit', 'forwarded')
+FAILURES = ('socks_failure', 'refused', 'ratelimit')
+WINDOWS = (('1s', 1), ('1m', 60), ('1h', 3600))
+READ_SIZE = 1 << 20
+
+class RollingCounter:
+    """Event counts over the last second, minute and hour.
+
+    Two rings of 60 slots, one per second and one per minute, each slot
+    stamped with the second or minute it holds: stale slots are skipped
+    rather than cleared, so adding is O(1). An event older than what its
+    slot already holds has left that ring's window and is not added to it.
+    """
+    __slots__ = ('seconds', 'second_stamps', 'minutes', 'minute_stamps')
+
+    def __init__(self):
+        self.seconds = [0] * 60
+        self.second_stamps = [-1] * 60
+        self.minutes = [0] * 60
+        self.minute_stamps = [-1] * 60
+
+    def add(self, t, count=1):
+        second = int(t)
+        slot = second % 60
+        if self.second_stamps[slot] < second:
+            self.second_stamps[slot] = second
+            self.seconds[slot] = 0
+        if self.second_stamps[slot] == second:
+            self.seconds[slot] += count
+        minute = second // 60
+        slot = minute % 60
+        if self.minute_stamps[slot] < minute:
+            self.minute_stamps[slot] = minute
+            self.minutes[slot] = 0
+        if self.minute_stamps[slot] == minute:
+            self.minutes[slot] += count
+
+    def total(self, now, window):
+        """Events in the last window seconds (to the second up to 60, to the minute beyond)"""
+        if window <= 60:
+            first = int(now) - window
+            return sum(count for count, stamp in zip(self.seconds, self.second_stamps) if first < stamp <= now)
+        first = int(now) // 60 - window // 60
+        return sum(count for count, stamp in zip(self.minutes, self.minute_stamps) if first < stamp <= now // 60)
+
+class Destination:
+    def __init__(self, name):
+        self.name = name
+        self.counters = {category: RollingCounter() for category in CATEGORIES}
+        self.totals = dict.fromkeys(CATEGORIES, 0)
+        self.last_failure = None
+        self.latest = None  # newest event time, the clock DOWN / RECOVERED are judged on
+        self.down_since = None
+        self.outages = 0
+
+    def add(self, category, t):
+        self.counters[category].add(t)
+        self.totals[category] += 1
+        if category in FAILURES and (self.last_failure is None or t > self.last_failure):
+            self.last_failure = t
+
+    def failures(self, now, window):
+        return sum(self.counters[category].total(now, window) for category in FAILURES)
+
+class Follower:
+    """One followed file: its open handle, checkpointed offset and unfinished last line"""
+
+    def __init__(self, path, checkpoint, from_start):
+        self.path = path
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.partial = b''
+        self.backlog = None  # (UTC ms, line) generator read out of file order when opened
+        self.last_destination = None  # what a following [RATELIMIT] line refers to
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return  # opened from the start once it appears
+        if checkpoint and checkpoint['inode'] == stat.st_ino and checkpoint['offset'] <= stat.st_size:
+            self.open(checkpoint['offset'])
+        elif checkpoint:
+            print(f"{path}: replaced since the last checkpoint, reading it from the start")
+            self.open(0)
+        else:
+            self.open(0 if from_start else stat.st_size)
+
+    def open(self, offset):
+        self.close()
+        self.file = open(self.path, 'rb')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.backlog = None
+        if offset == 0 and is_newest_first(self.path):
+            # An export listed newest first (Kibana): take it oldest first, then follow from its end
+            kibana_offset = detect_kibana_offset([self.path]) or 0
+            self.backlog = iter_entries(self.path, kibana_offset)
+            offset = os.fstat(self.file.fileno()).st_size
+        self.file.seek(offset)
+        self.offset = offset
+        self.partial = b''
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def drain(self):
+        """(UTC ms or None, line) for the complete lines appended since the last
+        call; offset stays on a line start. A newest-first backlog comes first,
+        about READ_SIZE bytes of it per call."""
+        lines = []
+        if self.backlog is not None:
+            size = 0
+            for entry in self.backlog:
+                lines.append(entry)
+                size += len(entry[1])
+                if size >= READ_SIZE:
+                    return lines
+            self.backlog = None
+        while True:
+            data = self.file.read(READ_SIZE)
+            if not data:
+                return lines
+            data = self.partial + data
+            end = data.rfind(b'\n') + 1
+            self.partial = data[end:]
+            self.offset = self.file.tell() - len(self.partial)
+            if end:
+                lines.extend((None, line) for line in data[:end].decode('utf-8', 'replace').splitlines())
+
+    def poll(self):
+        """(UTC ms or None, line) for new complete lines, following rotation and truncation"""
+        if self.backlog is not None:
+            return self.drain()  # finish the backlog before looking at the file again
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self.drain() if self.file else []  # rotated away, replacement not there yet
+        if self.file is None:
+            self.open(0)
+        elif stat.st_ino != self.inode:
+            lines = self.drain()  # the rest of the rotated file first
+            self.open(0)
+            return lines + self.drain()
+        elif stat.st_size < self.offset:
+            print(f"{self.path}: truncated, reading it from the start")
+            self.open(0)
+        return self.drain()
+
+    def checkpoint(self):
+        return {'inode': self.inode, 'offset': self.offset} if self.file else None
+
+class Analyzer:
+    def __init__(self, alert_failures, arrival_time):
+        self.destinations = {}
+        self.alert_failures = alert_failures
+        self.arrival_time = arrival_time
+        self.lines = 0
+        self.classified = 0
+        self.latest = None       # newest event time seen
+        self.latest_read = None  # wall time when it was read
+
+    def feed(self, follower, lines, now):
+        for ms, line in lines:
+            self.lines += 1
+            hit = classify(line)
+            if not hit or hit[0] not in CATEGORIES:
+                continue
+            category, destination = hit
+            if category == 'ratelimit':
+                destination = follower.last_destination
+            elif category != 'forwarded':
+                follower.last_destination = destination
+            t = now
+            if not self.arrival_time:
+                if ms is None:  # a followed line; backlog lines carry their Kibana header time
+                    ms = line_time(line)
+                if ms is not None:
+                    t = ms / 1000
+            self.record(destination or '-', category, t)
+            if self.latest is None or t > self.latest:
+                self.latest, self.latest_read = t, now
+
+    def clock(self, now):
+        """Event time at wall time now: the newest event seen, moved on by the wall time since"""
+        if self.latest is None:
+            return now
+        return self.latest + (now - self.latest_read)
+
+    def record(self, name, category, t):
+        entry = self.destinations.get(name)
+        if entry is None:
+            entry = self.destinations[name] = Destination(name)
+        # An event behind this destination's clock (another file, a skewed
+        # writer) is only counted: state changes never run backwards
+        in_order = entry.latest is None or t >= entry.latest
+        if in_order:
+            entry.latest = t
+        if in_order and entry.down_since is not None and t - entry.last_failure >= 60:
+            self.recovered(entry)
+        entry.add(category, t)
+        self.classified += 1
+        if in_order and category in FAILURES and entry.down_since is None:
+            failures = entry.failures(t, 60)
+            if failures >= self.alert_failures:
+                entry.down_since = t
+                entry.outages += 1
+                forwarded = entry.counters['forwarded'].total(t, 60)
+                print(f"[{timestamp(t)}] DOWN {entry.name}: {failures} failures in the last minute "
+                      f"({failures * 100.0 / (failures + forwarded):.0f}% of attempts)")
+
+    def recovered(self, entry):
+        quiet_from = entry.last_failure + 60
+        print(f"[{timestamp(quiet_from)}] RECOVERED {entry.name} after {quiet_from - entry.down_since:.0f}s "
+              f"(last failure {timestamp(entry.last_failure)})")
+        entry.down_since = None
+
+    def check_alerts(self, now):
+        for entry in self.destinations.values():
+            if entry.down_since is not None and now - entry.last_failure >= 60:
+                self.recovered(entry)
+
+    def print_report(self, now):
+        print()
+        print(f"[{timestamp(now)}] {self.lines} lines read, {self.classified} classified")
+        if not self.destinations:
+            return
+        print(f"  {'destination':<24} {'state':<5} {'category':<14} "
+              + ' '.join(f'{name:>7}' for name, _ in WINDOWS) + f" {'total':>9}")
+        for entry in sorted(self.destinations.values(), key=lambda e: (-e.failures(now, 3600), e.name)):
+            state = 'DOWN' if entry.down_since is not None else 'ok'
+            for category in CATEGORIES:
+                if not entry.totals[category]:
+                    continue
+                counts = ' '.join(f'{entry.counters[category].total(now, seconds):>7}' for _, seconds in WINDOWS)
+                print(f"  {entry.name:<24} {state:<5} {category:<14} {counts} {entry.totals[category]:>9}")
+                state = ''
+            if entry.outages:
+                print(f"  {'':<24} {'':<5} {'outages':<14} {entry.outages:>7}")
+
+def timestamp(t):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(t))
+
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"{path}: unreadable checkpoint, starting fresh")
+        return {}
+
+def save_state(path, followers):
+    state = {follower.path: follower.checkpoint() for follower in followers if follower.file}
+    temp = path + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp, path)  # a crash mid-write never leaves a torn checkpoint
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tail-follow analyzer with rolling per-destination error rates',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('Usage:')[1])
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--state', default='.log_follow.json', help='checkpoint file (default: .log_follow.json)')
+    parser.add_argument('--from-start', action='store_true',
+                        help='read files without a checkpoint from the beginning (default: only new lines)')
+    parser.add_argument('--once', action='store_true', help='read what is there now, report and exit')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between polls (default: 0.5)')
+    parser.add_argument('--report-interval', type=float, default=30.0,
+                        help='seconds between counter tables (default: 30)')
+    parser.add_argument('--checkpoint-interval', type=float, default=5.0,
+                        help='seconds between checkpoint writes (default: 5)')
+    parser.add_argument('--alert-failures', type=int, default=10,
+                        help='failures in a minute that mark a destination DOWN (default: 10)')
+    parser.add_argument('--arrival-time', action='store_true', help='time lines by when they were read')
+    args = parser.parse_args()
+
+    state = load_state(args.state)
+    paths = [os.path.abspath(path) for path in args.files]
+    followers = [Follower(path, state.get(path), args.from_start) for path in paths]
+    analyzer = Analyzer(args.alert_failures, args.arrival_time)
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+
+    print(f"Following {len(followers)} file(s), checkpoints in {args.state}")
+    for follower in followers:
+        if follower.backlog is not None:
+            print(f"  {follower.path}: newest-first export, read oldest first, then from byte {follower.offset}")
+        else:
+            print(f"  {follower.path}: " + (f"from byte {follower.offset}" if follower.file
+                                            else "waiting for it to appear"))
+
+    next_report = time.time() + args.report_interval
+    next_checkpoint = time.time() + args.checkpoint_interval
+    try:
+        while True:
+            now = time.time()
+            for follower in followers:
+                analyzer.feed(follower, follower.poll(), now)
+                while follower.backlog is not None:  # one file after another, a batch at a time
+                    analyzer.feed(follower, follower.drain(), now)
+            if args.once:
+                break
+            analyzer.check_alerts(analyzer.clock(now))
+            if now >= next_checkpoint:
+                save_state(args.state, followers)
+                next_checkpoint = now + args.checkpoint_interval
+            if now >= next_report:
+                analyzer.print_report(analyzer.clock(now))
+                next_report = now + args.report_interval
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        save_state(args.state, followers)
+        for follower in followers:
+            follower.close()
+    now = analyzer.clock(time.time())
+    analyzer.check_alerts(now)
+    analyzer.print_report(now)
+    sys.exit(0)
@@ -0,0 +1,244 @@
+"""
+Structured per-event recording for the test-mssql scripts
+
+Every connect, query, validation or shed request becomes one event:
+
+  ts          epoch seconds
+  event       'connect', 'query', 'phase', 'validate', 'shed', ...
+  worker      worker / attempt number
+  session     SQL Server @@SPID, when known
+  phase       sub-step (connection phase, ramp step, ...)
+  latency_ms  how long the operation took
+  wait_ms     time spent before it could start (pool wait, schedule lag)
+  ok          success flag
+  error       error class, e.g. 'OperationalError:20009'
+
+Recording is a deque append on the caller's thread; a background thread
+drains the deque once a second and writes either compact JSONL (one object
+per line, unset fields omitted) or a binary file of fixed-size records with
+an interned string table (~32 bytes/event, selected by a .bin suffix).
+An event that cannot be encoded is dropped and reported; if the file
+itself cannot be written, recording stops.
+
+  python3 mssql_events.py run.bin                # summary by event/phase
+  python3 mssql_events.py run.bin --jsonl > run.jsonl
+"""
+
+import argparse
+import collections
+import json
+import math
+import struct
+import sys
+import threading
+import time
+
+FIELDS = ('ts', 'event', 'worker', 'session', 'phase', 'latency_ms', 'wait_ms', 'ok', 'error')
+
+MAGIC = b'MSEV\x01'
+# ts, event id, worker, session, phase id, latency, wait, ok, error id
+EVENT = struct.Struct('<dHiiHffBH')
+STRING = struct.Struct('<HH')  # id, length
+NONE = -1
+
+def error_class(exc):
+    """Exception type plus the SQL Server / DB-Lib error number when there is one"""
+    name = type(exc).__name__
+    # pymssql raises OperationalError((number, message),)
+    code = exc.args[0] if exc.args else None
+    if isinstance(code, tuple) and code:
+        code = code[0]
+    return f'{name}:{code}' if isinstance(code, int) else name
+
+def shard_path(path, index):
+    """'run.bin' -> 'run.p2.bin', for one file per --processes child"""
+    stem, dot, suffix = path.rpartition('.')
+    return f'{stem}.p{index}.{suffix}' if dot and '/' not in suffix else f'{path}.p{index}'
+
+class EventRecorder:
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.binary = path.endswith('.bin')
+        self.count = 0
+        self.dropped = 0     # events that could not be encoded
+        self.failed = None   # the write error that stopped the writer thread
+        self._pending = collections.deque()
+        self._strings = {}
+        self._file = open(path, 'wb')
+        if self.binary:
+            self._file.write(MAGIC)
+        self._stop = threading.Event()
+        self._interval = flush_interval
+        self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+        self._thread.start()
+
+    def record(self, event, worker=None, session=None, phase=None, latency_ms=None, wait_ms=None,
+               ok=True, error=None):
+        if self.failed is not None:
+            return  # nothing drains the deque any more
+        self._pending.append((time.time(), event, worker, session, phase, latency_ms, wait_ms, ok, error))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        if self.failed is None:
+            self._flush()
+        self._file.close()
+        if self.dropped:
+            print(f"⚠️  {self.dropped} events could not be encoded and were dropped", file=sys.stderr)
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self._flush()
+            except Exception as e:
+                self.failed = e
+                self._pending.clear()
+                print(f"⚠️  Event recording to {self.path} stopped: {e}", file=sys.stderr)
+                return
+
+    def _flush(self):
+        # popleft() for exactly the entries present now: appends that race
+        # with the drain are left for the next flush, never lost
+        pending = self._pending
+        events = [pending.popleft() for _ in range(len(pending))]
+        if not events:
+            return
+        encode = self._encode_binary if self.binary else self._encode_json
+        chunks = []
+        for event in events:
+            try:
+                chunks.append(encode(event))
+            except (struct.error, TypeError, ValueError, OverflowError) as e:
+                if not self.dropped:
+                    print(f"⚠️  Dropping unencodable {event[1]!r} event: {e}", file=sys.stderr)
+                self.dropped += 1
+        self._file.write(b''.join(chunks))
+        self._file.flush()
+        self.count += len(chunks)
+
+    def _encode_json(self, event):
+        record = {name: value for name, value in zip(FIELDS, event) if value is not None}
+        record['ts'] = round(record['ts'], 6)
+        for name in ('latency_ms', 'wait_ms'):
+            if name in record:
+                record[name] = round(record[name], 3)
+        return json.dumps(record, separators=(',', ':')).encode() + b'\n'
+
+    def _intern(self, value, out, added):
+        if value is None:
+            return 0
+        string_id = self._strings.get(value)
+        if string_id is None:
+            string_id = self._strings[value] = len(self._strings) + 1
+            added.append(value)
+            data = str(value).encode()[:65535].decode('utf-8', 'ignore').encode()
+            out.append(b'S' + STRING.pack(string_id, len(data)) + data)
+        return string_id
+
+    def _encode_binary(self, event):
+        ts, name, worker, session, phase, latency, wait, ok, error = event
+        out, added = [], []
+        try:
+            packed = EVENT.pack(
+                ts, self._intern(name, out, added),
+                NONE if worker is None else worker, NONE if session is None else session,
+                self._intern(phase, out, added),
+                math.nan if latency is None else latency, math.nan if wait is None else wait,
+                1 if ok else 0, self._intern(error, out, added))
+        except Exception:
+            # Their string records are never written: forget them (ids stay dense)
+            for value in added:
+                del self._strings[value]
+            raise
+        out.append(b'E' + packed)
+        return b''.join(out)
+
+def read_events(path):
+    """Yield events from a JSONL or binary recording as dicts (unset fields omitted)"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        strings = {}
+        while True:
+            tag = f.read(1)
+            if not tag:
+                return
+            if tag == b'S':
+                string_id, length = STRING.unpack(f.read(STRING.size))
+                strings[string_id] = f.read(length).decode()
+                continue
+            ts, name, worker, session, phase, latency, wait, ok, error = EVENT.unpack(f.read(EVENT.size))
+            event = {'ts': ts, 'event': strings[name]}
+            if worker != NONE:
+                event['worker'] = worker
+            if session != NONE:
+                event['session'] = session
+            if phase:
+                event['phase'] = strings[phase]
+            if not math.isnan(latency):
+                event['latency_ms'] = latency
+            if not math.isnan(wait):
+                event['wait_ms'] = wait
+            event['ok'] = bool(ok)
+            if error:
+                event['error'] = strings[error]
+            yield event
+
+def summarize(paths):
+    from latency_histogram import LatencyHistogram
+
+    groups = {}
+    errors = collections.Counter()
+    first = last = None
+    for path in paths:
+        for event in read_events(path):
+            key = (event['event'], event.get('phase', ''))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, 0, LatencyHistogram(), LatencyHistogram()]
+            group[0] += 1
+            if not event.get('ok', True):
+                group[1] += 1
+                errors[(event['event'], event.get('error', '?'))] += 1
+            if 'latency_ms' in event:
+                group[2].record(event['latency_ms'])
+            if 'wait_ms' in event:
+                group[3].record(event['wait_ms'])
+            first = event['ts'] if first is None else min(first, event['ts'])
+            last = event['ts'] if last is None else max(last, event['ts'])
+
+    if first is None:
+        print("No events recorded")
+        return
+    print(f"Events from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(first))} "
+          f"to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last))} ({last - first:.1f}s)")
+    print()
+    print(f"  {'event':<10} {'phase':<12} {'count':>9} {'failed':>7} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'max ms':>9} {'wait p99':>9}")
+    for (name, phase), (count, failed, latency, wait) in sorted(groups.items()):
+        print(f"  {name:<10} {phase:<12} {count:>9} {failed:>7} {latency.percentile(50):>9.1f} "
+              f"{latency.percentile(99):>9.1f} {latency.max or 0:>9.1f} {wait.percentile(99):>9.1f}")
+    if errors:
+        print()
+        print("Errors:")
+        for (name, error), count in errors.most_common(10):
+            print(f"  {count:9d}  {name:<10} {error}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Summarize or convert test-mssql event recordings')
+    parser.add_argument('paths', nargs='+', help='.jsonl or .bin files (e.g. every run.p*.bin shard)')
+    parser.add_argument('--jsonl', action='store_true', help='write the events as JSONL to stdout instead')
+    args = parser.parse_args()
+
+    if args.jsonl:
+        for path in args.paths:
+            for event in read_events(path):
+                sys.stdout.write(json.dumps(event, separators=(',', ':')) + '\n')
+    else:
+        summarize(args.paths)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Per-second outage timeline across Choreo, proxy and flow logs
+Normalizes every source to UTC, streams each one in time order and
+merge-joins them into one row per second: client errors, proxy errors,
+DERP events and subnet flows side by side. Each second with client errors
+gets a verdict from whatever the other sources logged within
++/- --tolerance seconds:
+
+  proxy: refused        tailscaled reached the subnet router and was refused
+  proxy: rate-limited   only [RATELIMIT] lines - the proxy errors were suppressed
+  flows: unanswered     no proxy line, but flows show SYNs that got no reply
+  forwarded             the forwarder completed connections around it
+  client only           nothing else logged anything
+
+Each input is read once, front to back (newest-first Kibana exports back to
+front), and memory holds only --skew seconds of reordering and the
+tolerance window, so input size does not matter.
+
+Usage:
+  python3 outage_timeline.py Choreo_Logs_2025-10-09T05_39_42.547Z_to_2025-10-09T06_40_14.992Z.log
+  python3 outage_timeline.py LOGS/tailscale-proxy.logs LOGS/client-component.logs --kibana-utc-offset +05:30
+  python3 outage_timeline.py Choreo_Logs_*.log --flows LOGS/tailscale_network_flow_logfile.txt \\
+      --flow-dst 172.16. --from 2025-10-09T05:50:00Z --to 2025-10-09T06:30:00Z --csv timeline.csv
+
+Log files may be Choreo exports, Kibana exports or plain Go logs, and may
+mix client and proxy lines; every line is classified by what it says.
+"""
+
+import argparse
+import collections
+import csv
+import heapq
+import sys
+
+from flow_logs import KINDS, format_time, ip_matcher, iter_flows, iter_records, parse_time
+from proxy_logs import detect_kibana_offset, classify, iter_entries, parse_utc_offset
+
+COLUMNS = ('client', 'refused', 'ratelimit', 'proxy_failed', 'forwarded', 'derp',
+           'flows', 'unanswered', 'tx_pkts', 'rx_pkts')
+CLIENT, REFUSED, RATELIMIT, PROXY_FAILED, FORWARDED, DERP, FLOWS, UNANSWERED, TX_PKTS, RX_PKTS = range(len(COLUMNS))
+COLUMN_OF = {'socks_failure': CLIENT, 'reset': CLIENT, 'refused': REFUSED, 'ratelimit': RATELIMIT,
+             'proxy_failed': PROXY_FAILED, 'forwarded': FORWARDED, 'derp': DERP}
+
+late_events = 0  # arrived more than --skew behind their stream; counted at the stream's current second
+
+def log_events(path, kibana_offset, first_ms, last_ms):
+    """(ms, column, count) per classified line"""
+    for ms, line in iter_entries(path, kibana_offset):
+        if (first_ms is not None and ms < first_ms) or (last_ms is not None and ms > last_ms):
+            continue
+        hit = classify(line)
+        if hit:
+            yield ms, COLUMN_OF[hit[0]], 1
+
+def flow_events(path, kinds, src, dst, first_ms, last_ms):
+    """(ms, column, count) per flow log record, for its matching flows"""
+    match_src, match_dst = ip_matcher(src), ip_matcher(dst)
+    for _, _, record in iter_records(path):
+        logged = None
+        flows = unanswered = tx_pkts = rx_pkts = 0
+        for flow in iter_flows(record):
+            logged, kind, src_ip, dst_ip = flow[0], flow[2], flow[4], flow[6]
+            if (first_ms is not None and logged < first_ms) or (last_ms is not None and logged > last_ms):
+                break  # one timestamp per record
+            if kind not in kinds:
+                continue
+            if (match_src and not match_src(src_ip)) or (match_dst and not match_dst(dst_ip)):
+                continue
+            flows += 1
+            tx_pkts += flow[8]
+            rx_pkts += flow[10]
+            if flow[8] and not flow[10]:
+                unanswered += 1
+        if flows:
+            yield logged, FLOWS, flows
+            yield logged, UNANSWERED, unanswered
+            yield logged, TX_PKTS, tx_pkts
+            yield logged, RX_PKTS, rx_pkts
+
+def in_order(events, skew_ms):
+    """Sort a nearly-sorted stream with a heap holding skew_ms of events"""
+    global late_events
+    heap = []
+    newest = emitted = None
+    for ms, column, count in events:
+        if emitted is not None and ms < emitted:
+            late_events += 1
+            ms = emitted
+        heapq.heappush(heap, (ms, column, count))
+        if newest is None or ms > newest:
+            newest = ms
+        while heap[0][0] < newest - skew_ms:
+            event = heapq.heappop(heap)
+            emitted = event[0]
+            yield event
+    while heap:
+        yield heapq.heappop(heap)
+
+def seconds(streams):
+    """Merge-join sorted streams into (second, counts per column)"""
+    current = row = None
+    for ms, column, count in heapq.merge(*streams):
+        second = ms // 1000
+        if second != current:
+            if row is not None:
+                yield current, row
+            current, row = second, [0] * len(COLUMNS)
+        row[column] += count
+    if row is not None:
+        yield current, row
+
+def verdict(row, around):
+    if not row[CLIENT]:
+        return ''
+    if around[REFUSED] or around[PROXY_FAILED]:
+        return 'proxy: refused'
+    if around[RATELIMIT]:
+        return 'proxy: rate-limited'
+    if around[UNANSWERED]:
+        return 'flows: unanswered'
+    if around[FORWARDED]:
+        return 'forwarded'
+    return 'client only'
+
+def correlate(rows, tolerance):
+    """(second, counts, counts within +/- tolerance seconds, verdict), in order"""
+    window = collections.deque()  # rows within tolerance of the oldest pending one
+    pending = collections.deque()
+    around = [0] * len(COLUMNS)
+
+    def emit(second, row):
+        while window and window[0][0] < second - tolerance:
+            for i, value in enumerate(window.popleft()[1]):
+                around[i] -= value
+        return second, row, list(around), verdict(row, around)
+
+    for second, row in rows:
+        # Everything within tolerance after a pending second has arrived
+        while pending and pending[0][0] + tolerance < second:
+            yield emit(*pending.popleft())
+        window.append((second, row))
+        pending.append((second, row))
+        for i, value in enumerate(row):
+            around[i] += value
+    while pending:
+        yield emit(*pending.popleft())
+
+def stamp(second):
+    return format_time(second * 1000)[:19].replace('T', ' ')
+
+def print_row(second, row, result):
+    print(f"{stamp(second)}  {row[CLIENT]:>6} {row[REFUSED]:>7} {row[RATELIMIT]:>9} {row[PROXY_FAILED]:>6} "
+          f"{row[FORWARDED]:>9} {row[DERP]:>4} {row[FLOWS]:>6} {row[UNANSWERED]:>10} {row[TX_PKTS]:>7} "
+          f"{row[RX_PKTS]:>7}  {result}")
+
+def print_summary(totals, verdicts, first, last, seconds_with_events):
+    print()
+    print("=" * 70)
+    print("SUMMARY")
+    print("=" * 70)
+    if first is None:
+        print("No events in range.")
+        return
+    print(f"Span:               {stamp(first)} - {stamp(last)} UTC ({seconds_with_events} seconds with events)")
+    print(f"Client errors:      {totals[CLIENT]}")
+    print(f"Proxy errors:       {totals[REFUSED]} refused, {totals[RATELIMIT]} rate-limited, "
+          f"{totals[PROXY_FAILED]} other")
+    print(f"Forwarded:          {totals[FORWARDED]} connections closed normally")
+    print(f"DERP events:        {totals[DERP]}")
+    if totals[FLOWS]:
+        print(f"Flows:              {totals[FLOWS]} ({totals[UNANSWERED]} unanswered, "
+              f"{totals[UNANSWERED] * 100.0 / totals[FLOWS]:.1f}%), {totals[TX_PKTS]} tx / {totals[RX_PKTS]} rx pkts")
+    if late_events:
+        print(f"Late events:        {late_events} arrived beyond --skew and were counted late")
+    client_seconds = sum(verdicts.values())
+    if client_seconds:
+        print()
+        print(f"Seconds with client errors: {client_seconds}")
+        for name, count in verdicts.most_common():
+            print(f"  {name:<20} {count:>6} ({count * 100.0 / client_seconds:.1f}%)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-second timeline across Choreo, proxy and flow logs',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split('Usage:')[1])
+    parser.add_argument('logs', nargs='*', help='Choreo / proxy log files')
+    parser.add_argument('--flows', action='append', default=[], metavar='FILE', help='Tailscale flow log (repeatable)')
+    parser.add_argument('--flow-kind', default='subnet', help='comma-separated flow kinds counted (default: subnet)')
+    parser.add_argument('--flow-src', help='only flows from this IP, or prefix ending in . : or *')
+    parser.add_argument('--flow-dst', help='only flows to this IP, or prefix ending in . : or *')
+    parser.add_argument('--from', dest='start', metavar='TIME', help='at or after (ISO 8601)')
+    parser.add_argument('--to', dest='end', metavar='TIME', help='at or before (ISO 8601)')
+    parser.add_argument('--tolerance', type=int, default=2, metavar='SECONDS',
+                        help='how far apart events still correlate (default: 2)')
+    parser.add_argument('--skew', type=float, default=5.0, metavar='SECONDS',
+                        help='out-of-order tolerance within one source (default: 5)')
+    parser.add_argument('--kibana-utc-offset', default='auto', metavar='OFFSET',
+                        help="timezone of Kibana '@' headers, e.g. +05:30 (default: auto from the logs)")
+    parser.add_argument('--csv', metavar='PATH', help='write the timeline to PATH')
+    parser.add_argument('--summary', action='store_true', help='print only the summary')
+    args = parser.parse_args()
+    if not args.logs and not args.flows:
+        parser.error('give at least one log file or --flows')
+
+    if args.kibana_utc_offset == 'auto':
+        kibana_offset = detect_kibana_offset(args.logs)
+        if kibana_offset is None:
+            kibana_offset = 0
+        elif kibana_offset:
+            print(f"Kibana timestamps detected as UTC{'+' if kibana_offset > 0 else '-'}"
+                  f"{abs(kibana_offset) // 3600000:02d}:{abs(kibana_offset) // 60000 % 60:02d}")
+    else:
+        try:
+            kibana_offset = parse_utc_offset(args.kibana_utc_offset)
+        except ValueError as e:
+            parser.error(f"--kibana-utc-offset: {e}")
+    try:
+        kinds = frozenset(KINDS.index(kind) for kind in args.flow_kind.split(','))
+    except ValueError:
+        parser.error(f"--flow-kind: choose from {', '.join(KINDS)}")
+    first_ms = parse_time(args.start) if args.start else None
+    last_ms = parse_time(args.end) if args.end else None
+
+    skew_ms = int(args.skew * 1000)
+    streams = [in_order(log_events(path, kibana_offset, first_ms, last_ms), skew_ms) for path in args.logs]
+    streams += [in_order(flow_events(path, kinds, args.flow_src, args.flow_dst, first_ms, last_ms), skew_ms)
+                for path in args.flows]
+
+    writer = None
+    if args.csv:
+        csv_file = open(args.csv, 'w', newline='')
+        writer = csv.writer(csv_file)
+        writer.writerow(('second',) + COLUMNS + ('verdict',))
+    if not args.summary:
+        print(f"{'UTC':<19}  {'client':>6} {'refused':>7} {'ratelimit':>9} {'failed':>6} {'forwarded':>9} "
+              f"{'derp':>4} {'flows':>6} {'unanswered':>10} {'tx pkts':>7} {'rx pkts':>7}  verdict")
+
+    totals = [0] * len(COLUMNS)
+    verdicts = collections.Counter()
+    first = previous = None
+    count = 0
+    try:
+        for second, row, around, result in correlate(seconds(streams), args.tolerance):
+            if first is None:
+                first = second
+            count += 1
+            for i, value in enumerate(row):
+                totals[i] += value
+            if result:
+                verdicts[result] += 1
+            if writer:
+                writer.writerow([stamp(second)] + row + [result])
+            if not args.summary:
+                if previous is not None and second - previous >= 60:
+                    gap = second - previous
+                    print(f"{'':<19}  ... {gap // 3600}h{gap // 60 % 60:02d}m{gap % 60:02d}s with no events ...")
+                print_row(second, row, result)
+            previous = second
+        print_summary(totals, verdicts, first, previous, count)
+        if writer:
+            print()
+            print(f"Timeline written to {args.csv}")
+    except BrokenPipeError:  # | head
+        sys.stderr.close()
+    finally:
+        if writer:
+            csv_file.close()
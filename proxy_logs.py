@@ -0,0 +1,184 @@
+"""
+Readers for the Choreo application log and tailscale-proxy logs
+
+The forwarder (main.go) and tailscaled write to the same container log, so
+any of these files can hold client and proxy lines alike. Three layouts
+turn up:
+
+  Choreo export   2025-10-09T05:39:42.724Z Application Logs 1.0.0 Development ERROR 2025/10/09 05:39:42 Failed to ...
+  Kibana export   a tab-indented "Oct 8, 2025 @ 22:22:28.516" header, blank lines, then the log line;
+                  newest first, with the header in the exporting browser's timezone
+  plain Go log    2025/10/08 16:52:28 socks5: client connection failed: ...
+
+Every line is timed in UTC epoch milliseconds: from its ISO prefix, else
+its Go log prefix (UTC, as in the container), else the Kibana header above
+it shifted by the export's UTC offset.
+
+Lines are classified with precompiled matchers, each behind a plain
+substring test so most lines never reach a regex.
+"""
+
+import calendar
+import os
+import re
+
+# category -> (substring every match contains, pattern; group 1 is the destination when there is one)
+MATCHERS = (
+    ('ratelimit', '[RATELIMIT]', re.compile(r'\[RATELIMIT\]')),
+    ('refused', 'refused', re.compile(r'socks5: client connection failed: connect \w+ (\S+): connection (?:was )?refused')),
+    ('proxy_failed', 'socks5: client connection failed',
+     re.compile(r'socks5: client connection failed(?:: connect \w+ (\S+))?')),
+    ('socks_failure', 'Failed to connect to destination',
+     re.compile(r'Failed to connect to destination (\S+) through proxy')),
+    ('forwarded', 'Connection closed for destination', re.compile(r'Connection closed for destination (\S+)')),
+    ('reset', 'Connection reset', re.compile(r'Connection reset')),
+    ('derp', 'derp-', re.compile(r'derp-(\d+) connected|connecting to derp-(\d+)')),
+)
+CATEGORIES = tuple(category for category, _, _ in MATCHERS)
+CLIENT_ERRORS = frozenset(('socks_failure', 'reset'))
+PROXY_ERRORS = frozenset(('refused', 'proxy_failed', 'ratelimit'))
+
+_MONTHS = {name: i for i, name in enumerate(calendar.month_abbr) if name}
+_ISO = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d+))?(Z|[+-]\d\d:?\d\d)\s')
+_GO = re.compile(r'(\d{4})/(\d\d)/(\d\d) (\d\d):(\d\d):(\d\d)(?:\.(\d+))?\s')
+_GO_ANYWHERE = re.compile(r'\s(\d{4})/(\d\d)/(\d\d) (\d\d):(\d\d):(\d\d)(?:\.(\d+))?\s')
+_KIBANA = re.compile(r'\s*([A-Z][a-z]{2}) (\d{1,2}), (\d{4}) @ (\d\d):(\d\d):(\d\d)(?:\.(\d+))?\s*$')
+
+def classify(line):
+    """(category, destination or None), or None for an uninteresting line"""
+    for category, literal, pattern in MATCHERS:
+        if literal in line:
+            match = pattern.search(line)
+            if match:
+                return category, match.group(match.lastindex) if match.lastindex else None
+    return None
+
+def _ms(year, month, day, hour, minute, second, fraction):
+    ms = calendar.timegm((int(year), int(month), int(day), int(hour), int(minute), int(second))) * 1000
+    return ms + int((fraction or '0')[:3].ljust(3, '0'))
+
+def _offset_ms(text):
+    if text == 'Z':
+        return 0
+    sign = -1 if text[0] == '-' else 1
+    text = text[1:].replace(':', '')
+    return sign * (int(text[:2]) * 60 + int(text[2:])) * 60000
+
+def line_time(line):
+    """UTC epoch ms from the line's own ISO or Go log timestamp, or None"""
+    match = _ISO.match(line)
+    if match:
+        return _ms(*match.groups()[:7]) - _offset_ms(match.group(8))
+    match = _GO.match(line)
+    if match:
+        return _ms(*match.groups())
+    return None
+
+def kibana_time(line):
+    """'Oct 8, 2025 @ 22:22:28.516' as epoch ms in the export's local time, or None"""
+    match = _KIBANA.match(line)
+    if not match:
+        return None
+    month, day, year, hour, minute, second, fraction = match.groups()
+    return _ms(year, _MONTHS[month], day, hour, minute, second, fraction)
+
+def parse_utc_offset(text):
+    """'+05:30' / '-0400' / 'Z' -> milliseconds"""
+    if not re.fullmatch(r'Z|[+-]\d\d:?\d\d', text):
+        raise ValueError(f"not a UTC offset: {text!r}")
+    return _offset_ms(text)
+
+def detect_kibana_offset(paths, lines=500):
+    """UTC offset (ms) of Kibana headers, from the first header followed by a
+    Go-stamped line in the head of any of paths; None when there is none"""
+    for path in paths:
+        header = None
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for _, line in zip(range(lines), f):
+                local = kibana_time(line)
+                if local is not None:
+                    header = local
+                    continue
+                if header is None or not line.strip():
+                    continue
+                match = _GO.match(line) or _GO_ANYWHERE.search(line)
+                if match:
+                    # Round to 15 minutes: the header has ms, the Go stamp only seconds
+                    return round((header - _ms(*match.groups())) / 900000) * 900000
+                header = None
+    return None
+
+def _reverse_lines(f, block_size=1 << 16):
+    """Lines of a binary file, last first"""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    tail = b''
+    while position > 0:
+        step = min(block_size, position)
+        position -= step
+        f.seek(position)
+        lines = (f.read(step) + tail).split(b'\n')
+        tail = lines[0]
+        for line in reversed(lines[1:]):
+            yield line.decode('utf-8', 'replace')
+    yield tail.decode('utf-8', 'replace')
+
+def _first_time(lines, kibana_offset):
+    for _, line in zip(range(1000), lines):
+        t = line_time(line)
+        if t is None:
+            t = kibana_time(line)
+            t = None if t is None else t - kibana_offset
+        if t is not None:
+            return t
+    return None
+
+def is_newest_first(path, kibana_offset=0):
+    """True for an export listed newest first (Kibana's default)"""
+    with open(path, 'rb') as f:
+        first = _first_time((line.decode('utf-8', 'replace') for line in f), kibana_offset)
+        last = _first_time(_reverse_lines(f), kibana_offset)
+    return first is not None and last is not None and first > last
+
+def has_kibana_headers(path, lines=1000):
+    """True when the head of path has a Kibana '@' header"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return any(kibana_time(line) is not None for _, line in zip(range(lines), f))
+
+def iter_entries(path, kibana_offset=0):
+    """Yield (UTC ms, line) for every timed line, oldest first.
+
+    Newest-first exports are read backwards, so either order streams in one
+    pass; only a Kibana entry's own lines wait for the header above them.
+    Lines come out in file order, which is only as sorted as the writer's
+    clock; callers merging sources should allow a little skew.
+    """
+    newest_first = is_newest_first(path, kibana_offset)
+    buffered = newest_first and has_kibana_headers(path)
+    with open(path, 'rb') as f:
+        lines = _reverse_lines(f) if newest_first else (line.decode('utf-8', 'replace') for line in f)
+        header = None
+        pending = []  # read backwards, an entry's lines come before its header
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            local = kibana_time(line)
+            if local is not None:
+                header = local - kibana_offset
+                for pending_line in reversed(pending):
+                    yield line_time(pending_line) or header, pending_line
+                pending = []
+                continue
+            if buffered:
+                pending.append(line)
+                continue
+            t = line_time(line)
+            if t is None and not newest_first:
+                t = header
+            if t is not None:
+                yield t, line
+        for pending_line in reversed(pending):
+            t = line_time(pending_line)
+            if t is not None:
+                yield t, pending_line
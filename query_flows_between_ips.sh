@@ -2,8 +2,13 @@
 
 # Query flows between two IPs in Tailscale network flow logs
 # Usage: ./query_flows_between_ips.sh <src_ip> <dst_ip>
+#
+# The log is parsed once into an indexed SQLite store (flow_index.py); later
+# runs only ingest what was appended, and each query below is an index lookup.
 
 LOGFILE="LOGS/tailscale_network_flow_logfile.txt"
+FLOW_DB="${FLOW_DB:-flows.db}"
+FLOWS="python3 flow_index.py --db $FLOW_DB"
 
 if [ $# -ne 2 ]; then
     echo "Usage: $0 <source_ip> <destination_ip>"
@@ -19,6 +24,8 @@ fi
 SRC_IP="$1"
 DST_IP="$2"
 
+$FLOWS ingest --quiet "$LOGFILE" || exit 1
+
 echo "================================================================================"
 echo "Searching for flows: $SRC_IP -> $DST_IP"
 echo "================================================================================"
@@ -27,30 +34,11 @@ echo ""
 # Search in subnetTraffic
 echo "SUBNET TRAFFIC:"
 echo "---------------"
-jq --arg src "$SRC_IP" --arg dst "$DST_IP" '
-  .logs[] 
-  | select(.logged != null) as $log
-  | .subnetTraffic[]? 
-  | select(.src | contains($src)) 
-  | select(.dst | contains($dst))
-  | {
-      time: $log.logged,
-      src: .src,
-      dst: .dst,
-      proto: .proto,
-      txPkts: .txPkts,
-      txBytes: .txBytes
-    }
-' "$LOGFILE" | head -20
+$FLOWS flows --kind subnet --src "$SRC_IP" --dst "$DST_IP" --limit 20
 
 echo ""
 echo "Count:"
-jq --arg src "$SRC_IP" --arg dst "$DST_IP" '
-  [.logs[] | .subnetTraffic[]? 
-   | select(.src | contains($src)) 
-   | select(.dst | contains($dst))] 
-  | length
-' "$LOGFILE"
+$FLOWS count --kind subnet --src "$SRC_IP" --dst "$DST_IP"
 
 echo ""
 echo "================================================================================"
@@ -58,31 +46,11 @@ echo "==========================================================================
 # Search in physicalTraffic
 echo "PHYSICAL TRAFFIC:"
 echo "-----------------"
-jq --arg src "$SRC_IP" --arg dst "$DST_IP" '
-  .logs[] 
-  | select(.logged != null) as $log
-  | .physicalTraffic[]? 
-  | select(.src | contains($src)) 
-  | select(.dst | contains($dst))
-  | {
-      time: $log.logged,
-      src: .src,
-      dst: .dst,
-      txPkts: .txPkts,
-      txBytes: .txBytes,
-      rxPkts: .rxPkts,
-      rxBytes: .rxBytes
-    }
-' "$LOGFILE" | head -20
+$FLOWS flows --kind physical --src "$SRC_IP" --dst "$DST_IP" --limit 20
 
 echo ""
 echo "Count:"
-jq --arg src "$SRC_IP" --arg dst "$DST_IP" '
-  [.logs[] | .physicalTraffic[]? 
-   | select(.src | contains($src)) 
-   | select(.dst | contains($dst))] 
-  | length
-' "$LOGFILE"
+$FLOWS count --kind physical --src "$SRC_IP" --dst "$DST_IP"
 
 echo ""
 echo "================================================================================"
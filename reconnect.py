@@ -0,0 +1,206 @@
+"""
+Shared reconnect manager for the test-mssql scripts
+
+During an outage every worker used to reconnect as soon as its query failed,
+so N workers meant N simultaneous connects through the SOCKS proxy on every
+retry - the burst that shows up as RATELIMIT in tailscale-proxy.logs. One
+ReconnectManager per target is shared by all of its workers instead:
+
+  healthy     connects go straight through
+  failing     attempts are spaced by exponential backoff with decorrelated
+              jitter (delay = min(cap, uniform(base, 3 * previous delay))),
+              one grant per delay across all workers, not per worker
+  open        after failure_threshold consecutive failures the breaker opens
+              and refuses every attempt for open_seconds
+  half-open   then exactly one probe is let through; success closes the
+              breaker, failure re-opens it
+
+Every outage is timed from the last success before it to the failure that
+revealed it (time to detect; an upper bound, since the tunnel may have died
+just after that success) and from there to the next success (time to
+recover).
+"""
+
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+class CircuitOpen(Exception):
+    """The manager refused a reconnect attempt within the caller's timeout"""
+
+class Outage:
+    __slots__ = ('last_ok', 'detected', 'recovered', 'attempts', 'failures', 'first_error')
+
+    def __init__(self, last_ok, detected, first_error):
+        self.last_ok = last_ok
+        self.detected = detected
+        self.recovered = None
+        self.attempts = 0
+        self.failures = 0
+        self.first_error = first_error
+
+    @property
+    def time_to_detect(self):
+        return None if self.last_ok is None else self.detected - self.last_ok
+
+    @property
+    def time_to_recover(self):
+        return None if self.recovered is None else self.recovered - self.detected
+
+class ReconnectManager:
+    def __init__(self, base=0.1, cap=30.0, failure_threshold=5, open_seconds=10.0):
+        self.base = base
+        self.cap = cap
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.cond = threading.Condition()
+        self.state = CLOSED
+        self.consecutive = 0
+        self.delay = base
+        self.next_attempt = 0.0
+        self.opened_at = 0.0
+        self.probing = False
+        self.last_success = None
+        self.outage = None  # the Outage in progress
+        self.outages = []  # finished ones
+        self.trips = 0
+        self.attempts = 0
+        self.denied = 0
+
+    @property
+    def failing(self):
+        return self.outage is not None
+
+    def record_success(self):
+        # Fast path for the common case; a stale read only costs one locked pass
+        if self.outage is None:
+            self.last_success = time.time()
+            return
+        with self.cond:
+            now = time.time()
+            self.last_success = now
+            self.consecutive = 0
+            self.delay = self.base
+            self.next_attempt = 0.0
+            self.state = CLOSED
+            self.probing = False
+            if self.outage is not None:
+                self.outage.recovered = now
+                self.outages.append(self.outage)
+                self.outage = None
+            self.cond.notify_all()
+
+    def record_failure(self, error=None):
+        with self.cond:
+            now = time.time()
+            self.consecutive += 1
+            if self.outage is None:
+                self.outage = Outage(self.last_success, now, error)
+            self.outage.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = now
+                self.trips += 1
+            self.probing = False
+            self.cond.notify_all()
+
+    def _grant(self, now):
+        """(granted, seconds until it is worth asking again); lock held"""
+        if self.outage is None:
+            return True, 0.0
+        if self.state == OPEN:
+            reopen = self.opened_at + self.open_seconds
+            if now < reopen:
+                return False, reopen - now
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probing:
+                return False, self.open_seconds  # woken early when the probe reports
+            self.probing = True
+        elif now < self.next_attempt:
+            return False, self.next_attempt - now
+        else:
+            self.delay = min(self.cap, random.uniform(self.base, self.delay * 3))
+            self.next_attempt = now + self.delay
+        self.outage.attempts += 1
+        return True, 0.0
+
+    def acquire(self, timeout=None):
+        """Wait for permission to (re)connect; False if none came within timeout.
+
+        A granted caller must report the outcome with record_success() or
+        record_failure(), or a half-open breaker never lets the next probe in.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while True:
+                now = time.time()
+                granted, wait = self._grant(now)
+                if granted:
+                    self.attempts += 1
+                    return True
+                if deadline is not None:
+                    if now >= deadline:
+                        self.denied += 1
+                        return False
+                    wait = min(wait, deadline - now)
+                self.cond.wait(wait)
+
+    def snapshot(self):
+        """Plain-data summary, safe to pickle or merge across processes"""
+        with self.cond:
+            outages = [(o.time_to_detect, o.time_to_recover, o.attempts, o.failures, o.first_error)
+                       for o in self.outages]
+            if self.outage is not None:
+                o = self.outage
+                outages.append((o.time_to_detect, None, o.attempts, o.failures, o.first_error))
+            return {'state': self.state, 'trips': self.trips, 'attempts': self.attempts,
+                    'denied': self.denied, 'outages': outages}
+
+def merge_snapshots(snapshots):
+    total = {'state': CLOSED, 'trips': 0, 'attempts': 0, 'denied': 0, 'outages': []}
+    for snapshot in snapshots:
+        for key in ('trips', 'attempts', 'denied', 'outages'):
+            total[key] += snapshot[key]
+        if snapshot['state'] != CLOSED:
+            total['state'] = snapshot['state']
+    return total
+
+def print_outage_report(snapshot):
+    outages = snapshot['outages']
+    print(f"Reconnect manager ({snapshot['state']}):")
+    print(f"  Attempts granted: {snapshot['attempts']} ({snapshot['denied']} deferred past their timeout)")
+    print(f"  Breaker trips:    {snapshot['trips']}")
+    print(f"  Outages:          {len(outages)}{' (last still ongoing)' if outages and outages[-1][1] is None else ''}")
+    if not outages:
+        return
+    detect = sorted(o[0] for o in outages if o[0] is not None)
+    recover = sorted(o[1] for o in outages if o[1] is not None)
+    if detect:
+        print(f"  Time to detect:   median {detect[len(detect) // 2]:.2f}s, max {detect[-1]:.2f}s "
+              f"(last success -> first failure)")
+    if recover:
+        print(f"  Time to recover:  median {recover[len(recover) // 2]:.2f}s, max {recover[-1]:.2f}s "
+              f"(first failure -> next success)")
+    print(f"  {'#':>3} {'detect s':>9} {'recover s':>10} {'attempts':>9} {'failures':>9}  first error")
+    for i, (ttd, ttr, attempts, failures, error) in enumerate(outages[-10:], max(1, len(outages) - 9)):
+        print(f"  {i:>3} {'-' if ttd is None else f'{ttd:.2f}':>9} {'ongoing' if ttr is None else f'{ttr:.2f}':>10} "
+              f"{attempts:>9} {failures:>9}  {error or ''}")
+
+def add_arguments(parser):
+    """--backoff-* / --breaker-* options shared by the scripts"""
+    parser.add_argument("--backoff-base", type=float, default=0.1, metavar="SECONDS",
+                        help="first reconnect delay during an outage (default: 0.1)")
+    parser.add_argument("--backoff-cap", type=float, default=30.0, metavar="SECONDS",
+                        help="longest reconnect delay (default: 30)")
+    parser.add_argument("--breaker-threshold", type=int, default=5, metavar="N",
+                        help="consecutive failures that open the circuit breaker (default: 5)")
+    parser.add_argument("--breaker-open", type=float, default=10.0, metavar="SECONDS",
+                        help="how long an open breaker refuses attempts before one probe (default: 10)")
+
+def from_arguments(args):
+    return ReconnectManager(args.backoff_base, args.backoff_cap, args.breaker_threshold, args.breaker_open)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Local SOCKS5 stand-in for tailscaled (--socks5-server=localhost:1055)
+Lets main.go, the echo servers and the test-mssql scripts run without a tailnet,
+with injectable connect latency, bandwidth caps, connection limits and the
+failure modes seen in LOGS/tailscale-proxy.logs:
+
+  socks5: client connection failed: connect tcp 172.16.4.207:1433: connection was refused
+  socks5: client connection failed: context deadline exceeded
+  [RATELIMIT] format("socks5: client connection failed: %v")
+
+Every failure is answered with REP=0x01, which the Go client reports as
+"general SOCKS server failure", exactly like tailscaled.
+
+Usage: python3 socks5-mock.py [--port 1055] [--map 172.16.4.207:1433=127.0.0.1:14330] [options]
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import random
+import struct
+import sys
+import time
+
+HOST = '0.0.0.0'
+PORT = 1055
+RELAY_CHUNK = 64 * 1024
+
+# SOCKS5 reply codes
+REP_SUCCEEDED = 0x00
+REP_GENERAL_FAILURE = 0x01
+REP_COMMAND_NOT_SUPPORTED = 0x07
+REP_ADDRESS_TYPE_NOT_SUPPORTED = 0x08
+
+FAILED_FORMAT = 'socks5: client connection failed: %v'
+
+class RateLimitedLog:
+    """Per-format token bucket, mimicking tailscale's logger.RateLimitedFn.
+
+    Once a format runs out of tokens it prints [RATELIMIT] format("...") and
+    drops messages; the next message allowed through first reports how many
+    were dropped.
+    """
+
+    def __init__(self, interval=5.0, burst=5):
+        self.interval = interval
+        self.burst = burst
+        self.buckets = {}  # format -> [tokens, last_refill, dropped, warned]
+
+    def log(self, fmt, message):
+        now = time.monotonic()
+        bucket = self.buckets.setdefault(fmt, [self.burst, now, 0, False])
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.burst / self.interval)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            if not bucket[3]:
+                bucket[3] = True
+                log_line(f'[RATELIMIT] format("{fmt}")')
+            return
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            log_line(f'[RATELIMIT] format("{fmt}") ({bucket[2]} dropped)')
+            bucket[2] = 0
+            bucket[3] = False
+        log_line(message)
+
+def log_line(message):
+    # Same timestamp layout as tailscaled's stderr
+    print(f"{time.strftime('%Y/%m/%d %H:%M:%S')} {message}", flush=True)
+
+class Socks5Mock:
+    def __init__(self, args):
+        self.args = args
+        self.mappings = dict(args.map or [])
+        self.random = random.Random(args.seed)
+        self.ratelimit = RateLimitedLog(args.ratelimit_interval, args.ratelimit_burst)
+        self.started = time.monotonic()
+        self.active = 0
+        self.stats = {'connects': 0, 'succeeded': 0, 'refused': 0, 'timeout': 0,
+                      'limited': 0, 'outage': 0, 'bytes_up': 0, 'bytes_down': 0}
+
+    def in_outage(self):
+        elapsed = time.monotonic() - self.started
+        return any(start <= elapsed < start + duration for start, duration in self.args.outage or [])
+
+    def fail(self, kind, message):
+        self.stats[kind] += 1
+        self.ratelimit.log(FAILED_FORMAT, f'socks5: client connection failed: {message}')
+
+    async def handle(self, reader, writer):
+        try:
+            await self.serve(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, reader, writer):
+        # Greeting: only "no authentication" is offered, as tailscaled does
+        version, nmethods = await reader.readexactly(2)
+        methods = await reader.readexactly(nmethods)
+        if version != 5 or 0 not in methods:
+            writer.write(b'\x05\xff')
+            return
+        writer.write(b'\x05\x00')
+
+        _, command, _, address_type = await reader.readexactly(4)
+        if address_type == 1:
+            host = str(ipaddress.IPv4Address(await reader.readexactly(4)))
+        elif address_type == 4:
+            host = str(ipaddress.IPv6Address(await reader.readexactly(16)))
+        elif address_type == 3:
+            length = (await reader.readexactly(1))[0]
+            host = (await reader.readexactly(length)).decode()
+        else:
+            await self.reply(writer, REP_ADDRESS_TYPE_NOT_SUPPORTED)
+            return
+        port = struct.unpack('!H', await reader.readexactly(2))[0]
+        if command != 1:
+            await self.reply(writer, REP_COMMAND_NOT_SUPPORTED)
+            return
+
+        destination = f'{host}:{port}' if address_type != 4 else f'[{host}]:{port}'
+        self.stats['connects'] += 1
+        if self.args.max_connections and self.active >= self.args.max_connections:
+            self.fail('limited', f'connect tcp {destination}: connection was refused')
+            await self.reply(writer, REP_GENERAL_FAILURE)
+            return
+
+        # The slot is held from before the dial, so CONNECTs arriving during
+        # the connect latency count against the limit too
+        self.active += 1
+        try:
+            upstream = await self.dial(destination, host, port)
+            if upstream is None:
+                await self.reply(writer, REP_GENERAL_FAILURE)
+                return
+
+            up_reader, up_writer = upstream
+            self.stats['succeeded'] += 1
+            try:
+                await self.reply(writer, REP_SUCCEEDED)
+                await asyncio.gather(
+                    self.relay(reader, up_writer, 'bytes_up'),
+                    self.relay(up_reader, writer, 'bytes_down'),
+                )
+            finally:
+                up_writer.close()
+        finally:
+            self.active -= 1
+
+    async def dial(self, destination, host, port):
+        """Connect upstream, applying latency and injected failures; None on failure"""
+        args = self.args
+        delay = args.connect_latency + self.random.uniform(0, args.connect_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+        if self.in_outage():
+            self.fail('outage', f'connect tcp {destination}: connection was refused')
+            return None
+        if self.random.random() < args.refuse_rate:
+            self.fail('refused', f'connect tcp {destination}: connection was refused')
+            return None
+        if self.random.random() < args.timeout_rate:
+            await asyncio.sleep(args.dial_timeout)
+            self.fail('timeout', 'context deadline exceeded')
+            return None
+
+        target_host, target_port = self.mappings.get(destination, (host, port))
+        try:
+            return await asyncio.wait_for(asyncio.open_connection(target_host, target_port),
+                                          args.dial_timeout)
+        except asyncio.TimeoutError:
+            self.fail('timeout', 'context deadline exceeded')
+        except ConnectionRefusedError:
+            self.fail('refused', f'connect tcp {destination}: connection was refused')
+        except OSError as e:
+            self.fail('refused', f'connect tcp {destination}: {e.strerror or e}')
+        return None
+
+    async def reply(self, writer, code):
+        # BND.ADDR/BND.PORT are not meaningful for a userspace netstack; send zeros
+        writer.write(bytes([5, code, 0, 1]) + b'\x00' * 6)
+        await writer.drain()
+
+    async def relay(self, reader, writer, counter):
+        """Copy one direction, paced to --bandwidth KiB/s if set.
+
+        A token bucket holding at most one second of rate: an idle connection
+        earns a one-second burst, not credit for all the time it sat idle.
+        """
+        rate = self.args.bandwidth * 1024
+        tokens, refilled = rate, time.monotonic()
+        try:
+            while True:
+                data = await reader.read(RELAY_CHUNK)
+                if not data:
+                    break
+                if rate:
+                    # Wait for the chunk's tokens before it goes out, not after
+                    now = time.monotonic()
+                    tokens = min(rate, tokens + (now - refilled) * rate) - len(data)
+                    refilled = now
+                    if tokens < 0:
+                        await asyncio.sleep(-tokens / rate)
+                writer.write(data)
+                await writer.drain()
+                self.stats[counter] += len(data)
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            writer.close()
+
+    def summary(self):
+        s = self.stats
+        return (f"connects={s['connects']} succeeded={s['succeeded']} refused={s['refused']} "
+                f"timeout={s['timeout']} limited={s['limited']} outage={s['outage']} "
+                f"bytes_up={s['bytes_up']} bytes_down={s['bytes_down']}")
+
+def parse_mapping(value):
+    """'172.16.4.207:1433=127.0.0.1:14330' -> ('172.16.4.207:1433', ('127.0.0.1', 14330))"""
+    destination, _, target = value.partition('=')
+    host, _, port = target.rpartition(':')
+    if not destination or not host:
+        raise argparse.ArgumentTypeError(f'expected DEST:PORT=HOST:PORT, got {value!r}')
+    return destination, (host, int(port))
+
+def parse_outage(value):
+    """'30+60' -> fail every connect from 30s to 90s after start"""
+    start, _, duration = value.partition('+')
+    return float(start), float(duration)
+
+async def main(args):
+    mock = Socks5Mock(args)
+    server = await asyncio.start_server(mock.handle, HOST, args.port, backlog=4096,
+                                        reuse_address=True)
+    log_line(f'socks5-mock listening on {HOST}:{args.port}')
+    for destination, (host, port) in mock.mappings.items():
+        log_line(f'  {destination} -> {host}:{port}')
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.report_interval)
+            log_line(f'stats: active={mock.active} {mock.summary()}')
+
+    reporter = asyncio.create_task(report()) if args.report_interval > 0 else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if reporter:
+            reporter.cancel()
+        log_line(f'final: {mock.summary()}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SOCKS5 stand-in for tailscaled with failure injection')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--map', type=parse_mapping, action='append', metavar='DEST:PORT=HOST:PORT',
+                        help='send CONNECTs for DEST:PORT to HOST:PORT instead (repeatable)')
+    parser.add_argument('--connect-latency', type=float, default=0, metavar='MS',
+                        help='fixed delay added to every CONNECT')
+    parser.add_argument('--connect-jitter', type=float, default=0, metavar='MS',
+                        help='extra uniform random delay (0..MS) per CONNECT')
+    parser.add_argument('--bandwidth', type=float, default=0, metavar='KIB_S',
+                        help='per-connection, per-direction bandwidth cap (0 = unlimited)')
+    parser.add_argument('--max-connections', type=int, default=0,
+                        help='refuse CONNECTs beyond this many relays, dialing or active (0 = unlimited)')
+    parser.add_argument('--refuse-rate', type=float, default=0,
+                        help='fraction of CONNECTs failed with "connection was refused"')
+    parser.add_argument('--timeout-rate', type=float, default=0,
+                        help='fraction of CONNECTs that hang for --dial-timeout then fail with "context deadline exceeded"')
+    parser.add_argument('--dial-timeout', type=float, default=10.0, metavar='SECONDS')
+    parser.add_argument('--outage', type=parse_outage, action='append', metavar='START+DURATION',
+                        help='refuse every CONNECT between START and START+DURATION seconds after launch (repeatable)')
+    parser.add_argument('--ratelimit-interval', type=float, default=5.0,
+                        help='log rate limiter refill window in seconds (tailscaled: 5)')
+    parser.add_argument('--ratelimit-burst', type=int, default=5,
+                        help='messages per format allowed per window before [RATELIMIT] kicks in')
+    parser.add_argument('--seed', type=int, help='seed failure injection for reproducible runs')
+    parser.add_argument('--report-interval', type=float, default=0, metavar='SECONDS',
+                        help='print counters periodically (0 = only at exit)')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,34 @@
+"""
+SOCKS5 CONNECT client shared by echo-loadgen.py and tds_phases.py
+
+Speaks the same subset main.go's dialer uses against tailscaled: no-auth
+method negotiation, then one CONNECT by IPv4, IPv6 or domain name.
+"""
+
+import ipaddress
+import struct
+
+async def socks5_handshake(reader, writer, host, port):
+    """CONNECT host:port over an open connection to a no-auth SOCKS5 proxy.
+
+    Raises ConnectionError when the proxy refuses; the caller owns the
+    connection and closes it on any failure.
+    """
+    writer.write(b'\x05\x01\x00')
+    if await reader.readexactly(2) != b'\x05\x00':
+        raise ConnectionError('SOCKS5 proxy refused no-auth method')
+    try:
+        address = ipaddress.ip_address(host)
+        request = (b'\x01' if address.version == 4 else b'\x04') + address.packed
+    except ValueError:
+        request = b'\x03' + bytes([len(host)]) + host.encode()
+    writer.write(b'\x05\x01\x00' + request + struct.pack('!H', port))
+    reply = await reader.readexactly(4)
+    if reply[1] != 0:
+        # Same wording the Go proxy client uses for REP=0x01
+        reason = 'general SOCKS server failure' if reply[1] == 1 else f'reply code {reply[1]}'
+        raise ConnectionError(f'socks connect tcp {host}:{port}: {reason}')
+    skip = {1: 4, 4: 16}.get(reply[3])
+    if skip is None:
+        skip = (await reader.readexactly(1))[0]
+    await reader.readexactly(skip + 2)
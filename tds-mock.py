@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Lightweight asyncio SQL Server (TDS 7.x) stand-in so the test-mssql-* scripts
+can run offline and probe connection ceilings cheaply.
+
+Implements just enough of the wire protocol for pymssql/FreeTDS:
+  - PRELOGIN (encryption not supported, so no TLS)
+  - LOGIN7 (optional password check, max-connection limit -> error 17809)
+  - SQL batches: SET/BEGIN/COMMIT/... are acknowledged, and SELECT lists
+    built from 1, 'text', GETDATE(), @@SPID, @@VERSION, @@SERVERNAME with optional aliases
+  - mock_rows(N[, WIDTH]) anywhere in a query returns N synthetic rows of
+    (id INT, payload NVARCHAR(WIDTH)), streamed packet by packet
+
+Usage: python3 tds-mock.py [--port 1433] [--max-connections N] [--latency lognormal:5:0.5] [options]
+Then:  python3 test-mssql-realistic.py 127.0.0.1 master sa anything 1433 1
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import re
+import struct
+import sys
+
+HOST = '0.0.0.0'
+PORT = 1433
+SERVER_NAME = 'MOCKSQL'
+SERVER_VERSION = (15, 0, 2000)  # Reported as SQL Server 2019
+VERSION_STRING = ('Microsoft SQL Server 2019 (RTM) - 15.0.2000.5 (X64) \n'
+                  '\ttds-mock.py (Python asyncio stand-in)\n')
+
+# Packet types
+PKT_SQL_BATCH = 0x01
+PKT_RPC = 0x03
+PKT_REPLY = 0x04
+PKT_ATTENTION = 0x06
+PKT_LOGIN7 = 0x10
+PKT_PRELOGIN = 0x12
+
+STATUS_EOM = 0x01
+HEADER = struct.Struct('>BBHHBB')
+
+# Tokens
+TOKEN_COLMETADATA = 0x81
+TOKEN_ERROR = 0xAA
+TOKEN_LOGINACK = 0xAD
+TOKEN_ROW = 0xD1
+TOKEN_ENVCHANGE = 0xE3
+TOKEN_DONE = 0xFD
+
+DONE_FINAL = 0x00
+DONE_ERROR = 0x02
+DONE_COUNT = 0x10
+DONE_ATTN = 0x20
+CURCMD_SELECT = 0xC1
+
+# Column types
+INTN = 0x26
+DATETIMN = 0x6F
+NVARCHAR = 0xE7
+
+COLLATION = b'\x09\x04\xd0\x00\x34'  # SQL_Latin1_General_CP1_CI_AS
+TDS72 = 0x72000000
+EPOCH = datetime.datetime(1900, 1, 1)
+
+MOCK_ROWS = re.compile(r'mock_rows\s*\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)', re.IGNORECASE)
+SELECT_LIST = re.compile(r'^\s*select\s+(.*?)(?:\s+from\s+.*)?;?\s*$', re.IGNORECASE | re.DOTALL)
+ALIAS = re.compile(r'^(.*?)(?:\s+as)?\s+\[?([A-Za-z_][A-Za-z0-9_]*)\]?$', re.IGNORECASE | re.DOTALL)
+
+def b_varchar(text):
+    return bytes([len(text)]) + text.encode('utf-16-le')
+
+def us_varchar(text):
+    return struct.pack('<H', len(text)) + text.encode('utf-16-le')
+
+class QueryError(Exception):
+    pass
+
+class Column:
+    def __init__(self, name, kind, size=0):
+        self.name = name
+        self.kind = kind
+        self.size = size
+
+    def metadata(self, tds_version):
+        user_type = struct.pack('<I' if tds_version >= TDS72 else '<H', 0)
+        flags = struct.pack('<H', 0x0001)  # nullable
+        if self.kind == INTN:
+            type_info = bytes([INTN, 4])
+        elif self.kind == DATETIMN:
+            type_info = bytes([DATETIMN, 8])
+        else:
+            type_info = bytes([NVARCHAR]) + struct.pack('<H', self.size * 2) + COLLATION
+        return user_type + flags + type_info + b_varchar(self.name)
+
+    def encode(self, value):
+        if value is None:
+            return b'\xff\xff' if self.kind == NVARCHAR else b'\x00'
+        if self.kind == INTN:
+            return b'\x04' + struct.pack('<i', value)
+        if self.kind == DATETIMN:
+            delta = value - EPOCH
+            ticks = round((delta.seconds + delta.microseconds / 1e6) * 300)
+            return b'\x08' + struct.pack('<iI', delta.days, ticks)
+        data = value.encode('utf-16-le')
+        return struct.pack('<H', len(data)) + data
+
+class LatencyModel:
+    """Per-query service time from a spec: fixed:MS, uniform:LO:HI, lognormal:MEDIAN_MS:SIGMA"""
+
+    PARAMS = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+
+    def __init__(self, spec, rng):
+        kind, *params = spec.split(':')
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.rng = rng
+        if kind not in self.PARAMS:
+            raise ValueError(f'unknown latency distribution {kind!r}')
+        if len(self.params) != self.PARAMS[kind]:
+            raise ValueError(f'{kind} takes {self.PARAMS[kind]} parameter(s), got {len(self.params)}')
+
+    def sample(self):
+        """Seconds to wait before answering a batch"""
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = self.rng.uniform(self.params[0], self.params[1])
+        else:
+            median, sigma = self.params
+            ms = median * self.rng.lognormvariate(0, sigma)
+        return ms / 1000.0
+
+class ResponseWriter:
+    """Frames an outgoing message into packets of at most packet_size bytes.
+
+    Large result sets are flushed as they are produced, so memory stays bounded
+    by the packet size rather than the result size.
+    """
+
+    def __init__(self, writer, spid, packet_size):
+        self.writer = writer
+        self.spid = spid
+        self.packet_size = packet_size
+        self.buffer = bytearray()
+        self.packet_id = 1
+
+    async def write(self, data):
+        self.buffer += data
+        limit = self.packet_size - HEADER.size
+        while len(self.buffer) > limit:
+            self._emit(self.buffer[:limit], 0)
+            del self.buffer[:limit]
+            await self.writer.drain()
+
+    async def finish(self):
+        self._emit(self.buffer, STATUS_EOM)
+        self.buffer = bytearray()
+        self.packet_id = 1
+        await self.writer.drain()
+
+    def _emit(self, payload, status):
+        header = HEADER.pack(PKT_REPLY, status, len(payload) + HEADER.size, self.spid, self.packet_id % 256, 0)
+        self.writer.write(header + bytes(payload))
+        self.packet_id += 1
+
+class TdsMock:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latency = LatencyModel(args.latency, self.rng) if args.latency else None
+        self.next_spid = 51
+        self.sessions = 0
+        self.stats = {'logins': 0, 'rejected': 0, 'batches': 0, 'rows': 0}
+
+    async def handle(self, reader, writer):
+        spid = self.next_spid
+        self.next_spid += 1
+        try:
+            await Session(self, spid, reader, writer).run()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def done(self, status, rows, tds_version, curcmd=CURCMD_SELECT):
+        count = struct.pack('<Q' if tds_version >= TDS72 else '<I', rows)
+        return bytes([TOKEN_DONE]) + struct.pack('<HH', status, curcmd) + count
+
+    def error(self, number, message, severity, tds_version, state=1):
+        line = struct.pack('<i' if tds_version >= TDS72 else '<H', 1)
+        body = (struct.pack('<iBB', number, state, severity) + us_varchar(message)
+                + b_varchar(SERVER_NAME) + b_varchar('') + line)
+        return bytes([TOKEN_ERROR]) + struct.pack('<H', len(body)) + body
+
+class Session:
+    """One client connection: prelogin -> login7 -> batches"""
+
+    def __init__(self, server, spid, reader, writer):
+        self.server = server
+        self.spid = spid
+        self.reader = reader
+        self.writer = writer
+        self.tds_version = 0x71000001
+        self.response = ResponseWriter(writer, spid, 4096)
+        self.logged_in = False
+
+    async def read_message(self):
+        """Read packets until end-of-message; returns (type, payload)"""
+        payload = bytearray()
+        while True:
+            header = await self.reader.readexactly(HEADER.size)
+            packet_type, status, length, _, _, _ = HEADER.unpack(header)
+            payload += await self.reader.readexactly(length - HEADER.size)
+            if status & STATUS_EOM:
+                return packet_type, bytes(payload)
+
+    async def run(self):
+        try:
+            while True:
+                packet_type, payload = await self.read_message()
+                if packet_type == PKT_PRELOGIN:
+                    await self.prelogin()
+                elif packet_type == PKT_LOGIN7:
+                    if not await self.login(payload):
+                        return
+                elif packet_type == PKT_SQL_BATCH and self.logged_in:
+                    await self.batch(payload)
+                elif packet_type == PKT_ATTENTION:
+                    await self.response.write(self.server.done(DONE_ATTN, 0, self.tds_version, 0))
+                    await self.response.finish()
+                else:
+                    await self.response.write(self.server.error(
+                        2812, f'tds-mock: unsupported request type 0x{packet_type:02x}', 16, self.tds_version))
+                    await self.response.write(self.server.done(DONE_ERROR, 0, self.tds_version, 0))
+                    await self.response.finish()
+        finally:
+            if self.logged_in:
+                self.server.sessions -= 1
+
+    async def prelogin(self):
+        options = [
+            (0x00, struct.pack('>BBHH', SERVER_VERSION[0], SERVER_VERSION[1], SERVER_VERSION[2], 0)),  # VERSION
+            (0x01, b'\x02'),                                  # ENCRYPTION: not supported
+            (0x02, b'\x00'),                                  # INSTOPT
+            (0x03, struct.pack('>I', self.spid)),             # THREADID
+            (0x04, b'\x00'),                                  # MARS off
+        ]
+        offset = len(options) * 5 + 1
+        table, data = bytearray(), bytearray()
+        for token, value in options:
+            table += struct.pack('>BHH', token, offset + len(data), len(value))
+            data += value
+        await self.response.write(bytes(table) + b'\xff' + bytes(data))
+        await self.response.finish()
+
+    async def login(self, payload):
+        server, args = self.server, self.server.args
+        version, packet_size = struct.unpack_from('<II', payload, 4)
+        self.tds_version = min(version, 0x74000004)
+        if packet_size:
+            self.response.packet_size = max(512, min(packet_size, 32767))
+
+        def field(index):
+            offset, length = struct.unpack_from('<HH', payload, 36 + index * 4)
+            return payload[offset:offset + length * 2]
+
+        username = field(1).decode('utf-16-le')
+        password = bytes(((b ^ 0xA5) << 4 & 0xF0) | ((b ^ 0xA5) >> 4) for b in field(2)).decode('utf-16-le')
+        database = field(8).decode('utf-16-le') or 'master'
+
+        if args.password is not None and password != args.password:
+            return await self.reject(18456, f"Login failed for user '{username}'.")
+        if args.max_connections and server.sessions >= args.max_connections:
+            return await self.reject(17809, 'Could not connect because the maximum number of '
+                                            f"'{args.max_connections}' user connections has already been reached. "
+                                            'The system administrator can use sp_configure to increase the maximum value.')
+
+        # Counted from here, so logins waiting out --login-latency hold their session
+        server.sessions += 1
+        try:
+            if args.login_latency:
+                await asyncio.sleep(args.login_latency / 1000.0)
+
+            size = str(self.response.packet_size)
+            tokens = bytearray()
+            tokens += self.envchange(1, b_varchar(database) + b_varchar('master'))
+            tokens += self.envchange(7, bytes([len(COLLATION)]) + COLLATION + b'\x00')
+            tokens += self.envchange(2, b_varchar('us_english') + b_varchar(''))
+            tokens += self.envchange(4, b_varchar(size) + b_varchar(size))
+            ack = (b'\x01' + struct.pack('>I', self.tds_version) + b_varchar('Microsoft SQL Server')
+                   + bytes([SERVER_VERSION[0], SERVER_VERSION[1]]) + struct.pack('>H', SERVER_VERSION[2]))
+            tokens += bytes([TOKEN_LOGINACK]) + struct.pack('<H', len(ack)) + ack
+            tokens += server.done(DONE_FINAL, 0, self.tds_version, 0)
+            await self.response.write(bytes(tokens))
+            await self.response.finish()
+        except BaseException:
+            server.sessions -= 1
+            raise
+
+        self.logged_in = True
+        server.stats['logins'] += 1
+        if args.verbose:
+            print(f'[spid {self.spid}] login {username}@{database} (active sessions: {server.sessions})')
+        return True
+
+    async def reject(self, number, message):
+        self.server.stats['rejected'] += 1
+        await self.response.write(self.server.error(number, message, 14, self.tds_version))
+        await self.response.write(self.server.done(DONE_ERROR, 0, self.tds_version, 0))
+        await self.response.finish()
+        if self.server.args.verbose:
+            print(f'[spid {self.spid}] login rejected: {message}')
+        return False
+
+    @staticmethod
+    def envchange(kind, values):
+        body = bytes([kind]) + values
+        return bytes([TOKEN_ENVCHANGE]) + struct.pack('<H', len(body)) + body
+
+    async def batch(self, payload):
+        server = self.server
+        server.stats['batches'] += 1
+        if self.tds_version >= TDS72:
+            payload = payload[struct.unpack_from('<I', payload)[0]:]  # skip ALL_HEADERS
+        sql = payload.decode('utf-16-le', errors='replace')
+        if server.latency:
+            await asyncio.sleep(server.latency.sample())
+
+        try:
+            rows_match = MOCK_ROWS.search(sql)
+            if rows_match:
+                await self.synthetic_rows(int(rows_match.group(1)), int(rows_match.group(2) or 100))
+            elif re.match(r'\s*select\b', sql, re.IGNORECASE):
+                await self.select(sql)
+            else:
+                # SET options, transactions, USE, ...: acknowledge without a result set
+                await self.response.write(server.done(DONE_FINAL, 0, self.tds_version, 0))
+        except QueryError as e:
+            await self.response.write(server.error(102, str(e), 15, self.tds_version))
+            await self.response.write(server.done(DONE_ERROR, 0, self.tds_version))
+        await self.response.finish()
+
+    def evaluate(self, expression):
+        """Column and value for one select-list expression"""
+        expr = expression.strip()
+        upper = expr.upper().replace(' ', '')
+        if re.fullmatch(r'-?\d+', expr):
+            return INTN, 0, int(expr)
+        if upper == 'GETDATE()':
+            return DATETIMN, 0, datetime.datetime.now()
+        if upper == '@@SPID':
+            return INTN, 0, self.spid
+        if upper == '@@VERSION':
+            return NVARCHAR, 4000, VERSION_STRING
+        if upper == '@@SERVERNAME':
+            return NVARCHAR, 128, SERVER_NAME
+        if len(expr) >= 2 and expr[0] == expr[-1] == "'":
+            text = expr[1:-1].replace("''", "'")
+            return NVARCHAR, max(len(text), 1), text
+        raise QueryError(f"tds-mock: unsupported expression '{expr}'")
+
+    async def select(self, sql):
+        match = SELECT_LIST.match(sql)
+        if not match:
+            raise QueryError('tds-mock: unsupported SELECT')
+
+        columns, values = [], []
+        for item in split_select_list(match.group(1)):
+            alias = ALIAS.match(item.strip())
+            expression, name = item, ''
+            if alias and alias.group(1).strip() and not item.strip().endswith(')'):
+                expression, name = alias.group(1), alias.group(2)
+            kind, size, value = self.evaluate(expression)
+            columns.append(Column(name, kind, size))
+            values.append(value)
+
+        await self.write_metadata(columns)
+        row = bytes([TOKEN_ROW]) + b''.join(c.encode(v) for c, v in zip(columns, values))
+        await self.response.write(row)
+        await self.response.write(self.server.done(DONE_COUNT, 1, self.tds_version))
+        self.server.stats['rows'] += 1
+
+    async def synthetic_rows(self, count, width):
+        width = max(1, min(width, 4000))
+        columns = [Column('id', INTN), Column('payload', NVARCHAR, width)]
+        await self.write_metadata(columns)
+        payload = columns[1].encode(('0123456789abcdef' * (width // 16 + 1))[:width])
+        for i in range(1, count + 1):
+            await self.response.write(bytes([TOKEN_ROW]) + columns[0].encode(i) + payload)
+        await self.response.write(self.server.done(DONE_COUNT, count, self.tds_version))
+        self.server.stats['rows'] += count
+
+    async def write_metadata(self, columns):
+        data = bytes([TOKEN_COLMETADATA]) + struct.pack('<H', len(columns))
+        data += b''.join(c.metadata(self.tds_version) for c in columns)
+        await self.response.write(data)
+
+def split_select_list(text):
+    """Split on top-level commas (not inside parentheses or quotes)"""
+    items, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ',':
+            items.append(''.join(current))
+            current = []
+            continue
+        current.append(ch)
+    items.append(''.join(current))
+    return [item.strip() for item in items if item.strip()]
+
+async def main(args):
+    mock = TdsMock(args)
+    server = await asyncio.start_server(mock.handle, HOST, args.port, backlog=4096, reuse_address=True)
+    print(f"tds-mock listening on {HOST}:{args.port} "
+          f"(max connections: {args.max_connections or 'unlimited'}, latency: {args.latency or 'none'})")
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.report_interval)
+            s = mock.stats
+            print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] sessions={mock.sessions} logins={s['logins']} "
+                  f"rejected={s['rejected']} batches={s['batches']} rows={s['rows']}")
+
+    reporter = asyncio.create_task(report()) if args.report_interval > 0 else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if reporter:
+            reporter.cancel()
+        s = mock.stats
+        print(f"final: logins={s['logins']} rejected={s['rejected']} batches={s['batches']} rows={s['rows']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Minimal TDS (SQL Server) stand-in for offline testing')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-connections', type=int, default=0,
+                        help='reject logins beyond N concurrent sessions with error 17809 (0 = unlimited)')
+    parser.add_argument('--password', help='require this password (default: accept any)')
+    parser.add_argument('--latency', metavar='SPEC',
+                        help='per-batch latency in ms: fixed:5, uniform:1:20 or lognormal:MEDIAN:SIGMA')
+    parser.add_argument('--login-latency', type=float, default=0, metavar='MS',
+                        help='extra delay before the login acknowledgement')
+    parser.add_argument('--seed', type=int, help='seed the latency distribution')
+    parser.add_argument('--report-interval', type=float, default=0, metavar='SECONDS')
+    parser.add_argument('--verbose', action='store_true', help='log every login')
+    args = parser.parse_args()
+    if args.latency:
+        try:
+            LatencyModel(args.latency, random.Random())
+        except ValueError as e:
+            parser.error(f'--latency: {e}')
+
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
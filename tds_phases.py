@@ -0,0 +1,170 @@
+"""
+Interposed TDS forwarder that times each phase of connection setup
+
+The test script connects pymssql to a local port; the forwarder dials the real
+server (optionally through a SOCKS5 proxy, taking main.go's place in front of
+tailscaled) and timestamps protocol milestones as bytes pass through:
+
+  tcp       TCP connect to the server, or to the SOCKS5 proxy
+  socks     SOCKS5 greeting + CONNECT; tailscaled answers only once it has
+            dialed the destination, so this is the WireGuard/DERP path
+  prelogin  TDS PRELOGIN request -> first response byte
+  tls       TLS handshake carried in PRELOGIN packets (if negotiated)
+  login     LOGIN7 (plain or inside TLS) -> first response byte
+  query     first SQL batch -> first response byte
+  total     accept -> first byte of the first query's response
+
+Each phase is a request/response turn: it starts when the forwarder passes the
+first client byte of a new turn upstream and ends at the first server byte back.
+"""
+
+import asyncio
+import collections
+import threading
+import time
+
+from socks5_client import socks5_handshake
+
+PHASES = ('tcp', 'socks', 'prelogin', 'tls', 'login', 'query', 'total')
+
+# First byte of a client turn -> phase (TDS packet types, or raw TLS records)
+TDS_SQL_BATCH = 0x01
+TDS_LOGIN7 = 0x10
+TDS_PRELOGIN = 0x12
+TLS_HANDSHAKE = 0x16
+TLS_APPLICATION_DATA = 0x17
+
+RELAY_CHUNK = 64 * 1024
+
+class ConnectionPhases:
+    """Milestone timings (ms) for one forwarded connection"""
+
+    def __init__(self):
+        self.accepted = time.perf_counter()
+        self.ms = {}
+        self.error = None
+        self.turn = None  # (phase, started) while waiting for the server's answer
+        self.done = threading.Event()  # set once the first query is answered, or on failure
+
+    def classify(self, first_byte):
+        if first_byte == TDS_PRELOGIN:
+            return 'tls' if 'prelogin' in self.ms else 'prelogin'
+        if first_byte == TLS_HANDSHAKE:
+            return 'tls'
+        if first_byte == TDS_LOGIN7:
+            return 'login'
+        if first_byte == TLS_APPLICATION_DATA:
+            # Fully encrypted: the first exchange after the handshake is the
+            # login, the next one the first batch
+            return 'query' if 'login' in self.ms else 'login'
+        if first_byte == TDS_SQL_BATCH:
+            return 'query'
+        return None
+
+    def client_sent(self, data):
+        if self.turn is None and not self.done.is_set():
+            phase = self.classify(data[0])
+            if phase:
+                self.turn = (phase, time.perf_counter())
+
+    def server_replied(self):
+        if self.turn is None:
+            return
+        phase, started = self.turn
+        self.turn = None
+        now = time.perf_counter()
+        # The TLS handshake takes several turns; add them up
+        self.ms[phase] = self.ms.get(phase, 0.0) + (now - started) * 1000
+        if phase == 'query':
+            self.ms['total'] = (now - self.accepted) * 1000
+            self.done.set()
+
+    def fail(self, error):
+        self.error = error
+        self.done.set()
+
+class PhaseForwarder:
+    """Local forwarder on 127.0.0.1:<port>, run from a daemon thread"""
+
+    def __init__(self, target_host, target_port, socks=None, connect_timeout=10):
+        self.target = (target_host, target_port)
+        self.socks = socks
+        self.connect_timeout = connect_timeout
+        self.pending = collections.deque()  # ConnectionPhases not yet claimed, in accept order
+        self.port = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=lambda: asyncio.run(self._serve()), name='tds-phases', daemon=True).start()
+        self._ready.wait()
+        return self.port
+
+    def claim(self, timeout=1.0):
+        """Timings for every connection accepted since the last claim, oldest first.
+
+        One pymssql.connect() can produce several: FreeTDS retries the TCP
+        connect when the first attempt is dropped.
+        """
+        records = []
+        while self.pending:
+            records.append(self.pending.popleft())
+        if records:
+            records[-1].done.wait(timeout)
+        return records
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=1024)
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, client_reader, client_writer):
+        record = ConnectionPhases()
+        self.pending.append(record)
+        try:
+            upstream_reader, upstream_writer = await self._dial(record)
+        except Exception as e:
+            record.fail(f'{type(e).__name__}: {e}')
+            client_writer.close()
+            return
+        try:
+            await asyncio.gather(
+                self._relay(client_reader, upstream_writer, record.client_sent),
+                self._relay(upstream_reader, client_writer, lambda data: record.server_replied()),
+            )
+        finally:
+            record.done.set()
+            upstream_writer.close()
+            client_writer.close()
+
+    async def _dial(self, record):
+        host, port = self.socks or self.target
+        started = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.connect_timeout)
+        record.ms['tcp'] = (time.perf_counter() - started) * 1000
+        if self.socks:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(socks5_handshake(reader, writer, *self.target), self.connect_timeout)
+            except BaseException:
+                writer.close()  # refused, timed out or dropped mid-handshake
+                raise
+            record.ms['socks'] = (time.perf_counter() - started) * 1000
+        return reader, writer
+
+    async def _relay(self, reader, writer, observe):
+        try:
+            while True:
+                data = await reader.read(RELAY_CHUNK)
+                if not data:
+                    break
+                # Timestamp before forwarding, so the test script can't see the
+                # bytes before the milestone is recorded
+                observe(data)
+                writer.write(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            writer.close()
@@ -1,16 +1,31 @@
 import sys
+import argparse
 import pymssql
 import time
 import datetime
+import random
+import math
+import heapq
+import queue
+import collections
+import concurrent.futures
 
-def test_mssql_connection_health(server, database, username, password, port=1433, duration_minutes=10, query_interval_ms=5000):
+from latency_histogram import LatencyHistogram
+from mssql_events import EventRecorder, error_class
+import reconnect
+
+def test_mssql_connection_health(server, database, username, password, port=1433, duration_minutes=10, query_interval_ms=5000,
+                                 events=None, quiet=False, manager=None):
     """Test MSSQL connection health with continuous queries"""
+    manager = manager or reconnect.ReconnectManager()
     print(f"=== Database Connection Health Test ===")
     print(f"Target: {server}:{port}")
     print(f"Database: {database}")
     print(f"Username: {username}")
     print(f"Duration: {duration_minutes} minutes")
     print(f"Query interval: {query_interval_ms}ms")
+    print(f"Reconnect: backoff {manager.base}s-{manager.cap}s, breaker after {manager.failure_threshold} "
+          f"failures for {manager.open_seconds}s")
     print(f"Start time: {datetime.datetime.now()}")
     print()
 
@@ -25,61 +40,92 @@ def test_mssql_connection_health(server, database, username, password, port=1433
     start_time = time.time()
     end_time = start_time + test_duration
 
+    def connect(phase):
+        # timeout=0: a deferred reconnect fails this check instead of
+        # stalling the schedule; the next check asks again
+        if not manager.acquire(timeout=0):
+            raise reconnect.CircuitOpen(f"reconnect deferred (backoff, breaker {manager.state})")
+        connect_start = time.time()
+        try:
+            new_conn = pymssql.connect(
+                server=f"{server}:{port}",
+                database=database,
+                user=username,
+                password=password,
+                timeout=10
+            )
+        except Exception as e:
+            manager.record_failure(error_class(e))
+            if events:
+                events.record('connect', worker=total_queries, phase=phase,
+                              latency_ms=(time.time() - connect_start) * 1000, ok=False, error=error_class(e))
+            raise
+        manager.record_success()
+        if events:
+            events.record('connect', worker=total_queries, phase=phase,
+                          latency_ms=(time.time() - connect_start) * 1000)
+        return new_conn
+
     try:
         # Initial connection
         print("Establishing initial connection...")
-        conn = pymssql.connect(
-            server=f"{server}:{port}",
-            database=database,
-            user=username,
-            password=password,
-            timeout=10
-        )
+        conn = connect('initial')
         print("✓ Initial connection successful!")
         print()
 
         while time.time() < end_time:
             total_queries += 1
             query_start = time.time()
-            
-            try:
-                cursor = conn.cursor()
-                # Simple health check query
-                cursor.execute("SELECT GETDATE() as CurrentTime, @@SPID as SessionID")
-                row = cursor.fetchone()
-                cursor.close()
-                
-                query_time = (time.time() - query_start) * 1000  # Convert to milliseconds
-                success_count += 1
-                
-                elapsed_minutes = int((time.time() - start_time) / 60)
-                remaining_minutes = int((end_time - time.time()) / 60)
-                
-                print(f"[{total_queries:3d}] ✓ SUCCESS - {query_time:.1f}ms - Time: {row[0]} - Session: {row[1]} - Elapsed: {elapsed_minutes}m - Remaining: {remaining_minutes}m")
-                
-            except pymssql.Error as e:
-                failed_count += 1
-                print(f"[{total_queries:3d}] ✗ QUERY FAILED - {e}")
-                
-                # Try to reconnect
+
+            if conn is None:
                 try:
-                    print("    Attempting to reconnect...")
-                    if conn:
-                        conn.close()
-                    conn = pymssql.connect(
-                        server=f"{server}:{port}",
-                        database=database,
-                        user=username,
-                        password=password,
-                        timeout=10
-                    )
+                    conn = connect('reconnect')
                     print("    ✓ Reconnection successful")
                 except Exception as reconnect_error:
-                    print(f"    ✗ Reconnection failed: {reconnect_error}")
-                    
-            except Exception as e:
-                failed_count += 1
-                print(f"[{total_queries:3d}] ✗ UNEXPECTED ERROR - {e}")
+                    failed_count += 1
+                    print(f"[{total_queries:3d}] ✗ RECONNECT FAILED - {reconnect_error}")
+
+            if conn is not None:
+                try:
+                    cursor = conn.cursor()
+                    # Simple health check query
+                    cursor.execute("SELECT GETDATE() as CurrentTime, @@SPID as SessionID")
+                    row = cursor.fetchone()
+                    cursor.close()
+
+                    query_time = (time.time() - query_start) * 1000  # Convert to milliseconds
+                    success_count += 1
+                    manager.record_success()
+                    if events:
+                        events.record('query', worker=total_queries, session=row[1], latency_ms=query_time)
+
+                    elapsed_minutes = int((time.time() - start_time) / 60)
+                    remaining_minutes = int((end_time - time.time()) / 60)
+
+                    if not quiet:
+                        print(f"[{total_queries:3d}] ✓ SUCCESS - {query_time:.1f}ms - Time: {row[0]} - Session: {row[1]} - Elapsed: {elapsed_minutes}m - Remaining: {remaining_minutes}m")
+
+                except pymssql.Error as e:
+                    failed_count += 1
+                    manager.record_failure(error_class(e))
+                    if events:
+                        events.record('query', worker=total_queries, latency_ms=(time.time() - query_start) * 1000,
+                                      ok=False, error=error_class(e))
+                    print(f"[{total_queries:3d}] ✗ QUERY FAILED - {e}")
+
+                    # Reconnect on the next check, once the manager allows it
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = None
+
+                except Exception as e:
+                    failed_count += 1
+                    if events:
+                        events.record('query', worker=total_queries, latency_ms=(time.time() - query_start) * 1000,
+                                      ok=False, error=error_class(e))
+                    print(f"[{total_queries:3d}] ✗ UNEXPECTED ERROR - {e}")
 
             # Show periodic statistics every N queries based on interval
             queries_per_minute = int(60000 / query_interval_ms)  # Calculate based on milliseconds
@@ -119,35 +165,364 @@ def test_mssql_connection_health(server, database, username, password, port=1433
     print(f"Successful: {success_count}")
     print(f"Failed: {failed_count}")
     print(f"Success rate: {success_rate}%")
+    print()
+    reconnect.print_outage_report(manager.snapshot())
+    if events:
+        events.close()
+        print(f"Events: {events.count} written to {events.path}")
     
     return 0 if failed_count == 0 else 1
 
+class Target:
+    """One server/database under watch: its own connection, reconnect state and
+    rolling window of recent checks"""
+
+    def __init__(self, index, server, port, database, username, password, window, manager=None):
+        self.index = index
+        self.server = server
+        self.port = port
+        self.database = database
+        self.username = username
+        self.password = password
+        self.name = f"{server}:{port}/{database}"
+        self.window = window
+        self.conn = None
+        self.checks = 0
+        self.failed = 0
+        self.late = 0  # checks that started a whole interval behind schedule
+        self.reconnects = 0
+        self.reconnect = manager or reconnect.ReconnectManager()
+        self.last_error = None
+        self.latency = LatencyHistogram()
+        self.recent = collections.deque()  # (finished, ok, latency_ms) within the window
+
+    def check(self, events):
+        """Run one health check on this target's connection, reconnecting first
+        if the previous check lost it. Called from a pool thread; a target is
+        never checked by two threads at once."""
+        start = time.time()
+        try:
+            if self.conn is None:
+                self.connect(events)
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT GETDATE() as CurrentTime, @@SPID as SessionID")
+            row = cursor.fetchone()
+            cursor.close()
+        except Exception as e:
+            latency = (time.time() - start) * 1000
+            self.failed += 1
+            self.last_error = error_class(e)
+            if self.conn is not None:
+                self.reconnect.record_failure(self.last_error)
+                try:
+                    self.conn.close()
+                except Exception:
+                    pass
+                self.conn = None
+            if events:
+                events.record('query', worker=self.index, phase=self.name, latency_ms=latency,
+                              ok=False, error=error_class(e))
+            self.finish(False, latency)
+            return False, latency, None
+
+        latency = (time.time() - start) * 1000
+        self.reconnect.record_success()
+        self.latency.record(latency)
+        if events:
+            events.record('query', worker=self.index, session=row[1], phase=self.name, latency_ms=latency)
+        self.finish(True, latency)
+        return True, latency, row[1]
+
+    def connect(self, events):
+        # Deferred attempts fail the check at once; the next check asks again
+        if not self.reconnect.acquire(timeout=0):
+            raise reconnect.CircuitOpen(f"reconnect deferred (breaker {self.reconnect.state})")
+        connect_start = time.time()
+        reopening = self.checks > 0
+        try:
+            self.conn = pymssql.connect(
+                server=f"{self.server}:{self.port}",
+                database=self.database,
+                user=self.username,
+                password=self.password,
+                timeout=10,
+                login_timeout=10
+            )
+        except Exception as e:
+            self.reconnect.record_failure(error_class(e))
+            if events:
+                events.record('connect', worker=self.index, phase=self.name,
+                              latency_ms=(time.time() - connect_start) * 1000, ok=False, error=error_class(e))
+            raise
+        if events:
+            events.record('connect', worker=self.index, phase=self.name,
+                          latency_ms=(time.time() - connect_start) * 1000)
+        if reopening:
+            self.reconnects += 1
+
+    def finish(self, ok, latency):
+        now = time.time()
+        self.checks += 1
+        self.recent.append((now, ok, latency))
+        self.trim(now)
+
+    def trim(self, now):
+        recent = self.recent
+        while recent and recent[0][0] < now - self.window:
+            recent.popleft()
+
+    def window_stats(self, now):
+        """(checks, success %, p50 ms, p99 ms) over the rolling window"""
+        self.trim(now)
+        recent = list(self.recent)
+        if not recent:
+            return 0, 0.0, 0.0, 0.0
+        latencies = sorted(latency for _, ok, latency in recent if ok)
+        ok_count = len(latencies)
+        if not latencies:
+            return len(recent), 0.0, 0.0, 0.0
+        return (len(recent), ok_count * 100.0 / len(recent),
+                latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))])
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+def parse_targets(path, default_username, default_password, default_port, window):
+    """Target file: one router per line, as
+         [user:password@]host[:port] database [database ...]
+    blank lines and # comments are ignored"""
+    targets = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) < 2:
+                raise ValueError(f"{path}:{line_number}: expected 'host[:port] database [database ...]'")
+            credentials, _, endpoint = fields[0].rpartition('@')
+            username, password = default_username, default_password
+            if credentials:
+                username, _, password = credentials.partition(':')
+            host, _, port = endpoint.partition(':')
+            for database in fields[1:]:
+                targets.append(Target(len(targets), host, int(port) if port else default_port, database,
+                                      username, password, window))
+    return targets
+
+def print_target_table(targets, window):
+    now = time.time()
+    print(f"  {'target':<36} {'checks':>7} {'failed':>6} {f'in {window:g}s':>7} {f'ok% {window:g}s':>8} {'p50 ms':>8} "
+          f"{'p99 ms':>8}  state")
+    for target in targets:
+        count, success, p50, p99 = target.window_stats(now)
+        outage = target.reconnect.outage
+        if outage is not None:
+            state = f"DOWN {now - outage.detected:.0f}s, breaker {target.reconnect.state} ({target.last_error})"
+        elif target.checks:
+            state = "up"
+        else:
+            state = "pending"
+        print(f"  {target.name:<36} {target.checks:>7} {target.failed:>6} {count:>7} {success:>7.1f}% {p50:>8.1f} "
+              f"{p99:>8.1f}  {state}")
+
+def watch_targets(targets, duration_minutes=10, query_interval_ms=5000, jitter=0.1, threads=None,
+                  window=60.0, report_interval=10.0, events=None, quiet=False):
+    """Health-check many targets from one scheduler thread and a bounded pool.
+
+    A heap holds each target's next due time. The scheduler sleeps until the
+    earliest one, hands it to the pool and only re-arms the target when its
+    check comes back, so a hung target holds at most one thread and never
+    piles up work. Idle cost is one timed wait, however many targets there are.
+    """
+    threads = threads or min(32, len(targets))
+    interval = query_interval_ms / 1000.0
+
+    print("=" * 70)
+    print("=== Multi-Target Database Health Watch ===")
+    print("=" * 70)
+    servers = sorted({(t.server, t.port) for t in targets})
+    print(f"Targets:            {len(targets)} databases on {len(servers)} servers")
+    print(f"Check interval:     {query_interval_ms}ms per target (±{jitter * 100:.0f}% jitter)")
+    print(f"Thread pool:        {threads}")
+    print(f"Rolling window:     {window:g}s")
+    print(f"Duration:           {duration_minutes} minutes")
+    print(f"Start time:         {datetime.datetime.now()}")
+    print("=" * 70)
+    print()
+
+    start_time = time.time()
+    end_time = start_time + duration_minutes * 60
+    # First checks spread over one interval so targets don't fire in lockstep;
+    # each target then keeps to a grid of slots one interval apart, and
+    # jitter moves each check off its slot. Entries: (due, target, slot)
+    due = []
+    for target in targets:
+        slot = start_time + random.uniform(0, interval)
+        due.append((slot, target.index, slot))
+    heapq.heapify(due)
+    completed = queue.Queue()
+    in_flight = 0
+    next_report = start_time + report_interval
+
+    def run_check(target, slot):
+        try:
+            result = target.check(events)
+        except Exception as e:  # never lose a target to a bug in one check
+            result = (False, 0.0, None)
+            target.last_error = f"{type(e).__name__}: {e}"
+        completed.put((target, slot, result))
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix='check')
+    try:
+        while True:
+            now = time.time()
+            while due and due[0][0] <= now and now < end_time:
+                _, index, slot = heapq.heappop(due)
+                executor.submit(run_check, targets[index], slot)
+                in_flight += 1
+            if now >= end_time and not in_flight:
+                break
+            if now >= next_report:
+                print()
+                print(f"--- {int(now - start_time) // 60}m {int(now - start_time) % 60}s: "
+                      f"{sum(t.checks for t in targets)} checks, {in_flight} in flight ---")
+                print_target_table(targets, window)
+                print()
+                next_report += report_interval
+
+            wake = next_report
+            if now < end_time:
+                wake = min(wake, due[0][0] if due else end_time, end_time)
+            try:
+                target, slot, (ok, latency, session) = completed.get(timeout=max(0.0, wake - time.time()))
+            except queue.Empty:
+                continue
+            in_flight -= 1
+            finished = time.time()
+            if not quiet or not ok:
+                status = (f"✓ {latency:.1f}ms session {session}" if ok
+                          else f"✗ FAILED after {latency:.1f}ms - {target.last_error}")
+                print(f"[{target.name}] #{target.checks} {status}")
+
+            # Stay on the target's own grid; if the check overran whole
+            # intervals, skip those slots rather than firing back-to-back
+            slot += interval
+            if slot < finished:
+                target.late += 1
+                slot += interval * math.ceil((finished - slot) / interval)
+            next_due = max(slot + interval * random.uniform(-jitter, jitter), finished)
+            heapq.heappush(due, (next_due, target.index, slot))
+    except KeyboardInterrupt:
+        print("\n\nTest interrupted by user")
+    finally:
+        # Checks already running still use their target's connection
+        executor.shutdown(wait=True, cancel_futures=True)
+        for target in targets:
+            target.close()
+
+    elapsed_total = int(time.time() - start_time)
+    total_checks = sum(t.checks for t in targets)
+    total_failed = sum(t.failed for t in targets)
+    latency = LatencyHistogram.merged(t.latency for t in targets)
+
+    print()
+    print("=" * 70)
+    print("=== Test Complete ===")
+    print("=" * 70)
+    print(f"End time:           {datetime.datetime.now()}")
+    print(f"Total duration:     {elapsed_total//60}m {elapsed_total%60}s")
+    print(f"Total checks:       {total_checks} ({total_checks / max(elapsed_total, 1):.1f}/s)")
+    print(f"  Failed:           {total_failed}")
+    print(f"  Reconnects:       {sum(t.reconnects for t in targets)}")
+    print(f"  Late (overran):   {sum(t.late for t in targets)}")
+    if latency.count:
+        print(f"  Latency:          p50 {latency.percentile(50):.1f}ms, p99 {latency.percentile(99):.1f}ms, "
+              f"max {latency.max:.1f}ms")
+    print()
+    print("Per target (whole run):")
+    print(f"  {'target':<36} {'checks':>7} {'failed':>6} {'ok%':>7} {'p50 ms':>8} {'p99 ms':>8} {'reconn':>6} "
+          f"{'outages':>7} {'max recover s':>13}")
+    snapshots = []
+    for target in targets:
+        success = (target.checks - target.failed) * 100.0 / target.checks if target.checks else 0.0
+        snapshot = target.reconnect.snapshot()
+        snapshots.append(snapshot)
+        recover = [o[1] for o in snapshot['outages'] if o[1] is not None]
+        print(f"  {target.name:<36} {target.checks:>7} {target.failed:>6} {success:>6.1f}% "
+              f"{target.latency.percentile(50):>8.1f} {target.latency.percentile(99):>8.1f} {target.reconnects:>6} "
+              f"{len(snapshot['outages']):>7} {f'{max(recover):.2f}' if recover else '-':>13}")
+    print()
+    reconnect.print_outage_report(reconnect.merge_snapshots(snapshots))
+    print("=" * 70)
+    if events:
+        events.close()
+        print(f"Events: {events.count} written to {events.path}")
+
+    return 0 if total_failed == 0 else 1
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python3 test-mssql-auth.py <server> <database> <username> <password> [port] [duration_minutes] [query_interval_ms] [options]",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123
+  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433
+  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433 15
+  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433 15 2000
+  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433 600 100 --events run.bin --quiet
+  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433 60 500 --targets targets.txt --quiet
+
+--targets file (one server per line; the positional server/database is watched too):
+  # [user:password@]host[:port] database [database ...]
+  172.16.4.207 orders billing
+  app:Secret1@172.16.20.88:1433 inventory reporting""")
+    parser.add_argument("server", help="Database server IP/hostname")
+    parser.add_argument("database", help="Database name")
+    parser.add_argument("username", help="Database username")
+    parser.add_argument("password", help="Database password")
+    parser.add_argument("port", nargs="?", type=int, default=1433, help="Database port (default: 1433)")
+    parser.add_argument("duration_minutes", nargs="?", type=int, default=10,
+                        help="Test duration in minutes (default: 10)")
+    parser.add_argument("query_interval_ms", nargs="?", type=int, default=5000,
+                        help="Milliseconds between queries (default: 5000)")
+    parser.add_argument("--events", metavar="PATH",
+                        help="record every connect/query to PATH (.jsonl, or .bin for compact binary)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="no line per successful query; failures and periodic statistics only")
+    parser.add_argument("--targets", metavar="FILE",
+                        help="watch every database listed in FILE as well, each on its own connection "
+                             "and jittered schedule")
+    parser.add_argument("--threads", type=int,
+                        help="with --targets: checks running at once (default: targets, up to 32)")
+    parser.add_argument("--jitter", type=float, default=0.1,
+                        help="with --targets: +/- fraction of the interval added to each check (default: 0.1)")
+    parser.add_argument("--window", type=float, default=60.0, metavar="SECONDS",
+                        help="with --targets: rolling success-rate/latency window (default: 60)")
+    parser.add_argument("--report-interval", type=float, default=10.0, metavar="SECONDS",
+                        help="with --targets: how often the per-target table is printed (default: 10)")
+    reconnect.add_arguments(parser)
+
     if len(sys.argv) < 5:
-        print("Usage: python3 test-mssql-auth.py <server> <database> <username> <password> [port] [duration_minutes] [query_interval_ms]")
-        print()
-        print("Arguments:")
-        print("  server            - Database server IP/hostname")
-        print("  database          - Database name")
-        print("  username          - Database username")
-        print("  password          - Database password")
-        print("  port              - Database port (default: 1433)")
-        print("  duration_minutes  - Test duration in minutes (default: 10)")
-        print("  query_interval_ms - Milliseconds between queries (default: 5000)")
-        print()
-        print("Examples:")
-        print("  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123")
-        print("  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433")
-        print("  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433 15")
-        print("  python3 test-mssql-auth.py 172.16.4.207 master sa MyPassword123 1433 15 2000")
+        parser.print_help()
         sys.exit(1)
+    args = parser.parse_args()
+    events = EventRecorder(args.events) if args.events else None
 
-    server = sys.argv[1]
-    database = sys.argv[2]
-    username = sys.argv[3]
-    password = sys.argv[4]
-    port = int(sys.argv[5]) if len(sys.argv) > 5 else 1433
-    duration_minutes = int(sys.argv[6]) if len(sys.argv) > 6 else 10
-    query_interval_ms = int(sys.argv[7]) if len(sys.argv) > 7 else 5000
+    if args.targets:
+        targets = [Target(0, args.server, args.port, args.database, args.username, args.password, args.window)]
+        for target in parse_targets(args.targets, args.username, args.password, args.port, args.window):
+            target.index = len(targets)
+            targets.append(target)
+        for target in targets:
+            target.reconnect = reconnect.from_arguments(args)
+        sys.exit(watch_targets(targets, args.duration_minutes, args.query_interval_ms, args.jitter, args.threads,
+                               args.window, args.report_interval, events, args.quiet))
 
-    sys.exit(test_mssql_connection_health(server, database, username, password, port, duration_minutes, query_interval_ms))
+    sys.exit(test_mssql_connection_health(args.server, args.database, args.username, args.password, args.port,
+                                          args.duration_minutes, args.query_interval_ms, events, args.quiet,
+                                          reconnect.from_arguments(args)))
@@ -2,27 +2,39 @@
 """
 Gradual SQL Server connection test - creates connections one by one
 This helps identify exactly when the connection limit is hit
-Usage: python3 test-mssql-gradual.py <server> <database> <username> <password> [port] [max_connections] [delay]
+Usage: python3 test-mssql-gradual.py <server> <database> <username> <password> [port] [max_connections] [delay] [--phases [--socks HOST:PORT]]
 """
 
 import sys
+import argparse
 import pymssql
 import time
 import datetime
 
+from mssql_events import EventRecorder, error_class
+from tds_phases import PHASES, PhaseForwarder
+
 class ConnectionTracker:
     """Track and hold multiple database connections"""
-    def __init__(self):
+    def __init__(self, forwarder=None, events=None, quiet=False):
         self.connections = []
         self.successful = 0
         self.failed = 0
+        self.events = events  # optional EventRecorder
+        self.quiet = quiet  # only failures and progress markers on the console
+        # --phases: connections go through a local forwarder that times each step
+        self.forwarder = forwarder
+        self.phase_records = []  # (conn_id, ConnectionPhases)
 
     def add_connection(self, conn_id, server, database, username, password, port=1433):
         """Attempt to create and store a new connection"""
+        start_time = time.time()
         try:
-            print(f"\n[{conn_id:3d}] Attempting connection...")
-            start_time = time.time()
+            if not self.quiet:
+                print(f"\n[{conn_id:3d}] Attempting connection...")
 
+            if self.forwarder:
+                server, port = '127.0.0.1', self.forwarder.port
             conn = pymssql.connect(
                 server=f"{server}:{port}",
                 database=database,
@@ -48,26 +60,64 @@ class ConnectionTracker:
             })
 
             self.successful += 1
-            print(f"[{conn_id:3d}] ✓ SUCCESS - Session {session_id} - {connect_time:.1f}ms")
-            print(f"      Total active connections: {len(self.connections)}")
+            if self.events:
+                self.events.record('connect', worker=conn_id, session=session_id, latency_ms=connect_time)
+            if not self.quiet:
+                print(f"[{conn_id:3d}] ✓ SUCCESS - Session {session_id} - {connect_time:.1f}ms")
+            self.record_phases(conn_id, session_id)
+            if not self.quiet:
+                print(f"      Total active connections: {len(self.connections)}")
 
             return True
 
         except pymssql.Error as e:
             self.failed += 1
             error_msg = str(e)
+            if self.events:
+                self.events.record('connect', worker=conn_id, latency_ms=(time.time() - start_time) * 1000,
+                                   ok=False, error=error_class(e))
             print(f"[{conn_id:3d}] ✗ FAILED - Database error")
             print(f"      Error: {error_msg}")
+            self.record_phases(conn_id)
             print(f"      Total active connections: {len(self.connections)}")
             return False
 
         except Exception as e:
             self.failed += 1
+            if self.events:
+                self.events.record('connect', worker=conn_id, latency_ms=(time.time() - start_time) * 1000,
+                                   ok=False, error=error_class(e))
             print(f"[{conn_id:3d}] ✗ FAILED - Unexpected error")
             print(f"      Error: {e}")
+            self.record_phases(conn_id)
             print(f"      Total active connections: {len(self.connections)}")
             return False
 
+    def record_phases(self, conn_id, session_id=None):
+        """Pick up the forwarder's timings for the connection just attempted"""
+        if not self.forwarder:
+            return
+        records = self.forwarder.claim()
+        if not records:
+            return
+        # The last socket is the one pymssql ended up using (or gave up on)
+        record = records[-1]
+        self.phase_records.append((conn_id, record))
+        if self.events:
+            for phase in PHASES:
+                if phase in record.ms:
+                    self.events.record('phase', worker=conn_id, session=session_id, phase=phase,
+                                       latency_ms=record.ms[phase])
+            if record.error:
+                self.events.record('phase', worker=conn_id, phase='dial', ok=False, error=record.error)
+        steps = '  '.join(f"{phase} {record.ms[phase]:.1f}" for phase in PHASES if phase in record.ms)
+        if not self.quiet or record.error:
+            print(f"      Phases (ms): {steps}")
+        if len(records) > 1:
+            print(f"      Forwarder:   {len(records)} TCP connections for this attempt (driver retried)")
+        if record.error:
+            print(f"      Forwarder:   {record.error}")
+
     def close_all(self):
         """Close all connections"""
         print(f"\n\nClosing all {len(self.connections)} connections...")
@@ -83,7 +133,38 @@ class ConnectionTracker:
         print(f"✓ Closed {closed} connections")
         return closed
 
-def test_gradual_connections(server, database, username, password, port=1433, max_connections=100, delay=2):
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))]
+
+def print_phase_report(records, bucket_size):
+    """Per-phase distributions overall and for each block of bucket_size connections"""
+    phases = [phase for phase in PHASES if any(phase in record.ms for _, record in records)]
+    if not phases:
+        return
+
+    print()
+    print("Connection Phases (ms):")
+    print(f"  {'phase':<9} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for phase in phases:
+        values = sorted(record.ms[phase] for _, record in records if phase in record.ms)
+        print(f"  {phase:<9} {len(values):>6} {percentile(values, 50):>9.1f} {percentile(values, 95):>9.1f} "
+              f"{percentile(values, 99):>9.1f} {values[-1]:>9.1f}")
+
+    print()
+    print(f"Median phase time (ms) by connection number, blocks of {bucket_size}:")
+    print(f"  {'conns':<9}" + ''.join(f" {phase:>9}" for phase in phases))
+    for first in range(0, len(records), bucket_size):
+        block = records[first:first + bucket_size]
+        row = f"  {f'{block[0][0]}-{block[-1][0]}':<9}"
+        for phase in phases:
+            values = sorted(record.ms[phase] for _, record in block if phase in record.ms)
+            row += f" {percentile(values, 50):>9.1f}" if values else f" {'-':>9}"
+        print(row)
+
+def test_gradual_connections(server, database, username, password, port=1433, max_connections=100, delay=2,
+                             phases=False, socks=None, phase_bucket=10, events=None, quiet=False):
     """Create connections gradually one by one"""
     print("=" * 70)
     print("=== Gradual Connection Test ===")
@@ -93,6 +174,8 @@ def test_gradual_connections(server, database, username, password, port=1433, ma
     print(f"Username:            {username}")
     print(f"Max connections:     {max_connections}")
     print(f"Delay per conn:      {delay}s")
+    if phases:
+        print(f"Phase timing:        on, via local forwarder{f' and SOCKS5 {socks[0]}:{socks[1]}' if socks else ''}")
     print(f"Start time:          {datetime.datetime.now()}")
     print("=" * 70)
     print()
@@ -100,7 +183,12 @@ def test_gradual_connections(server, database, username, password, port=1433, ma
     print("Watch for the point where connections start failing.")
     print()
 
-    tracker = ConnectionTracker()
+    forwarder = None
+    if phases:
+        forwarder = PhaseForwarder(server, port, socks)
+        print(f"Phase forwarder listening on 127.0.0.1:{forwarder.start()} -> {server}:{port}")
+        print()
+    tracker = ConnectionTracker(forwarder, events, quiet)
     start_time = time.time()
 
     first_failure = None
@@ -179,41 +267,67 @@ def test_gradual_connections(server, database, username, password, port=1433, ma
         success_rate = (tracker.successful * 100) / (tracker.successful + tracker.failed)
         print(f"   Success rate:         {success_rate:.1f}%")
 
+    if tracker.phase_records:
+        print_phase_report(tracker.phase_records, phase_bucket)
+
+    if events:
+        events.close()
+        print()
+        print(f"Events: {events.count} written to {events.path}")
+
     print("=" * 70)
 
     return 0
 
+def parse_endpoint(value):
+    host, _, port = value.rpartition(':')
+    return host.strip('[]'), int(port)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python3 test-mssql-gradual.py <server> <database> <username> <password> [port] [max_connections] [delay] [options]",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  python3 test-mssql-gradual.py 172.16.20.88 master sa MyPass123
+  python3 test-mssql-gradual.py 172.16.20.88 master sa MyPass123 1433
+  python3 test-mssql-gradual.py 172.16.20.88 master sa MyPass123 1433 150 1
+  python3 test-mssql-gradual.py 172.16.20.88 master sa MyPass123 1433 50 1 --phases --socks localhost:1055
+
+This test:
+  - Creates connections one by one (not in parallel)
+  - Shows exactly when the limit is hit
+  - Holds all connections to verify stability
+  - Waits 10 seconds before cleanup (time to check logs)
+
+With --phases each connection goes through a local forwarder that times
+tcp / socks / prelogin / tls / login / first query separately. Add --socks to
+have the forwarder dial through tailscaled itself (in place of main.go), so
+the SOCKS CONNECT - the tunnel path - is timed on its own.""")
+    parser.add_argument("server", help="Database server IP/hostname")
+    parser.add_argument("database", help="Database name")
+    parser.add_argument("username", help="Database username")
+    parser.add_argument("password", help="Database password")
+    parser.add_argument("port", nargs="?", type=int, default=1433, help="Database port (default: 1433)")
+    parser.add_argument("max_connections", nargs="?", type=int, default=100,
+                        help="Maximum connections to attempt (default: 100)")
+    parser.add_argument("delay", nargs="?", type=float, default=2, help="Seconds between connections (default: 2)")
+    parser.add_argument("--phases", action="store_true", help="time each phase of connection setup")
+    parser.add_argument("--socks", type=parse_endpoint, metavar="HOST:PORT",
+                        help="with --phases, reach the server through this SOCKS5 proxy (e.g. localhost:1055)")
+    parser.add_argument("--phase-bucket", type=int, default=10,
+                        help="connections per row in the phase-by-connection-count table (default: 10)")
+    parser.add_argument("--events", metavar="PATH",
+                        help="record every connection (and phase) to PATH (.jsonl, or .bin for compact binary)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="no lines per successful connection; failures and progress markers only")
+
     if len(sys.argv) < 5:
-        print("Usage: python3 test-mssql-gradual.py <server> <database> <username> <password> [port] [max_connections] [delay]")
-        print()
-        print("Arguments:")
-        print("  server          - Database server IP/hostname")
-        print("  database        - Database name")
-        print("  username        - Database username")
-        print("  password        - Database password")
-        print("  port            - Database port (default: 1433)")
-        print("  max_connections - Maximum connections to attempt (default: 100)")
-        print("  delay           - Seconds between connections (default: 2)")
-        print()
-        print("Examples:")
-        print("  python3 test-mssql-gradual.py 172.16.20.88 master sa MyPass123")
-        print("  python3 test-mssql-gradual.py 172.16.20.88 master sa MyPass123 1433")
-        print("  python3 test-mssql-gradual.py 172.16.20.88 master sa MyPass123 1433 150 1")
-        print()
-        print("This test:")
-        print("  - Creates connections one by one (not in parallel)")
-        print("  - Shows exactly when the limit is hit")
-        print("  - Holds all connections to verify stability")
-        print("  - Waits 10 seconds before cleanup (time to check logs)")
+        parser.print_help()
         sys.exit(1)
+    args = parser.parse_args()
+    if args.socks and not args.phases:
+        parser.error("--socks is only used with --phases")
 
-    server = sys.argv[1]
-    database = sys.argv[2]
-    username = sys.argv[3]
-    password = sys.argv[4]
-    port = int(sys.argv[5]) if len(sys.argv) > 5 else 1433
-    max_connections = int(sys.argv[6]) if len(sys.argv) > 6 else 100
-    delay = float(sys.argv[7]) if len(sys.argv) > 7 else 2
-
-    sys.exit(test_gradual_connections(server, database, username, password, port, max_connections, delay))
+    sys.exit(test_gradual_connections(args.server, args.database, args.username, args.password, args.port,
+                                      args.max_connections, args.delay, args.phases, args.socks, args.phase_bucket,
+                                      EventRecorder(args.events) if args.events else None, args.quiet))
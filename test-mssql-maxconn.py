@@ -2,14 +2,26 @@
 """
 Test SQL Server maximum concurrent connections through Tailscale
 This script creates many parallel connections to find the connection limit
-Usage: python3 test-mssql-maxconn.py <server> <database> <username> <password> [port] [max_connections]
+Usage: python3 test-mssql-maxconn.py <server> <database> <username> <password> [port] [max_connections] [--arrival SPEC]
+
+Without --arrival connections are started in batches of 10 (the original test).
+With --arrival the connects follow an open-loop arrival schedule, independent of
+how fast earlier connects complete, and are run on a bounded thread pool:
+  constant:RATE                 RATE connects/sec
+  step:START:STEP:SECONDS       START connects/sec, +STEP every SECONDS (a negative STEP stops at 0)
+  exp:START:FACTOR:SECONDS      START connects/sec, x FACTOR every SECONDS
 """
 
 import sys
+import argparse
+import collections
 import pymssql
 import threading
 import time
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from mssql_events import EventRecorder, error_class
 
 # Global counters
 lock = threading.Lock()
@@ -18,12 +30,15 @@ successful_connections = 0
 failed_connections = 0
 max_concurrent_reached = 0
 connection_errors = []
+events = None  # --events: EventRecorder for every attempt
+quiet = False  # --quiet: no line per connection, status lines only
 
 def connection_worker(worker_id, server, database, username, password, port, hold_time):
     """Worker thread that creates and holds a connection"""
     global active_connections, successful_connections, failed_connections, max_concurrent_reached
 
     conn = None
+    started = time.time()
     try:
         # Attempt connection
         conn = pymssql.connect(
@@ -48,7 +63,10 @@ def connection_worker(worker_id, server, database, username, password, port, hol
         session_id = row[0]
         cursor.close()
 
-        print(f"[Worker {worker_id:3d}] ✓ Connected (Session {session_id}) - Active: {current_active}")
+        if events:
+            events.record('connect', worker=worker_id, session=session_id, latency_ms=(time.time() - started) * 1000)
+        if not quiet:
+            print(f"[Worker {worker_id:3d}] ✓ Connected (Session {session_id}) - Active: {current_active}")
 
         # Hold the connection open
         time.sleep(hold_time)
@@ -59,12 +77,20 @@ def connection_worker(worker_id, server, database, username, password, port, hol
             error_msg = str(e)
             if error_msg not in [err[1] for err in connection_errors]:
                 connection_errors.append((worker_id, error_msg))
-        print(f"[Worker {worker_id:3d}] ✗ Connection failed: {e}")
+        if events:
+            events.record('connect', worker=worker_id, latency_ms=(time.time() - started) * 1000,
+                          ok=False, error=error_class(e))
+        if not quiet:
+            print(f"[Worker {worker_id:3d}] ✗ Connection failed: {e}")
 
     except Exception as e:
         with lock:
             failed_connections += 1
-        print(f"[Worker {worker_id:3d}] ✗ Unexpected error: {e}")
+        if events:
+            events.record('connect', worker=worker_id, latency_ms=(time.time() - started) * 1000,
+                          ok=False, error=error_class(e))
+        if not quiet:
+            print(f"[Worker {worker_id:3d}] ✗ Unexpected error: {e}")
 
     finally:
         if conn:
@@ -73,11 +99,12 @@ def connection_worker(worker_id, server, database, username, password, port, hol
                 with lock:
                     active_connections -= 1
                     current_active = active_connections
-                print(f"[Worker {worker_id:3d}] Connection closed - Active: {current_active}")
+                if not quiet:
+                    print(f"[Worker {worker_id:3d}] Connection closed - Active: {current_active}")
             except:
                 pass
 
-def test_max_connections(server, database, username, password, port=1433, max_connections=200):
+def test_max_connections(server, database, username, password, port=1433, max_connections=200, hold_time=30):
     """Test maximum concurrent connections"""
     print("=== SQL Server Maximum Connection Test ===")
     print(f"Target: {server}:{port}")
@@ -90,7 +117,6 @@ def test_max_connections(server, database, username, password, port=1433, max_co
     max_threads = max_connections  # Maximum number of connections to attempt
     batch_size = 10    # Create connections in batches
     batch_delay = 2    # Seconds between batches
-    hold_time = 30     # Seconds to hold each connection
 
     print(f"Configuration:")
     print(f"  Max connections: {max_threads}")
@@ -175,35 +201,313 @@ def test_max_connections(server, database, username, password, port=1433, max_co
 
     return 0
 
+class ArrivalSchedule:
+    """Target connect rate over time for the open-loop test"""
+    def __init__(self, spec, max_rate):
+        kind, *params = spec.split(':')
+        params = [float(p) for p in params]
+        if kind == 'constant' and len(params) == 1:
+            self.start, self.change, self.interval = params[0], 0.0, 0.0
+        elif kind in ('step', 'exp') and len(params) == 3:
+            self.start, self.change, self.interval = params
+        else:
+            raise ValueError(f"invalid arrival spec '{spec}' (see --help)")
+        if self.start <= 0:
+            raise ValueError("arrival rate must be positive")
+        if kind == 'exp' and self.change <= 0:
+            raise ValueError("exp growth factor must be positive")
+        if self.interval < 0:
+            raise ValueError("arrival step interval must not be negative")
+        self.kind = kind
+        self.max_rate = max_rate
+
+    def phase(self, elapsed):
+        """Index of the rate step that `elapsed` falls in (1s buckets for constant)"""
+        return int(elapsed // (self.interval or 1.0))
+
+    def rate(self, elapsed):
+        """Connects/s at `elapsed`; 0 or less once a falling step schedule runs out"""
+        steps = int(elapsed // self.interval) if self.interval else 0
+        if self.kind == 'step':
+            rate = self.start + self.change * steps
+        elif self.kind == 'exp':
+            rate = self.start * self.change ** steps
+        else:
+            rate = self.start
+        return min(rate, self.max_rate)
+
+class PhaseStats:
+    """Connect outcomes for one step of the arrival schedule"""
+    def __init__(self, index, target_rate):
+        self.label = f"step{index}"
+        self.target_rate = target_rate
+        self.attempts = 0
+        self.success = 0
+        self.failed = 0
+        self.cancelled = 0  # still queued for a worker when the test was stopped
+        self.connect_ms = []
+        self.lag_ms = []
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))]
+
+def open_loop_attempt(worker_id, scheduled_at, phase, server, database, username, password, port, closer):
+    """Connect, confirm the session and hand the connection to the closer thread"""
+    global active_connections, successful_connections, failed_connections, max_concurrent_reached
+
+    started = time.time()
+    lag_ms = (started - scheduled_at) * 1000  # executor queueing delay
+    conn = None
+    try:
+        conn = pymssql.connect(
+            server=f"{server}:{port}",
+            database=database,
+            user=username,
+            password=password,
+            timeout=10
+        )
+        cursor = conn.cursor()
+        cursor.execute("SELECT @@SPID as SessionID")
+        session_id = cursor.fetchone()[0]
+        cursor.close()
+        connect_ms = (time.time() - started) * 1000
+        if events:
+            events.record('connect', worker=worker_id, session=session_id, phase=phase.label,
+                          latency_ms=connect_ms, wait_ms=lag_ms)
+
+        with lock:
+            active_connections += 1
+            successful_connections += 1
+            max_concurrent_reached = max(max_concurrent_reached, active_connections)
+            phase.success += 1
+            phase.connect_ms.append(connect_ms)
+            phase.lag_ms.append(lag_ms)
+        closer.append((time.time(), conn))
+
+    except Exception as e:
+        if events:
+            events.record('connect', worker=worker_id, phase=phase.label, latency_ms=(time.time() - started) * 1000,
+                          wait_ms=lag_ms, ok=False, error=error_class(e))
+        if conn:
+            # Connected but the session check failed: don't leave the session open
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with lock:
+            failed_connections += 1
+            phase.failed += 1
+            phase.lag_ms.append(lag_ms)
+            error_msg = str(e)
+            if error_msg not in [err[1] for err in connection_errors]:
+                connection_errors.append((worker_id, error_msg))
+
+def close_after_hold(held, hold_time, stop_event):
+    """Single thread that closes held connections in FIFO order once hold_time has passed"""
+    global active_connections
+
+    while True:
+        if not held:
+            if stop_event.is_set():
+                return
+            time.sleep(0.05)
+            continue
+        opened_at, conn = held[0]
+        wait = opened_at + hold_time - time.time()
+        if wait > 0 and not stop_event.is_set():
+            time.sleep(min(wait, 0.5))
+            continue
+        held.popleft()
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with lock:
+            active_connections -= 1
+
+def test_open_loop(server, database, username, password, port, max_connections, arrival,
+                   max_rate=5000.0, workers=64, hold_time=30):
+    """Open-loop connection storm: connects are issued on schedule, not on completion"""
+    schedule = ArrivalSchedule(arrival, max_rate)
+
+    print("=== SQL Server Maximum Connection Test (open-loop arrivals) ===")
+    print(f"Target: {server}:{port}")
+    print(f"Database: {database}")
+    print(f"Username: {username}")
+    print(f"Start time: {datetime.datetime.now()}")
+    print()
+    print(f"Configuration:")
+    print(f"  Max connections: {max_connections}")
+    print(f"  Arrival schedule: {arrival} (capped at {max_rate:g}/s)")
+    print(f"  Connect workers: {workers}")
+    print(f"  Hold time: {hold_time}s")
+    print()
+
+    phases = {}
+    held = collections.deque()
+    stop_event = threading.Event()
+    closer = threading.Thread(target=close_after_hold, args=(held, hold_time, stop_event), daemon=True)
+    closer.start()
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    start_time = time.time()
+    next_arrival = start_time
+    last_status = start_time
+    attempts = 0
+    pending = collections.deque()  # (future, phase) not yet known to be done
+    stopped = False
+
+    try:
+        while attempts < max_connections:
+            now = time.time()
+            if next_arrival > now:
+                time.sleep(min(next_arrival - now, 0.05))
+                continue
+
+            elapsed = next_arrival - start_time
+            rate = schedule.rate(elapsed)
+            if rate <= 0:
+                print(f"\n⚠️  Arrival schedule reached zero connects/s at {elapsed:.1f}s. Stopping arrivals.")
+                break
+            index = schedule.phase(elapsed)
+            phase = phases.get(index)
+            if phase is None:
+                phase = phases[index] = PhaseStats(index, rate)
+            phase.attempts += 1
+            attempts += 1
+            pending.append((executor.submit(open_loop_attempt, attempts, next_arrival, phase,
+                                            server, database, username, password, port, held), phase))
+            while pending and pending[0][0].done():
+                pending.popleft()
+            next_arrival += 1.0 / rate
+
+            if now - last_status >= 1:
+                last_status = now
+                with lock:
+                    print(f"[{now - start_time:6.1f}s] target {rate:7.1f}/s - "
+                          f"Attempts={attempts} Active={active_connections} Success={successful_connections} "
+                          f"Failed={failed_connections} Max={max_concurrent_reached}")
+                    if failed_connections > 20 and failed_connections > successful_connections * 0.5:
+                        print(f"\n⚠️  High failure rate detected. Stopping test.")
+                        stopped = True
+                        break
+
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Test interrupted by user")
+        stopped = True
+
+    finally:
+        cancelled = 0
+        if stopped:
+            # Drop arrivals still queued behind the workers; a normal finish runs them all
+            for future, phase in pending:
+                if future.cancel():
+                    phase.cancelled += 1
+                    cancelled += 1
+        print(f"\n--- Waiting for in-flight connects, then holding connections for up to {hold_time}s ---")
+        executor.shutdown(wait=True)
+        try:
+            while held and time.time() < held[-1][0] + hold_time:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        stop_event.set()
+        closer.join(timeout=30)
+
+    elapsed_total = int(time.time() - start_time)
+
+    print()
+    print("=" * 92)
+    print("=== Test Complete ===")
+    print(f"End time: {datetime.datetime.now()}")
+    print(f"Total duration: {elapsed_total//60}m {elapsed_total%60}s")
+    print()
+    print("Connect latency by arrival-rate step (ms, measured from actual start; lag = executor queueing):")
+    print(f"  {'step':>4} {'target/s':>9} {'attempts':>8} {'ok':>6} {'fail':>6} {'cancel':>6} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'lag p99':>8}")
+    for index in sorted(phases):
+        phase = phases[index]
+        times = sorted(phase.connect_ms)
+        lags = sorted(phase.lag_ms)
+        print(f"  {index:>4} {phase.target_rate:>9.1f} {phase.attempts:>8} {phase.success:>6} {phase.failed:>6} "
+              f"{phase.cancelled:>6} {percentile(times, 50):>8.1f} {percentile(times, 95):>8.1f} {percentile(times, 99):>8.1f} "
+              f"{(times[-1] if times else 0):>8.1f} {percentile(lags, 99):>8.1f}")
+    print()
+    print("Results:")
+    print(f"  Total connection attempts: {successful_connections + failed_connections}")
+    print(f"  Successful connections: {successful_connections}")
+    print(f"  Failed connections: {failed_connections}")
+    if cancelled:
+        print(f"  Cancelled before starting: {cancelled} (queued arrivals dropped when the test stopped)")
+    print(f"  Maximum concurrent connections: {max_concurrent_reached}")
+
+    if connection_errors:
+        print()
+        print("Connection Errors (unique):")
+        for worker_id, error in connection_errors[:10]:
+            print(f"  [Attempt {worker_id}] {error}")
+        if len(connection_errors) > 10:
+            print(f"  ... and {len(connection_errors) - 10} more error types")
+
+    print("=" * 92)
+
+    return 0
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python3 test-mssql-maxconn.py <server> <database> <username> <password> [port] [max_connections] [options]",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Examples:
+  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123
+  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123 1433
+  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123 1433 500
+  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123 1433 5000 --arrival step:50:50:5
+  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123 1433 5000 --arrival exp:10:2:3 --workers 256
+
+Without --arrival this script will:
+  - Create up to N concurrent connections (default: 200)
+  - Create connections in batches of 10
+  - Hold each connection for --hold-time seconds (default: 30)
+  - Report the maximum concurrent connections achieved""")
+    parser.add_argument("server", help="Database server IP/hostname")
+    parser.add_argument("database", help="Database name")
+    parser.add_argument("username", help="Database username")
+    parser.add_argument("password", help="Database password")
+    parser.add_argument("port", nargs="?", type=int, default=1433, help="Database port (default: 1433)")
+    parser.add_argument("max_connections", nargs="?", type=int, default=200,
+                        help="Maximum connections to test (default: 200)")
+    parser.add_argument("--arrival", metavar="SPEC",
+                        help="open-loop schedule: constant:RATE, step:START:STEP:SECONDS or exp:START:FACTOR:SECONDS")
+    parser.add_argument("--max-rate", type=float, default=5000.0, help="cap on connects/sec (default: 5000)")
+    parser.add_argument("--workers", type=int, default=64, help="connect threads for --arrival (default: 64)")
+    parser.add_argument("--hold-time", type=float, default=30, help="seconds to hold each connection (default: 30)")
+    parser.add_argument("--events", metavar="PATH",
+                        help="record every connection attempt to PATH (.jsonl, or .bin for compact binary)")
+    parser.add_argument("--quiet", action="store_true", help="no line per connection; status lines only")
+
     if len(sys.argv) < 5:
-        print("Usage: python3 test-mssql-maxconn.py <server> <database> <username> <password> [port] [max_connections]")
-        print()
-        print("Arguments:")
-        print("  server          - Database server IP/hostname")
-        print("  database        - Database name")
-        print("  username        - Database username")
-        print("  password        - Database password")
-        print("  port            - Database port (default: 1433)")
-        print("  max_connections - Maximum connections to test (default: 200)")
-        print()
-        print("Examples:")
-        print("  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123")
-        print("  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123 1433")
-        print("  python3 test-mssql-maxconn.py 172.16.4.207 master sa MyPassword123 1433 500")
-        print()
-        print("This script will:")
-        print("  - Create up to N concurrent connections (default: 200)")
-        print("  - Create connections in batches of 10")
-        print("  - Hold each connection for 30 seconds")
-        print("  - Report the maximum concurrent connections achieved")
+        parser.print_help()
         sys.exit(1)
+    args = parser.parse_args()
+    quiet = args.quiet
+    if args.events:
+        events = EventRecorder(args.events)
 
-    server = sys.argv[1]
-    database = sys.argv[2]
-    username = sys.argv[3]
-    password = sys.argv[4]
-    port = int(sys.argv[5]) if len(sys.argv) > 5 else 1433
-    max_connections = int(sys.argv[6]) if len(sys.argv) > 6 else 200
-
-    sys.exit(test_max_connections(server, database, username, password, port, max_connections))
+    try:
+        if args.arrival:
+            try:
+                ArrivalSchedule(args.arrival, args.max_rate)
+            except ValueError as e:
+                parser.error(str(e))
+            result = test_open_loop(args.server, args.database, args.username, args.password, args.port,
+                                    args.max_connections, args.arrival, args.max_rate, args.workers, args.hold_time)
+        else:
+            result = test_max_connections(args.server, args.database, args.username, args.password, args.port,
+                                          args.max_connections, args.hold_time)
+    finally:
+        if events:
+            events.close()
+            print(f"Events: {events.count} written to {events.path}")
+    sys.exit(result)
@@ -2,117 +2,484 @@
 """
 Realistic SQL Server workload simulation through Tailscale
 Simulates real application behavior with connection pooling and random query intervals
-Usage: python3 test-mssql-realistic.py <server> <database> <username> <password> [port] [duration_minutes] [min_interval] [max_interval] [pool_size]
+Usage: python3 test-mssql-realistic.py <server> <database> <username> <password> [port] [duration_minutes] [min_interval] [max_interval] [pool_size] [--min-size N] [--max-lifetime S] [--validation return|never|idle|sweep] [--rate QPS] [--events PATH] [--quiet]
 """
 
 import sys
+import argparse
 import pymssql
 import threading
 import time
 import datetime
 import random
 import queue
+import collections
+import multiprocessing
+import multiprocessing.connection
+
+from latency_histogram import LatencyHistogram
+from mssql_events import EventRecorder, error_class, shard_path
+from workload_profiles import DEFAULT_PROFILE, Profile, QueryStats
+import reconnect
 
 # Global statistics
 lock = threading.Lock()
 total_queries = 0
 successful_queries = 0
 failed_queries = 0
-query_times = []
+worker_histograms = []  # one LatencyHistogram per worker, merged when reporting
+response_histograms = []  # open-loop mode: latency from the scheduled start time
+dropped_queries = 0
+verbose = True  # per-query lines; off with --quiet and in --processes children
+events = None  # --events: EventRecorder for every query, connect, validation and shed arrival
 connection_errors = []
 start_time = None
+profile = DEFAULT_PROFILE  # --profile: weighted statement mix
+query_stats = {}  # statement name -> QueryStats, updated under lock
+
+# When ConnectionPool checks that a pooled connection is still alive
+VALIDATION_POLICIES = {
+    'return': 'SELECT 1 on every return (one extra round-trip per query)',
+    'never':  'never; connections are only replaced after a failed query',
+    'idle':   'on borrow, if idle longer than --idle-threshold',
+    'sweep':  'background thread validates idle connections every --sweep-interval',
+}
+
+# ConnectionPool attributes carried in snapshots; summed across --processes shards
+POOL_COUNTERS = ('min_size', 'max_size', 'size', 'peak_size', 'total_created', 'expired', 'idle_closed',
+                 'validations', 'evictions', 'recreations', 'waits', 'timeouts')
+
+class Waiter:
+    """A thread queued in ConnectionPool.get_connection, served first-come first-served"""
+    __slots__ = ('event', 'conn')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None  # a handed-over connection, or None for "open your own"
+
+    def grant(self, conn=None):
+        self.conn = conn
+        self.event.set()
 
 class ConnectionPool:
-    """Simple connection pool for SQL Server"""
-    def __init__(self, server, database, username, password, port=1433, pool_size=10):
+    """Elastic connection pool for SQL Server
+
+    Keeps at least min_size connections open and grows on demand up to
+    max_size. Connections idle longer than idle_timeout are closed down to
+    min_size, and every connection is retired after max_lifetime seconds so
+    long runs don't sit on a stale NAT mapping. Borrowers that find the pool
+    at max_size queue FIFO and are handed connections in arrival order.
+
+    Dead connections are closed and their slot freed rather than reopened
+    inline; new connections are opened on demand, paced by the shared
+    ReconnectManager while the server is failing.
+    """
+    def __init__(self, server, database, username, password, port=1433, pool_size=10,
+                 validation='return', idle_threshold=30.0, sweep_interval=10.0,
+                 min_size=None, max_lifetime=0, idle_timeout=300.0, reconnect_manager=None):
         self.server = server
         self.database = database
         self.username = username
         self.password = password
         self.port = port
-        self.pool_size = pool_size
-        self.pool = queue.Queue(maxsize=pool_size)
+        self.max_size = pool_size
+        self.min_size = pool_size if min_size is None else min(min_size, pool_size)
+        self.validation = validation
+        self.idle_threshold = idle_threshold
+        self.sweep_interval = sweep_interval
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.idle = collections.deque()  # (connection, last used), most recent on the right
+        self.waiters = collections.deque()
+        self.expires = {}  # id(connection) -> retirement time
         self.lock = threading.Lock()
+        self.size = 0  # open connections, including ones being opened
+        self.peak_size = 0
         self.active_connections = 0
         self.total_created = 0
+        self.validations = 0
+        self.evictions = 0
+        self.recreations = 0
+        self.idle_closed = 0
+        self.expired = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.validation_latency = LatencyHistogram()
+        self.wait_latency = LatencyHistogram()
+        self.closed = threading.Event()
+        self.reconnect = reconnect_manager or reconnect.ReconnectManager()
 
-        print(f"Initializing connection pool (size={pool_size}) to {server}:{port}...")
-        for i in range(pool_size):
+        print(f"Initializing connection pool (min={self.min_size}, max={self.max_size}) to {server}:{port}...")
+        for i in range(self.min_size):
             try:
-                conn = self._create_connection()
-                self.pool.put(conn)
-                print(f"  ✓ Connection {i+1}/{pool_size} created")
+                # timeout=0: against a dead server, fail the rest fast instead of
+                # sitting out the backoff; the housekeeper refills later
+                self.idle.append((self._create_connection(timeout=0), time.time()))
+                self.size += 1
+                print(f"  ✓ Connection {i+1}/{self.min_size} created")
             except Exception as e:
-                print(f"  ✗ Failed to create connection {i+1}/{pool_size}: {e}")
+                print(f"  ✗ Failed to create connection {i+1}/{self.min_size}: {e}")
+        self.peak_size = self.size
+
+        print(f"✓ Connection pool ready with {self.size} connections\n")
 
-        print(f"✓ Connection pool ready with {self.pool.qsize()} connections\n")
+        threading.Thread(target=self._housekeeper, name='pool-housekeeper', daemon=True).start()
 
-    def _create_connection(self):
-        """Create a new database connection"""
+    def _create_connection(self, timeout=None):
+        """Create a new database connection, once the reconnect manager allows it"""
+        if not self.reconnect.acquire(timeout):
+            raise reconnect.CircuitOpen(f"reconnect to {self.server}:{self.port} deferred "
+                                        f"(breaker {self.reconnect.state})")
         with self.lock:
             self.total_created += 1
 
-        return pymssql.connect(
-            server=f"{self.server}:{self.port}",
-            database=self.database,
-            user=self.username,
-            password=self.password,
-            timeout=10
-        )
+        start = time.time()
+        try:
+            conn = pymssql.connect(
+                server=f"{self.server}:{self.port}",
+                database=self.database,
+                user=self.username,
+                password=self.password,
+                timeout=10
+            )
+        except Exception as e:
+            self.reconnect.record_failure(error_class(e))
+            if events:
+                events.record('connect', latency_ms=(time.time() - start) * 1000, ok=False, error=error_class(e))
+            raise
+        self.reconnect.record_success()
+        if events:
+            events.record('connect', latency_ms=(time.time() - start) * 1000)
+        if self.max_lifetime:
+            # Up to 10% early so connections opened together don't all rotate at once
+            self.expires[id(conn)] = time.time() + self.max_lifetime * random.uniform(0.9, 1.0)
+        return conn
 
-    def get_connection(self, timeout=5):
-        """Get a connection from the pool"""
+    def _close(self, conn):
+        self.expires.pop(id(conn), None)
         try:
-            conn = self.pool.get(timeout=timeout)
-            with self.lock:
-                self.active_connections += 1
-            return conn
-        except queue.Empty:
-            raise Exception("Connection pool exhausted - no available connections")
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, conn, now):
+        return now >= self.expires.get(id(conn), float('inf'))
 
-    def return_connection(self, conn):
-        """Return a connection to the pool"""
+    def _validate(self, conn):
+        """SELECT 1 round-trip; True if the connection is usable"""
+        start = time.time()
         try:
-            # Test if connection is still alive
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
+            cursor.fetchone()
             cursor.close()
+            alive = True
+        except Exception:
+            alive = False
+        elapsed_ms = (time.time() - start) * 1000
+        with self.lock:
+            self.validations += 1
+            self.validation_latency.record(elapsed_ms)
+        if events:
+            events.record('validate', phase=self.validation, latency_ms=elapsed_ms, ok=alive)
+        return alive
 
-            self.pool.put(conn)
-            with self.lock:
-                self.active_connections -= 1
-        except:
-            # Connection is dead, create a new one
-            try:
-                new_conn = self._create_connection()
-                self.pool.put(new_conn)
+    def _replace(self, conn, expired=False, timeout=None):
+        """Close conn and open a new one in the same slot; frees the slot if that fails"""
+        with self.lock:
+            if expired:
+                self.expired += 1
+            else:
+                self.evictions += 1
+        self._close(conn)
+        try:
+            new_conn = self._create_connection(timeout)
+        except Exception:
+            self._release_slot()
+            raise
+        with self.lock:
+            self.recreations += 1
+        return new_conn
+
+    def _grant_slots(self):
+        """Let queued borrowers open their own connections while there is room (lock held)"""
+        while self.waiters and self.size < self.max_size:
+            self.size += 1
+            self.peak_size = max(self.peak_size, self.size)
+            self.waiters.popleft().grant()
+
+    def _release_slot(self, count=1):
+        with self.lock:
+            self.size -= count
+            self._grant_slots()
+
+    def _put_idle(self, conn):
+        """Hand conn to the longest-waiting borrower, or park it"""
+        with self.lock:
+            if self.waiters:
+                self.waiters.popleft().grant(conn)
+            else:
+                self.idle.append((conn, time.time()))
+
+    def get_connection(self, timeout=5):
+        """Get a connection from the pool"""
+        start = time.time()
+        waiter = None
+        with self.lock:
+            # Queued borrowers are never overtaken (connections go straight to
+            # them on return, so the idle list is empty whenever anyone waits)
+            if self.idle and not self.waiters:
+                conn, last_used = self.idle.pop()
+            elif self.size < self.max_size and not self.waiters:
+                self.size += 1
+                self.peak_size = max(self.peak_size, self.size)
+                conn = None
+            else:
+                waiter = Waiter()
+                self.waiters.append(waiter)
+                self.waits += 1
+
+        if waiter is not None:
+            if not waiter.event.wait(timeout):
                 with self.lock:
-                    self.active_connections -= 1
-            except Exception as e:
-                print(f"⚠️  Failed to recreate dead connection: {e}")
+                    if not waiter.event.is_set():
+                        self.waiters.remove(waiter)
+                        self.timeouts += 1
+                        raise Exception("Connection pool exhausted - no available connections")
+            conn, last_used = waiter.conn, time.time()
+
+        if conn is None:
+            try:
+                conn = self._create_connection(max(0.0, start + timeout - time.time()))
+            except Exception:
+                self._release_slot()
+                raise
+        else:
+            now = time.time()
+            remaining = max(0.0, start + timeout - now)
+            if self._is_expired(conn, now):
+                conn = self._replace(conn, expired=True, timeout=remaining)
+            elif self.validation == 'idle' and now - last_used > self.idle_threshold:
+                if not self._validate(conn):
+                    conn = self._replace(conn, timeout=remaining)
+
+        with self.lock:
+            self.active_connections += 1
+            self.wait_latency.record((time.time() - start) * 1000)
+        return conn
+
+    def return_connection(self, conn, healthy=True):
+        """Return a connection to the pool; healthy=False after a failed query"""
+        with self.lock:
+            self.active_connections -= 1
+        if healthy and self.validation == 'return':
+            healthy = self._validate(conn)
+        if not healthy:
+            # Not reopened here: the next borrower that needs it opens one,
+            # paced by the reconnect manager, instead of every returning
+            # worker reconnecting at once
+            with self.lock:
+                self.evictions += 1
+            self._close(conn)
+            self._release_slot()
+            return
+        try:
+            if self._is_expired(conn, time.time()):
+                conn = self._replace(conn, expired=True, timeout=0)
+        except reconnect.CircuitOpen:
+            return  # slot freed; reopened on demand once the backoff allows
+        except Exception as e:
+            print(f"⚠️  Failed to recreate expired connection: {e}")
+            return
+        self._put_idle(conn)
+
+    def _housekeeper(self):
+        """Every sweep_interval: retire expired and long-idle connections, run the
+        sweep validation policy, and top the pool back up to min_size"""
+        while not self.closed.wait(self.sweep_interval):
+            now = time.time()
+            to_close, to_check, keep = [], [], collections.deque()
+            with self.lock:
+                for conn, last_used in self.idle:  # least recently used first
+                    if self._is_expired(conn, now):
+                        self.expired += 1
+                        to_close.append(conn)
+                    elif (now - last_used > self.idle_timeout
+                          and self.size - len(to_close) > self.min_size):
+                        self.idle_closed += 1
+                        to_close.append(conn)
+                    elif self.validation == 'sweep' and now - last_used > self.idle_threshold:
+                        to_check.append(conn)  # out of the idle list while it is probed
+                    else:
+                        keep.append((conn, last_used))
+                self.idle = keep
+                self.size -= len(to_close)
+                missing = max(0, self.min_size - self.size)
+                self.size += missing
+                self._grant_slots()
+
+            for conn in to_close:
+                self._close(conn)
+            for conn in to_check:
+                if self._validate(conn):
+                    self._put_idle(conn)
+                else:
+                    with self.lock:
+                        self.evictions += 1
+                    self._close(conn)
+                    self._release_slot()
+            for filled in range(missing):
+                try:
+                    # Never queue behind the reconnect backoff: try again next sweep
+                    self._put_idle(self._create_connection(timeout=0))
+                except reconnect.CircuitOpen:
+                    self._release_slot(missing - filled)
+                    break
+                except Exception as e:
+                    # Hand back every slot reserved for this refill, not just this one
+                    self._release_slot(missing - filled)
+                    print(f"⚠️  Failed to refill pool to min size: {e}")
+                    break
+
+    def snapshot(self):
+        """Counters and copies of the histograms, safe to pickle or merge"""
+        with self.lock:
+            stats = {name: getattr(self, name) for name in POOL_COUNTERS}
+            stats['idle'] = len(self.idle)
+            stats['waiting'] = len(self.waiters)
+            stats['wait_latency'] = self.wait_latency.copy()
+            stats['validation_latency'] = self.validation_latency.copy()
+        stats['validation'] = self.validation
+        stats['reconnect'] = self.reconnect.snapshot()
+        return stats
 
     def close_all(self):
         """Close all connections in the pool"""
-        closed = 0
-        while not self.pool.empty():
-            try:
-                conn = self.pool.get_nowait()
-                conn.close()
-                closed += 1
-            except:
-                pass
-        return closed
+        self.closed.set()
+        with self.lock:
+            idle, self.idle = self.idle, collections.deque()
+            self.size -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+        return len(idle)
+
+def run_query(worker_id, query_number, pool, histogram, intended_start=None, response_histogram=None):
+    """Borrow a connection, run the workload query and record the outcome; True on success
+
+    In open-loop mode intended_start is when the scheduler meant the query to
+    begin. response_histogram gets latency measured from then, so time spent
+    queued behind a stalled tunnel shows up instead of being omitted.
+    """
+    global total_queries, successful_queries, failed_queries, connection_errors
+
+    # Get connection from pool
+    conn = None
+    healthy = True
+    query = profile.pick()
+    borrow_start = time.time()
+    query_start = None
+    try:
+        conn = pool.get_connection(timeout=5)
+        query_start = time.time()
+
+        # Execute the statement, streaming its result set
+        rows, size, session = query.execute(conn)
+
+        query_end = time.time()
+        query_duration = (query_end - query_start) * 1000  # milliseconds
+
+        histogram.record(query_duration)
+        pool.reconnect.record_success()
+        late = ''
+        if intended_start is not None:
+            response_time = (query_end - intended_start) * 1000
+            response_histogram.record(response_time)
+            late = f" ({response_time:6.1f}ms from schedule)"
+        with lock:
+            total_queries += 1
+            successful_queries += 1
+            stats = statement_stats(query.name)
+            stats.count += 1
+            stats.rows += rows
+            stats.bytes += size
+            stats.latency.record(query_duration)
+        if events:
+            events.record('query', worker=worker_id, session=session, phase=query.name, latency_ms=query_duration,
+                          wait_ms=(query_start - (borrow_start if intended_start is None else intended_start)) * 1000)
+
+        if verbose:
+            elapsed = int(time.time() - start_time)
+            detail = f"Session {session}" if profile is DEFAULT_PROFILE else f"{query.name} {rows} rows"
+            print(f"[Worker {worker_id:2d}] Query #{query_number:3d} ✓ {query_duration:6.1f}ms{late} - {detail} - Elapsed: {elapsed//60}m{elapsed%60:02d}s")
+        return True
+
+    except pymssql.Error as e:
+        failure = error_class(e)
+        if isinstance(e, (pymssql.OperationalError, pymssql.InterfaceError)):
+            # The link is suspect; a bad statement or constraint violation leaves it usable
+            healthy = False
+            # A failed connect inside get_connection() was already reported by the pool
+            if query_start is not None:
+                pool.reconnect.record_failure(failure)
+        with lock:
+            total_queries += 1
+            failed_queries += 1
+            error_msg = str(e)
+            if error_msg not in [err for err in connection_errors]:
+                connection_errors.append(error_msg)
+        if verbose:
+            print(f"[Worker {worker_id:2d}] Query #{query_number:3d} ✗ DB ERROR: {e}")
+
+    except Exception as e:
+        failure = 'PoolExhausted' if query_start is None and not isinstance(e, reconnect.CircuitOpen) else error_class(e)
+        with lock:
+            total_queries += 1
+            failed_queries += 1
+        if verbose:
+            print(f"[Worker {worker_id:2d}] Query #{query_number:3d} ✗ ERROR: {e}")
+
+    finally:
+        if conn:
+            pool.return_connection(conn, healthy)
+
+    if intended_start is not None:
+        # A failure still took this long to come back to the caller
+        response_histogram.record((time.time() - intended_start) * 1000)
+    with lock:
+        stats = statement_stats(query.name)
+        stats.count += 1
+        stats.failed += 1
+    if events:
+        now = time.time()
+        events.record('query', worker=worker_id, phase=query.name, ok=False, error=failure,
+                      latency_ms=(now - query_start) * 1000 if query_start else None,
+                      wait_ms=((query_start or now) - (borrow_start if intended_start is None else intended_start)) * 1000)
+    return False
+
+def statement_stats(name):
+    """QueryStats for one profile statement; call with lock held"""
+    stats = query_stats.get(name)
+    if stats is None:
+        stats = query_stats[name] = QueryStats()
+    return stats
+
+def register_histogram(histograms):
+    # Only the calling worker records into it, so no lock on the hot path
+    histogram = LatencyHistogram()
+    with lock:
+        histograms.append(histogram)
+    return histogram
 
 def query_worker(worker_id, pool, duration_seconds, min_interval, max_interval, stop_event):
     """Worker thread that executes queries at random intervals"""
-    global total_queries, successful_queries, failed_queries, query_times, connection_errors
-
     worker_start = time.time()
     worker_queries = 0
     worker_success = 0
     worker_failed = 0
+    histogram = register_histogram(worker_histograms)
 
-    print(f"[Worker {worker_id:2d}] Started")
+    if verbose:
+        print(f"[Worker {worker_id:2d}] Started")
 
     while not stop_event.is_set() and (time.time() - worker_start) < duration_seconds:
         # Random interval between queries
@@ -122,267 +489,614 @@ def query_worker(worker_id, pool, duration_seconds, min_interval, max_interval,
         if stop_event.is_set():
             break
 
-        # Get connection from pool
-        conn = None
-        try:
-            conn = pool.get_connection(timeout=5)
-            query_start = time.time()
+        worker_queries += 1
+        if run_query(worker_id, worker_queries, pool, histogram):
+            worker_success += 1
+        else:
+            worker_failed += 1
 
-            # Execute realistic query
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT
-                    GETDATE() as QueryTime,
-                    @@SPID as SessionID,
-                    @@VERSION as ServerVersion
-            """)
-            row = cursor.fetchone()
-            cursor.close()
+    if verbose:
+        print(f"[Worker {worker_id:2d}] Finished - Queries: {worker_queries}, Success: {worker_success}, Failed: {worker_failed}")
 
-            query_duration = (time.time() - query_start) * 1000  # milliseconds
+def open_loop_worker(worker_id, pool, tasks, in_flight):
+    """Worker thread that runs queries handed out by schedule_arrivals"""
+    worker_queries = 0
+    worker_success = 0
+    histogram = register_histogram(worker_histograms)
+    response_histogram = register_histogram(response_histograms)
 
-            with lock:
-                total_queries += 1
-                successful_queries += 1
-                query_times.append(query_duration)
-                worker_queries += 1
+    while True:
+        intended_start = tasks.get()
+        if intended_start is None:
+            break
+        worker_queries += 1
+        try:
+            if run_query(worker_id, worker_queries, pool, histogram, intended_start, response_histogram):
                 worker_success += 1
+        finally:
+            in_flight.release()
 
-            elapsed = int(time.time() - start_time)
-            print(f"[Worker {worker_id:2d}] Query #{worker_queries:3d} ✓ {query_duration:6.1f}ms - Session {row[1]} - Elapsed: {elapsed//60}m{elapsed%60:02d}s")
+    if verbose:
+        print(f"[Worker {worker_id:2d}] Finished - Queries: {worker_queries}, Success: {worker_success}, Failed: {worker_queries - worker_success}")
 
-        except queue.Empty:
-            with lock:
-                total_queries += 1
-                failed_queries += 1
-                worker_queries += 1
-                worker_failed += 1
-            print(f"[Worker {worker_id:2d}] Query #{worker_queries:3d} ✗ POOL EXHAUSTED")
+def schedule_arrivals(tasks, in_flight, rate, arrivals, duration_seconds, stop_event):
+    """Issue queries at target timestamps whatever the workers are doing.
 
-        except pymssql.Error as e:
-            with lock:
-                total_queries += 1
-                failed_queries += 1
-                worker_queries += 1
-                worker_failed += 1
-                error_msg = str(e)
-                if error_msg not in [err for err in connection_errors]:
-                    connection_errors.append(error_msg)
-            print(f"[Worker {worker_id:2d}] Query #{worker_queries:3d} ✗ DB ERROR: {e}")
+    Arrivals that find max_in_flight queries already queued or running are
+    shed and counted rather than delayed, so a stall can't slow the schedule.
+    """
+    global dropped_queries
 
-        except Exception as e:
+    end_time = start_time + duration_seconds
+    next_arrival = time.time()
+    while not stop_event.is_set():
+        now = time.time()
+        if next_arrival > now:
+            time.sleep(min(next_arrival - now, 0.5))
+            continue
+        if next_arrival >= end_time:
+            break
+        # Catch up on every arrival that fell due while we slept
+        if in_flight.acquire(blocking=False):
+            tasks.put(next_arrival)
+        else:
             with lock:
-                total_queries += 1
-                failed_queries += 1
-                worker_queries += 1
-                worker_failed += 1
-            print(f"[Worker {worker_id:2d}] Query #{worker_queries:3d} ✗ ERROR: {e}")
+                dropped_queries += 1
+            if events:
+                events.record('shed', wait_ms=(time.time() - next_arrival) * 1000, ok=False, error='MaxInFlight')
+        next_arrival += random.expovariate(rate) if arrivals == 'poisson' else 1.0 / rate
 
-        finally:
-            if conn:
-                pool.return_connection(conn)
+def collect_snapshot(pool):
+    """This process's counters and merged histograms; small enough to pickle once
+    a second and mergeable across --processes shards"""
+    # Merged outside the lock: workers never wait on a report
+    latency = LatencyHistogram.merged(worker_histograms)
+    response = LatencyHistogram.merged(response_histograms)
+    with lock:
+        snapshot = {
+            'total': total_queries,
+            'successful': successful_queries,
+            'failed': failed_queries,
+            'dropped': dropped_queries,
+            'open_loop': bool(response_histograms),
+            'errors': list(connection_errors),
+            'queries': {name: stats.copy() for name, stats in query_stats.items()},
+        }
+    snapshot['latency'] = latency
+    snapshot['response'] = response
+    snapshot['pool'] = pool.snapshot() if pool else None
+    snapshot['events'] = events.count if events else 0
+    return snapshot
 
-    print(f"[Worker {worker_id:2d}] Finished - Queries: {worker_queries}, Success: {worker_success}, Failed: {worker_failed}")
+def merge_snapshots(snapshots):
+    total = {'total': 0, 'successful': 0, 'failed': 0, 'dropped': 0, 'open_loop': False, 'errors': [],
+             'latency': LatencyHistogram(), 'response': LatencyHistogram(), 'pool': None, 'events': 0,
+             'queries': {}}
+    for snapshot in snapshots:
+        for key in ('total', 'successful', 'failed', 'dropped', 'events'):
+            total[key] += snapshot[key]
+        total['open_loop'] |= snapshot['open_loop']
+        total['errors'] += [e for e in snapshot['errors'] if e not in total['errors']]
+        total['latency'].merge(snapshot['latency'])
+        total['response'].merge(snapshot['response'])
+        for name, stats in snapshot['queries'].items():
+            if name in total['queries']:
+                total['queries'][name].merge(stats)
+            else:
+                total['queries'][name] = stats.copy()
+        stats = snapshot['pool']
+        if stats is None:
+            continue
+        if total['pool'] is None:
+            total['pool'] = {'validation': stats['validation'], 'idle': 0, 'waiting': 0,
+                             'wait_latency': LatencyHistogram(), 'validation_latency': LatencyHistogram()}
+            total['pool'].update((name, 0) for name in POOL_COUNTERS)
+        merged = total['pool']
+        for name in POOL_COUNTERS + ('idle', 'waiting'):
+            merged[name] += stats[name]
+        merged['wait_latency'].merge(stats['wait_latency'])
+        merged['validation_latency'].merge(stats['validation_latency'])
+        merged['reconnect'] = reconnect.merge_snapshots(
+            [merged['reconnect'], stats['reconnect']] if 'reconnect' in merged else [stats['reconnect']])
+    return total
 
-def print_statistics(duration_minutes):
-    """Print periodic statistics"""
-    global total_queries, successful_queries, failed_queries, query_times
+def pool_stats_line(stats):
+    line = (f"size={stats['size']} idle={stats['idle']} peak={stats['peak_size']} waiting={stats['waiting']} "
+            f"created={stats['total_created']} expired={stats['expired']} idle_closed={stats['idle_closed']} "
+            f"validations={stats['validations']} evictions={stats['evictions']} recreations={stats['recreations']}")
+    if stats['wait_latency'].count:
+        line += (f" wait p50={stats['wait_latency'].percentile(50):.1f}ms "
+                 f"p99={stats['wait_latency'].percentile(99):.1f}ms timeouts={stats['timeouts']}")
+    manager = stats['reconnect']
+    if manager['outages'] or manager['state'] != reconnect.CLOSED:
+        line += f" breaker={manager['state']} outages={len(manager['outages'])} trips={manager['trips']}"
+    return line
 
+def print_statistics(duration_minutes, snapshot):
+    """Print periodic statistics"""
     elapsed = int(time.time() - start_time)
+    latency = snapshot['latency']
+    response = snapshot['response']
 
     print()
     print("=" * 70)
     print(f"Statistics at {elapsed//60}m{elapsed%60:02d}s / {duration_minutes}m")
     print("=" * 70)
 
-    with lock:
-        print(f"Total Queries:      {total_queries}")
-        print(f"  Successful:       {successful_queries}")
-        print(f"  Failed:           {failed_queries}")
-
-        if total_queries > 0:
-            success_rate = (successful_queries * 100) / total_queries
-            print(f"  Success Rate:     {success_rate:.1f}%")
-
-            if query_times:
-                avg_time = sum(query_times) / len(query_times)
-                min_time = min(query_times)
-                max_time = max(query_times)
-                sorted_times = sorted(query_times)
-                p50 = sorted_times[len(sorted_times)//2]
-                p95 = sorted_times[int(len(sorted_times)*0.95)]
-                p99 = sorted_times[int(len(sorted_times)*0.99)]
-
-                print()
-                print("Query Latency (ms):")
-                print(f"  Average:          {avg_time:.1f}ms")
-                print(f"  Min:              {min_time:.1f}ms")
-                print(f"  Max:              {max_time:.1f}ms")
-                print(f"  P50 (median):     {p50:.1f}ms")
-                print(f"  P95:              {p95:.1f}ms")
-                print(f"  P99:              {p99:.1f}ms")
-
-        if connection_errors:
+    print(f"Total Queries:      {snapshot['total']}")
+    print(f"  Successful:       {snapshot['successful']}")
+    print(f"  Failed:           {snapshot['failed']}")
+    if snapshot['open_loop']:
+        print(f"  Dropped (shed):   {snapshot['dropped']}")
+
+    if snapshot['total'] > 0:
+        success_rate = (snapshot['successful'] * 100) / snapshot['total']
+        print(f"  Success Rate:     {success_rate:.1f}%")
+
+        if response.count:
+            print()
+            print("Response Time from schedule (ms):")
+            print(f"  P50 (median):     {response.percentile(50):.1f}ms")
+            print(f"  P99:              {response.percentile(99):.1f}ms")
+            print(f"  Max:              {response.max:.1f}ms")
+
+        if latency.count:
             print()
-            print("Connection Errors:")
-            for error in connection_errors[:5]:
-                print(f"  - {error}")
-            if len(connection_errors) > 5:
-                print(f"  ... and {len(connection_errors) - 5} more")
+            print("Query Latency (ms):")
+            print(f"  Average:          {latency.mean:.1f}ms")
+            print(f"  Min:              {latency.min:.1f}ms")
+            print(f"  Max:              {latency.max:.1f}ms")
+            print(f"  P50 (median):     {latency.percentile(50):.1f}ms")
+            print(f"  P95:              {latency.percentile(95):.1f}ms")
+            print(f"  P99:              {latency.percentile(99):.1f}ms")
 
+        rows = sum(stats.rows for stats in snapshot['queries'].values())
+        size = sum(stats.bytes for stats in snapshot['queries'].values())
+        print()
+        print(f"Result Sets:        {rows} rows ({rows / max(elapsed, 1):.0f} rows/s), "
+              f"{size / 1e6:.1f} MB ({size / 1e6 / max(elapsed, 1):.2f} MB/s)")
+
+    errors = snapshot['errors']
+    if errors:
+        print()
+        print("Connection Errors:")
+        for error in errors[:5]:
+            print(f"  - {error}")
+        if len(errors) > 5:
+            print(f"  ... and {len(errors) - 5} more")
+
+    if snapshot['pool']:
+        print()
+        print(f"Pool ({snapshot['pool']['validation']}): {pool_stats_line(snapshot['pool'])}")
     print("=" * 70)
     print()
 
-def test_realistic_workload(server, database, username, password, port=1433,
-                           duration_minutes=10, min_interval=1.0, max_interval=5.0, pool_size=10):
-    """Test realistic workload with connection pooling"""
-    global start_time
+def print_final_results(snapshot, elapsed_total, processes=1):
+    latency = snapshot['latency']
+    response = snapshot['response']
 
     print()
     print("=" * 70)
-    print("=== Realistic SQL Server Workload Simulation ===")
-    print("=" * 70)
-    print(f"Target:             {server}:{port}")
-    print(f"Database:           {database}")
-    print(f"Username:           {username}")
-    print(f"Duration:           {duration_minutes} minutes")
-    print(f"Query interval:     {min_interval}s - {max_interval}s (random)")
-    print(f"Connection pool:    {pool_size} connections")
-    print(f"Worker threads:     {pool_size} workers")
-    print(f"Start time:         {datetime.datetime.now()}")
+    print("=== FINAL RESULTS ===")
     print("=" * 70)
+    print(f"End time:           {datetime.datetime.now()}")
+    print(f"Total duration:     {elapsed_total//60}m {elapsed_total%60}s")
+    if processes > 1:
+        print(f"Processes:          {processes} (results merged)")
     print()
 
-    start_time = time.time()
-    duration_seconds = duration_minutes * 60
+    print(f"Total Queries:      {snapshot['total']}")
+    print(f"  Successful:       {snapshot['successful']}")
+    print(f"  Failed:           {snapshot['failed']}")
+    if snapshot['open_loop']:
+        print(f"  Dropped (shed):   {snapshot['dropped']}")
+
+    if snapshot['total'] > 0:
+        success_rate = (snapshot['successful'] * 100) / snapshot['total']
+        qps = snapshot['total'] / max(elapsed_total, 1)
+        print(f"  Success Rate:     {success_rate:.1f}%")
+        print(f"  Queries/second:   {qps:.2f}")
+
+        if response.count:
+            print()
+            print("Response Time (from scheduled start, includes queueing - no coordinated omission):")
+            print(f"  Average:          {response.mean:.1f}ms")
+            print(f"  P50 (median):     {response.percentile(50):.1f}ms")
+            print(f"  P95:              {response.percentile(95):.1f}ms")
+            print(f"  P99:              {response.percentile(99):.1f}ms")
+            print(f"  P99.9:            {response.percentile(99.9):.1f}ms")
+            print(f"  Max:              {response.max:.1f}ms")
+
+        if latency.count:
+            print()
+            print("Query Latency (service time, from when the query was sent):" if response.count
+                  else "Query Latency:")
+            print(f"  Average:          {latency.mean:.1f}ms")
+            print(f"  P50 (median):     {latency.percentile(50):.1f}ms")
+            print(f"  P95:              {latency.percentile(95):.1f}ms")
+            print(f"  P99:              {latency.percentile(99):.1f}ms")
+            print(f"  P99.9:            {latency.percentile(99.9):.1f}ms")
+            print(f"  Max:              {latency.max:.1f}ms")
+
+        queries = snapshot['queries']
+        rows = sum(stats.rows for stats in queries.values())
+        size = sum(stats.bytes for stats in queries.values())
+        print()
+        print("Result Sets (payload estimated from fetched values):")
+        print(f"  Rows:             {rows} ({rows / max(elapsed_total, 1):.0f} rows/s)")
+        print(f"  Bytes:            {size / 1e6:.1f} MB ({size / 1e6 / max(elapsed_total, 1):.2f} MB/s)")
+        if set(queries) != {DEFAULT_PROFILE.queries[0].name}:
+            print()
+            print(f"  {'statement':<14} {'count':>8} {'failed':>6} {'p50 ms':>8} {'p99 ms':>8} {'rows/s':>9} {'MB/s':>7}")
+            for name, stats in sorted(queries.items()):
+                print(f"  {name:<14} {stats.count:>8} {stats.failed:>6} {stats.latency.percentile(50):>8.1f} "
+                      f"{stats.latency.percentile(99):>8.1f} {stats.rows / max(elapsed_total, 1):>9.0f} "
+                      f"{stats.bytes / 1e6 / max(elapsed_total, 1):>7.2f}")
+
+    pool = snapshot['pool']
+    if pool:
+        if pool['wait_latency'].count:
+            print()
+            print("Pool Wait (time to borrow a connection, incl. opening new ones):")
+            print(f"  P50 (median):     {pool['wait_latency'].percentile(50):.1f}ms")
+            print(f"  P95:              {pool['wait_latency'].percentile(95):.1f}ms")
+            print(f"  P99:              {pool['wait_latency'].percentile(99):.1f}ms")
+            print(f"  Max:              {pool['wait_latency'].max:.1f}ms")
+            print(f"  Queued borrows:   {pool['waits']} ({pool['timeouts']} timed out)")
+        print()
+        print(f"Pool Size{' (summed over processes)' if processes > 1 else ''}:")
+        print(f"  Min/Max:          {pool['min_size']}/{pool['max_size']}")
+        print(f"  Peak:             {pool['peak_size']}")
+        print(f"  Created:          {pool['total_created']}")
+        print(f"  Expired:          {pool['expired']}")
+        print(f"  Idle closed:      {pool['idle_closed']}")
+        print()
+        print(f"Pool Validation ({pool['validation']}):")
+        print(f"  Validations:      {pool['validations']}")
+        print(f"  Evictions:        {pool['evictions']}")
+        print(f"  Recreations:      {pool['recreations']}")
+        if pool['validations']:
+            overhead = pool['validation_latency']
+            print(f"  Validation time:  avg {overhead.mean:.1f}ms, p99 {overhead.percentile(99):.1f}ms, "
+                  f"total {overhead.total / 1000:.1f}s")
+        print()
+        reconnect.print_outage_report(pool['reconnect'])
+
+    print("=" * 70)
+
+def run_workload(settings, tick):
+    """Create the pool and workers, call tick(pool) every second for the test
+    duration, then stop the workers and close the pool; returns the pool"""
+    global profile
+
+    duration_seconds = settings['duration_minutes'] * 60
+    profile = settings['profile']
+    workers = settings['workers']
+    rate = settings['rate']
+    pool = None
+    threads = []
+    stop_event = threading.Event()
 
     try:
         # Create connection pool
-        pool = ConnectionPool(server, database, username, password, port, pool_size)
+        pool = ConnectionPool(settings['server'], settings['database'], settings['username'],
+                              settings['password'], settings['port'], settings['pool_size'],
+                              settings['validation'], settings['idle_threshold'], settings['sweep_interval'],
+                              settings['min_size'], settings['max_lifetime'], settings['idle_timeout'],
+                              reconnect.ReconnectManager(*settings['reconnect']))
 
         # Create worker threads
-        threads = []
-        stop_event = threading.Event()
-
-        print(f"Starting {pool_size} worker threads...\n")
-        for i in range(pool_size):
-            thread = threading.Thread(
-                target=query_worker,
-                args=(i + 1, pool, duration_seconds, min_interval, max_interval, stop_event),
-                daemon=False
+        if verbose:
+            print(f"Starting {workers} worker threads...\n")
+        if rate:
+            tasks = queue.Queue()
+            in_flight = threading.BoundedSemaphore(settings['max_in_flight'])
+            for i in range(workers):
+                thread = threading.Thread(target=open_loop_worker, args=(i + 1, pool, tasks, in_flight))
+                thread.start()
+                threads.append(thread)
+            scheduler = threading.Thread(
+                target=schedule_arrivals,
+                args=(tasks, in_flight, rate, settings['arrivals'], duration_seconds, stop_event),
+                daemon=True
             )
-            thread.start()
-            threads.append(thread)
-            time.sleep(0.1)  # Stagger thread starts
-
-        print(f"\n✓ All workers started\n")
+            scheduler.start()
+        else:
+            for i in range(workers):
+                thread = threading.Thread(
+                    target=query_worker,
+                    args=(i + 1, pool, duration_seconds, settings['min_interval'], settings['max_interval'],
+                          stop_event),
+                    daemon=False
+                )
+                thread.start()
+                threads.append(thread)
+                time.sleep(0.1)  # Stagger thread starts
 
-        # Monitor progress and print statistics periodically
-        stats_interval = 60  # Print stats every minute
-        next_stats_time = time.time() + stats_interval
+        if verbose:
+            print(f"\n✓ All workers started\n")
 
         while time.time() < start_time + duration_seconds:
             time.sleep(1)
-
-            if time.time() >= next_stats_time:
-                print_statistics(duration_minutes)
-                next_stats_time = time.time() + stats_interval
+            tick(pool)
 
         # Signal workers to stop
-        print("\n⏰ Test duration reached. Stopping workers...\n")
+        if verbose:
+            print("\n⏰ Test duration reached. Stopping workers...\n")
         stop_event.set()
+        if rate:
+            scheduler.join()
+            for _ in threads:
+                tasks.put(None)  # after whatever is still queued
 
         # Wait for all threads to complete
         for thread in threads:
             thread.join(timeout=10)
 
         # Close connection pool
-        print("\nClosing connection pool...")
         closed = pool.close_all()
-        print(f"✓ Closed {closed} connections")
+        if verbose:
+            print(f"\n✓ Closed {closed} pooled connections")
 
     except KeyboardInterrupt:
-        print("\n\n⚠️  Test interrupted by user")
+        if verbose:
+            print("\n\n⚠️  Test interrupted by user")
         stop_event.set()
+        if rate and threads:
+            for _ in threads:
+                tasks.put(None)
         if pool:
             pool.close_all()
 
-    # Final statistics
-    elapsed_total = int(time.time() - start_time)
+    return pool
+
+def shard_settings(settings, index, processes):
+    """Settings for one of `processes` shards: sizes and rate split evenly"""
+    def share(total):
+        return total // processes + (1 if index < total % processes else 0)
+
+    shard = dict(settings)
+    shard['pool_size'] = max(1, share(settings['pool_size']))
+    shard['min_size'] = min(share(settings['min_size']), shard['pool_size'])
+    shard['workers'] = max(1, share(settings['workers']))
+    shard['max_in_flight'] = max(1, share(settings['max_in_flight']))
+    if settings['rate']:
+        shard['rate'] = settings['rate'] / processes
+    if settings['events']:
+        shard['events'] = shard_path(settings['events'], index + 1)
+    return shard
+
+def run_shard(settings, pipe):
+    """Child process: run a share of the workload and stream cumulative
+    snapshots to the parent once a second (never one message per query)"""
+    global verbose, start_time
+
+    global events
+
+    verbose = False
+    start_time = time.time()
+    random.seed()  # forked children would otherwise replay one arrival sequence
+    events = EventRecorder(settings['events']) if settings['events'] else None
+    pool = run_workload(settings, lambda pool: pipe.send(collect_snapshot(pool)))
+    if events:
+        events.close()
+    pipe.send(collect_snapshot(pool))
+    pipe.close()
+
+def run_processes(settings, processes, duration_minutes):
+    """Fan the workload out over child processes and merge their snapshots live"""
+    latest = {}
+    pipes = {}
+    children = []
+    for index in range(processes):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        child = multiprocessing.Process(target=run_shard, args=(shard_settings(settings, index, processes), sender),
+                                        name=f'shard-{index + 1}')
+        child.start()
+        sender.close()
+        pipes[receiver] = index
+        children.append(child)
+    print(f"Started {processes} load processes\n")
+
+    progress_interval = 5
+    stats_interval = 60  # Print stats every minute
+    next_progress = time.time() + progress_interval
+    next_stats_time = time.time() + stats_interval
+    last_total = 0
+    while pipes:
+        try:
+            for receiver in multiprocessing.connection.wait(list(pipes), timeout=1):
+                try:
+                    latest[pipes[receiver]] = receiver.recv()
+                except EOFError:
+                    del pipes[receiver]
+        except KeyboardInterrupt:
+            # The children got the same SIGINT; keep collecting their final snapshots
+            print("\n\n⚠️  Test interrupted by user - waiting for load processes to report")
+            continue
+
+        now = time.time()
+        if now >= next_progress and latest:
+            snapshot = merge_snapshots(latest.values())
+            late = snapshot['response'] if snapshot['open_loop'] else snapshot['latency']
+            elapsed = int(now - start_time)
+            print(f"[{elapsed//60}m{elapsed%60:02d}s] {(snapshot['total'] - last_total) / progress_interval:8.1f} q/s  "
+                  f"ok={snapshot['successful']} failed={snapshot['failed']} dropped={snapshot['dropped']}  "
+                  f"p50={late.percentile(50):.1f}ms p99={late.percentile(99):.1f}ms")
+            last_total = snapshot['total']
+            next_progress = now + progress_interval
+        if now >= next_stats_time and latest:
+            print_statistics(duration_minutes, merge_snapshots(latest.values()))
+            next_stats_time = now + stats_interval
+
+    for child in children:
+        child.join()
+    return merge_snapshots(latest.values())
+
+def test_realistic_workload(server, database, username, password, port=1433,
+                           duration_minutes=10, min_interval=1.0, max_interval=5.0, pool_size=10,
+                           validation='return', idle_threshold=30.0, sweep_interval=10.0,
+                           min_size=None, max_lifetime=0, idle_timeout=300.0, workers=None,
+                           rate=None, arrivals='poisson', max_in_flight=None, processes=1,
+                           events_path=None, quiet=False, workload=DEFAULT_PROFILE,
+                           reconnect_settings=(0.1, 30.0, 5, 10.0)):
+    """Test realistic workload with connection pooling"""
+    global start_time, verbose, events
+
+    workers = workers or pool_size
+    max_in_flight = max_in_flight or workers
+    min_size = pool_size if min_size is None else min(min_size, pool_size)
+    settings = {
+        'server': server, 'database': database, 'username': username, 'password': password, 'port': port,
+        'duration_minutes': duration_minutes, 'min_interval': min_interval, 'max_interval': max_interval,
+        'pool_size': pool_size, 'validation': validation, 'idle_threshold': idle_threshold,
+        'sweep_interval': sweep_interval, 'min_size': min_size, 'max_lifetime': max_lifetime,
+        'idle_timeout': idle_timeout, 'workers': workers, 'rate': rate, 'arrivals': arrivals,
+        'max_in_flight': max_in_flight, 'events': events_path, 'profile': workload,
+        'reconnect': reconnect_settings,
+    }
+    verbose = not quiet
 
     print()
     print("=" * 70)
-    print("=== FINAL RESULTS ===")
+    print("=== Realistic SQL Server Workload Simulation ===")
+    print("=" * 70)
+    print(f"Target:             {server}:{port}")
+    print(f"Database:           {database}")
+    print(f"Username:           {username}")
+    print(f"Duration:           {duration_minutes} minutes")
+    if rate:
+        print(f"Arrivals:           {rate}/s {arrivals}, open loop (max {max_in_flight} in flight)")
+    else:
+        print(f"Query interval:     {min_interval}s - {max_interval}s (random)")
+    print(f"Connection pool:    {min_size}-{pool_size} connections"
+          f"{f', max lifetime {max_lifetime}s' if max_lifetime else ''}, idle timeout {idle_timeout}s")
+    print(f"Validation:         {validation} - {VALIDATION_POLICIES[validation]}")
+    print(f"Worker threads:     {workers} workers")
+    print(f"Reconnect:          backoff {reconnect_settings[0]}s-{reconnect_settings[1]}s decorrelated jitter, "
+          f"breaker opens after {reconnect_settings[2]} failures for {reconnect_settings[3]}s")
+    if workload is not DEFAULT_PROFILE:
+        print(f"Workload profile:   {workload.name}: " +
+              ", ".join(f"{q.name} {workload.share(q):.0f}%" for q in workload.queries))
+    if processes > 1:
+        print(f"Processes:          {processes} (pool, workers and rate split between them)")
+    if events_path:
+        where = f"{shard_path(events_path, 1)} ... {shard_path(events_path, processes)}" if processes > 1 else events_path
+        print(f"Events:             {where}")
+    print(f"Start time:         {datetime.datetime.now()}")
     print("=" * 70)
-    print(f"End time:           {datetime.datetime.now()}")
-    print(f"Total duration:     {elapsed_total//60}m {elapsed_total%60}s")
     print()
 
-    with lock:
-        print(f"Total Queries:      {total_queries}")
-        print(f"  Successful:       {successful_queries}")
-        print(f"  Failed:           {failed_queries}")
-
-        if total_queries > 0:
-            success_rate = (successful_queries * 100) / total_queries
-            qps = total_queries / elapsed_total
-            print(f"  Success Rate:     {success_rate:.1f}%")
-            print(f"  Queries/second:   {qps:.2f}")
-
-            if query_times:
-                avg_time = sum(query_times) / len(query_times)
-                sorted_times = sorted(query_times)
-                p50 = sorted_times[len(sorted_times)//2]
-                p95 = sorted_times[int(len(sorted_times)*0.95)]
-                p99 = sorted_times[int(len(sorted_times)*0.99)]
-
-                print()
-                print("Query Latency:")
-                print(f"  Average:          {avg_time:.1f}ms")
-                print(f"  P50 (median):     {p50:.1f}ms")
-                print(f"  P95:              {p95:.1f}ms")
-                print(f"  P99:              {p99:.1f}ms")
+    start_time = time.time()
 
-    print("=" * 70)
+    if processes > 1:
+        snapshot = run_processes(settings, processes, duration_minutes)
+    else:
+        next_stats_time = time.time() + 60  # Print stats every minute
 
-    return 0 if failed_queries == 0 else 1
+        def tick(pool):
+            nonlocal next_stats_time
+            if time.time() >= next_stats_time:
+                print_statistics(duration_minutes, collect_snapshot(pool))
+                next_stats_time = time.time() + 60
+
+        if events_path:
+            events = EventRecorder(events_path)
+        pool = run_workload(settings, tick)
+        if events:
+            events.close()
+        snapshot = collect_snapshot(pool)
+
+    # Final statistics
+    print_final_results(snapshot, int(time.time() - start_time), processes)
+    if events_path:
+        print(f"Events: {snapshot['events']} written to "
+              f"{events_path if processes == 1 else shard_path(events_path, '*')}")
+
+    return 0 if snapshot['failed'] == 0 and snapshot['dropped'] == 0 else 1
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python3 test-mssql-realistic.py <server> <database> <username> <password> [port] [duration_minutes] [min_interval] [max_interval] [pool_size] [options]",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""Example:
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433 15 0.5 3.0 20
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433 60 1 5 10 --validation sweep
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433 30 --rate 50 --workers 20
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433 30 1 5 40 --rate 2000 --workers 160 --processes 8 --validation never
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433 30 --rate 200 --events run.bin --quiet
+  python3 mssql_events.py run.bin
+  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433 10 --rate 20 --profile export.json --validation never
+
+Validation policies:
+""" + "\n".join(f"  {name:<7} {text}" for name, text in VALIDATION_POLICIES.items()) + """
+
+This simulates real application behavior:
+  - Connection pooling (reuses connections)
+  - Random query intervals (realistic load pattern)
+  - Multiple concurrent workers
+  - Continuous monitoring and statistics""")
+    parser.add_argument("server", help="Database server IP/hostname")
+    parser.add_argument("database", help="Database name")
+    parser.add_argument("username", help="Database username")
+    parser.add_argument("password", help="Database password")
+    parser.add_argument("port", nargs="?", type=int, default=1433, help="Database port (default: 1433)")
+    parser.add_argument("duration_minutes", nargs="?", type=int, default=10,
+                        help="Test duration in minutes (default: 10)")
+    parser.add_argument("min_interval", nargs="?", type=float, default=1.0,
+                        help="Minimum seconds between queries (default: 1.0)")
+    parser.add_argument("max_interval", nargs="?", type=float, default=5.0,
+                        help="Maximum seconds between queries (default: 5.0)")
+    parser.add_argument("pool_size", nargs="?", type=int, default=10,
+                        help="Maximum connections in pool, and number of workers (default: 10)")
+    parser.add_argument("--validation", choices=VALIDATION_POLICIES, default="return",
+                        help="when pooled connections are checked (default: return)")
+    parser.add_argument("--idle-threshold", type=float, default=30.0, metavar="SECONDS",
+                        help="idle time before a connection is re-validated by idle/sweep (default: 30)")
+    parser.add_argument("--sweep-interval", type=float, default=10.0, metavar="SECONDS",
+                        help="how often the pool housekeeper runs: sweep validation, idle timeout, "
+                             "max lifetime (default: 10)")
+    parser.add_argument("--min-size", type=int,
+                        help="connections kept open even when idle (default: pool_size, i.e. a fixed-size pool)")
+    parser.add_argument("--max-lifetime", type=float, default=0, metavar="SECONDS",
+                        help="retire connections after this long (default: 0 = never)")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, metavar="SECONDS",
+                        help="close connections idle this long, down to --min-size (default: 300)")
+    parser.add_argument("--workers", type=int,
+                        help="worker threads (default: pool_size); more than pool_size makes borrowers queue")
+    parser.add_argument("--rate", type=float, metavar="QPS",
+                        help="open-loop mode: issue this many queries/sec on a fixed schedule, ignoring "
+                             "min/max_interval, and measure latency from the scheduled start")
+    parser.add_argument("--arrivals", choices=("poisson", "fixed"), default="poisson",
+                        help="inter-arrival times for --rate (default: poisson)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="queries queued or running before new arrivals are shed (default: --workers)")
+    parser.add_argument("--events", metavar="PATH",
+                        help="record every query, connect, validation and shed arrival to PATH "
+                             "(.jsonl, or .bin for compact binary; one file per process with --processes)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="no line per query; periodic statistics and the final report only")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="JSON workload profile: weighted, parameterized statements whose result sets "
+                             "are streamed with fetchmany (see workload_profiles.py)")
+    reconnect.add_arguments(parser)
+    parser.add_argument("--processes", type=int, default=1,
+                        help="split pool, workers and --rate across N processes to get past the GIL; "
+                             "stats are merged live (default: 1)")
+
     if len(sys.argv) < 5:
-        print("Usage: python3 test-mssql-realistic.py <server> <database> <username> <password> [port] [duration_minutes] [min_interval] [max_interval] [pool_size]")
-        print()
-        print("Arguments:")
-        print("  server          - Database server IP/hostname")
-        print("  database        - Database name")
-        print("  username        - Database username")
-        print("  password        - Database password")
-        print("  port            - Database port (default: 1433)")
-        print("  duration_minutes- Test duration in minutes (default: 10)")
-        print("  min_interval    - Minimum seconds between queries (default: 1.0)")
-        print("  max_interval    - Maximum seconds between queries (default: 5.0)")
-        print("  pool_size       - Number of connections in pool (default: 10)")
-        print()
-        print("Example:")
-        print("  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123")
-        print("  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433")
-        print("  python3 test-mssql-realistic.py 172.16.4.207 master sa MyPass123 1433 15 0.5 3.0 20")
-        print()
-        print("This simulates real application behavior:")
-        print("  - Connection pooling (reuses connections)")
-        print("  - Random query intervals (realistic load pattern)")
-        print("  - Multiple concurrent workers")
-        print("  - Continuous monitoring and statistics")
+        parser.print_help()
         sys.exit(1)
+    args = parser.parse_args()
 
-    server = sys.argv[1]
-    database = sys.argv[2]
-    username = sys.argv[3]
-    password = sys.argv[4]
-    port = int(sys.argv[5]) if len(sys.argv) > 5 else 1433
-    duration_minutes = int(sys.argv[6]) if len(sys.argv) > 6 else 10
-    min_interval = float(sys.argv[7]) if len(sys.argv) > 7 else 1.0
-    max_interval = float(sys.argv[8]) if len(sys.argv) > 8 else 5.0
-    pool_size = int(sys.argv[9]) if len(sys.argv) > 9 else 10
-
-    sys.exit(test_realistic_workload(server, database, username, password, port,
-                                     duration_minutes, min_interval, max_interval, pool_size))
+    sys.exit(test_realistic_workload(args.server, args.database, args.username, args.password, args.port,
+                                     args.duration_minutes, args.min_interval, args.max_interval, args.pool_size,
+                                     args.validation, args.idle_threshold, args.sweep_interval,
+                                     args.min_size, args.max_lifetime, args.idle_timeout, args.workers,
+                                     args.rate, args.arrivals, args.max_in_flight, args.processes,
+                                     args.events, args.quiet,
+                                     Profile.load(args.profile) if args.profile else DEFAULT_PROFILE,
+                                     (args.backoff_base, args.backoff_cap, args.breaker_threshold,
+                                      args.breaker_open)))
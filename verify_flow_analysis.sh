@@ -4,6 +4,13 @@
 # Run this to verify all key findings from asymmetric_routing_analysis.txt
 
 LOGFILE="LOGS/tailscale_network_flow_logfile.txt"
+FLOW_DB="${FLOW_DB:-flows.db}"
+FLOWS="python3 flow_index.py --db $FLOW_DB"
+OUTAGE="--from 2025-10-21T05:50:00Z --to 2025-10-21T06:30:00Z"
+
+# One pass over the log into the indexed store (only new records on reruns);
+# every check below is then an index query instead of another full jq scan
+$FLOWS ingest --quiet "$LOGFILE" || exit 1
 
 echo "================================================================================"
 echo "TAILSCALE NETWORK FLOW VERIFICATION"
@@ -15,7 +22,7 @@ echo ""
 # Test 1: Smoking gun - zero inbound flows
 echo "1. SMOKING GUN - Inbound flows to Windows VM (100.97.54.81)"
 echo "   Expected: 0"
-inbound=$(jq '[.logs[] | .subnetTraffic[]?, .physicalTraffic[]? | select(.dst | contains("100.97.54.81"))] | length' "$LOGFILE")
+inbound=$($FLOWS count --kind subnet,physical --dst 100.97.54.81)
 echo "   Actual: $inbound"
 if [ "$inbound" -eq 0 ]; then
     echo "   ✓ CONFIRMED: Asymmetric routing (no inbound)"
@@ -27,7 +34,7 @@ echo ""
 # Test 2: Outbound flows from Windows
 echo "2. Outbound flows FROM Windows VM (100.97.54.81)"
 echo "   Expected: ~24,549"
-outbound=$(jq '[.logs[] | .subnetTraffic[]?, .physicalTraffic[]? | select(.src | contains("100.97.54.81"))] | length' "$LOGFILE")
+outbound=$($FLOWS count --kind subnet,physical --src 100.97.54.81)
 echo "   Actual: $outbound"
 if [ "$outbound" -gt 20000 ]; then
     echo "   ✓ CONFIRMED: Windows can send (asymmetric)"
@@ -39,11 +46,7 @@ echo ""
 # Test 3: DERP connectivity during outage
 echo "3. DERP connectivity during outage (05:50-06:30)"
 echo "   Expected: TX ~18,197, RX ~17,673"
-derp=$(jq '.logs[] | select(.logged >= "2025-10-21T05:50:00Z" and .logged <= "2025-10-21T06:30:00Z")
-    | .physicalTraffic[]?
-    | select(.src | contains("100.97.54.81") and .dst | contains("65.51.181.220"))
-    | {txPkts, rxPkts}' "$LOGFILE" | \
-    jq -s 'reduce .[] as $item ({tx:0, rx:0}; {tx: (.tx + $item.txPkts), rx: (.rx + $item.rxPkts)})')
+derp=$($FLOWS sum --kind physical --src 100.97.54.81 --dst 65.51.181.220 $OUTAGE)
 echo "   Actual: $derp"
 rx=$(echo "$derp" | jq '.rx')
 if [ "$rx" -gt 15000 ]; then
@@ -55,11 +58,8 @@ echo ""
 
 # Test 4: Failure rate during outage
 echo "4. Failure rate during outage (05:50-06:30)"
-total=$(jq '[.logs[] | select(.logged >= "2025-10-21T05:50:00Z" and .logged <= "2025-10-21T06:30:00Z")
-    | .subnetTraffic[]?] | length' "$LOGFILE")
-failed=$(jq '[.logs[] | select(.logged >= "2025-10-21T05:50:00Z" and .logged <= "2025-10-21T06:30:00Z")
-    | .subnetTraffic[]?
-    | select(.txPkts == 1)] | length' "$LOGFILE")
+total=$($FLOWS count --kind subnet $OUTAGE)
+failed=$($FLOWS count --kind subnet $OUTAGE --tx-pkts 1)
 echo "   Total flows: $total"
 echo "   Failed (single-pkt): $failed"
 if [ "$total" -gt 0 ]; then
@@ -80,8 +80,8 @@ echo ""
 echo "5. Success rates across time periods"
 echo ""
 echo "   BEFORE outage (<05:50):"
-before_total=$(jq '[.logs[] | select(.logged < "2025-10-21T05:50:00Z") | .subnetTraffic[]?] | length' "$LOGFILE")
-before_failed=$(jq '[.logs[] | select(.logged < "2025-10-21T05:50:00Z") | .subnetTraffic[]? | select(.txPkts == 1)] | length' "$LOGFILE")
+before_total=$($FLOWS count --kind subnet --before 2025-10-21T05:50:00Z)
+before_failed=$($FLOWS count --kind subnet --before 2025-10-21T05:50:00Z --tx-pkts 1)
 before_rate=$(awk "BEGIN {printf \"%.1f\", ($before_failed/$before_total)*100}")
 echo "     Total: $before_total, Failed: $before_failed, Rate: ${before_rate}%"
 
@@ -92,8 +92,8 @@ during_rate=$(awk "BEGIN {printf \"%.1f\", ($during_failed/$during_total)*100}")
 echo "     Total: $during_total, Failed: $during_failed, Rate: ${during_rate}%"
 
 echo "   AFTER outage (>06:30):"
-after_total=$(jq '[.logs[] | select(.logged > "2025-10-21T06:30:00Z") | .subnetTraffic[]?] | length' "$LOGFILE")
-after_failed=$(jq '[.logs[] | select(.logged > "2025-10-21T06:30:00Z") | .subnetTraffic[]? | select(.txPkts == 1)] | length' "$LOGFILE")
+after_total=$($FLOWS count --kind subnet --after 2025-10-21T06:30:00Z)
+after_failed=$($FLOWS count --kind subnet --after 2025-10-21T06:30:00Z --tx-pkts 1)
 after_rate=$(awk "BEGIN {printf \"%.1f\", ($after_failed/$after_total)*100}")
 echo "     Total: $after_total, Failed: $after_failed, Rate: ${after_rate}%"
 
@@ -108,20 +108,26 @@ echo ""
 echo "6. Windows VM destinations (should only be DERP relays)"
 echo "   Expected: Only 65.51.181.220:41641 and 127.3.3.40:*"
 echo "   Actual destinations:"
-jq '.logs[] | .physicalTraffic[]? | select(.src | contains("100.97.54.81")) | .dst' "$LOGFILE" | \
-    sort -u | sed 's/^/     /'
+$FLOWS distinct dst --kind physical --src 100.97.54.81 | sed 's/^/     /'
 echo ""
 
 # Test 7: Sample failed flow
 echo "7. Sample FAILED flow (single packet = SYN only)"
-jq '.logs[] | select(.logged >= "2025-10-21T05:50:00Z" and .logged <= "2025-10-21T06:30:00Z")
-    | .subnetTraffic[]?
-    | select(.txPkts == 1 and (.dst | contains("172.16")))' "$LOGFILE" | head -1
+$FLOWS flows --kind subnet $OUTAGE --tx-pkts 1 --dst 172.16. --limit 1
 echo ""
 
 # Test 8: Sample successful flow
 echo "8. Sample SUCCESSFUL flow (multi-packet)"
-jq '.logs[] | .subnetTraffic[]? | select(.txPkts > 1 and (.dst | contains("172.16")))' "$LOGFILE" | head -1
+$FLOWS flows --kind subnet --min-tx-pkts 2 --dst 172.16. --limit 1
+echo ""
+
+# Test 9: Every node pair, not just the Windows VM
+echo "9. One-way and asymmetric paths across ALL node pairs"
+if python3 -c "import numpy" 2>/dev/null; then
+    python3 flow_asymmetry.py --db "$FLOW_DB" --kind subnet,physical --top 10 | sed 's/^/   /'
+else
+    echo "   (skipped: flow_asymmetry.py needs NumPy - pip install numpy)"
+fi
 echo ""
 
 echo "================================================================================"
@@ -0,0 +1,198 @@
+"""
+Workload profiles for test-mssql-realistic.py
+
+A profile is a JSON file describing a weighted mix of statements:
+
+  {
+    "name": "reporting",
+    "queries": [
+      {"name": "health", "weight": 70, "sql": "SELECT GETDATE(), @@SPID", "session_column": 1},
+      {"name": "lookup", "weight": 25,
+       "sql": "SELECT * FROM dbo.Orders WHERE OrderId = %(id)s",
+       "params": {"id": "randint:1:100000"}},
+      {"name": "export", "weight": 5,
+       "sql": "SELECT * FROM mock_rows(%(rows)s, %(width)s)",
+       "params": {"rows": "choice:1000,10000,50000", "width": 200},
+       "fetch_size": 500}
+    ]
+  }
+
+Parameters are passed to pymssql as %(name)s placeholders. A string value
+of the form KIND:ARGS is a generator drawn fresh for every execution:
+
+  randint:LO:HI     integer in [LO, HI]
+  uniform:LO:HI     float in [LO, HI]
+  choice:A,B,C      one of the listed values (numbers stay numbers)
+  text:N            N random letters
+
+Any other value is passed through unchanged. Result sets are consumed with
+fetchmany(fetch_size), so a 10M-row export holds one batch in client memory
+at a time. Rows and approximate payload bytes (NVARCHAR counted at 2 bytes
+per character, as on the wire) are counted per statement.
+"""
+
+import json
+import random
+import string
+
+from latency_histogram import LatencyHistogram
+
+DEFAULT_FETCH_SIZE = 1000
+
+def _number(text):
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+def _generator(spec):
+    """Callable returning a fresh parameter value, or None for a literal"""
+    if not isinstance(spec, str) or ':' not in spec:
+        return None
+    kind, _, args = spec.partition(':')
+    if kind == 'randint':
+        low, high = (int(v) for v in args.split(':'))
+        return lambda: random.randint(low, high)
+    if kind == 'uniform':
+        low, high = (float(v) for v in args.split(':'))
+        return lambda: random.uniform(low, high)
+    if kind == 'choice':
+        values = [_number(v.strip()) for v in args.split(',')]
+        return lambda: random.choice(values)
+    if kind == 'text':
+        length = int(args)
+        return lambda: ''.join(random.choices(string.ascii_letters, k=length))
+    return None
+
+def row_bytes(row):
+    """Approximate TDS payload size of one row"""
+    size = 0
+    for value in row:
+        if value is None:
+            continue
+        if isinstance(value, str):
+            size += 2 * len(value)
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+        else:
+            size += 8
+    return size
+
+class Query:
+    def __init__(self, spec):
+        self.name = spec['name']
+        self.sql = spec['sql']
+        self.weight = float(spec.get('weight', 1))
+        self.fetch_size = int(spec.get('fetch_size', DEFAULT_FETCH_SIZE))
+        self.session_column = spec.get('session_column')
+        self._literals = {}
+        self._generators = {}
+        for name, value in spec.get('params', {}).items():
+            generator = _generator(value)
+            if generator:
+                self._generators[name] = generator
+            else:
+                self._literals[name] = value
+
+    def params(self):
+        if not self._generators and not self._literals:
+            return None
+        params = dict(self._literals)
+        for name, generator in self._generators.items():
+            params[name] = generator()
+        return params
+
+    def execute(self, conn):
+        """Run the statement and stream its result set; (rows, bytes, session or None)"""
+        cursor = conn.cursor()
+        try:
+            params = self.params()
+            if params is None:
+                cursor.execute(self.sql)
+            else:
+                cursor.execute(self.sql, params)
+            rows = size = 0
+            session = None
+            if cursor.description is None:
+                return 0, 0, None
+            while True:
+                batch = cursor.fetchmany(self.fetch_size)
+                if not batch:
+                    break
+                if session is None and self.session_column is not None:
+                    session = batch[0][self.session_column]
+                rows += len(batch)
+                for row in batch:
+                    size += row_bytes(row)
+            return rows, size, session
+        finally:
+            cursor.close()
+
+class Profile:
+    def __init__(self, name, queries):
+        if not queries:
+            raise ValueError(f"profile '{name}' has no queries")
+        self.name = name
+        self.queries = queries
+        total = 0.0
+        self.cum_weights = []
+        for query in queries:
+            total += query.weight
+            self.cum_weights.append(total)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec.get('name', path), [Query(q) for q in spec['queries']])
+
+    def pick(self):
+        if len(self.queries) == 1:
+            return self.queries[0]
+        return random.choices(self.queries, cum_weights=self.cum_weights)[0]
+
+    def share(self, query):
+        """Configured weight of a query as a percentage of the mix"""
+        return query.weight * 100.0 / self.cum_weights[-1]
+
+# What test-mssql-realistic.py ran before profiles existed
+DEFAULT_PROFILE = Profile('default', [Query({
+    'name': 'default',
+    'sql': """
+            SELECT
+                GETDATE() as QueryTime,
+                @@SPID as SessionID,
+                @@VERSION as ServerVersion
+        """,
+    'session_column': 1,
+})])
+
+class QueryStats:
+    """Per-statement counters; picklable and mergeable across --processes shards"""
+    __slots__ = ('count', 'failed', 'rows', 'bytes', 'latency')
+
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.rows = 0
+        self.bytes = 0
+        self.latency = LatencyHistogram()
+
+    def __getstate__(self):
+        return (self.count, self.failed, self.rows, self.bytes, self.latency)
+
+    def __setstate__(self, state):
+        self.count, self.failed, self.rows, self.bytes, self.latency = state
+
+    def merge(self, other):
+        self.count += other.count
+        self.failed += other.failed
+        self.rows += other.rows
+        self.bytes += other.bytes
+        self.latency.merge(other.latency)
+        return self
+
+    def copy(self):
+        return QueryStats().merge(self)